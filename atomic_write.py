@@ -0,0 +1,29 @@
+# atomic_write.py
+#
+# 以「先寫到同目錄的暫存檔再 os.replace 換上」的方式寫檔：讀取的程式不會看到寫一半的內容，
+# 寫到一半當機也不會留下半個檔案。只用標準函式庫，量測、快取等輕量模組也可以直接匯入。
+
+import json
+import os
+import threading
+
+
+def tmp_path_for(path):
+    """path 的暫存檔名：帶行程與執行緒編號，兩個程式 (或執行緒) 同時寫同一個檔時不會寫到同一個暫存檔。"""
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+def write_text_atomic(path, text):
+    """寫出 UTF-8 文字檔；失敗時刪掉暫存檔。"""
+    tmp_path = tmp_path_for(path)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+
+def write_json_atomic(path, data, indent=None):
+    """以 write_text_atomic 寫出 JSON (中文原樣保留)。"""
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=indent))
@@ -0,0 +1,167 @@
+# availability.py
+#
+# 「🕒 建議時間」的與會者空閒時段計算。
+#   - FreeBusyCache: 每個行事曆 (與會者 email 或 "primary") 忙碌區間的本機快取 (freebusy_cache.json)，
+#     TTL 內再查同一段時間不必打 API；
+#   - find_free_slots: 把所有人的忙碌區間合併成一條時間軸，一次掃過找出最早的幾個共同空檔；
+#   - suggest_meeting_slots: 只對快取裡沒有 (或過期) 的行事曆發一次 freebusy 查詢，再算出建議時段。
+# freebusy 查詢由呼叫端以 query 參數傳入 (GUI 用的是 google_calendar_service.query_freebusy)。
+# 時間一律是 CALENDAR_TIMEZONE 的 naive datetime：建立活動時 (build_meet_event) 也是把 naive 時間標成這個時區送出，
+# 所以不論電腦設定在哪個時區，建議的時段與實際建立的會議都是同一個時鐘。
+
+import json
+import os
+import threading
+import time as time_module
+from datetime import datetime, timedelta, time
+from zoneinfo import ZoneInfo
+
+import perf_metrics
+from atomic_write import write_json_atomic
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+CALENDAR_TIMEZONE = "Asia/Taipei"  # 會議時間的時區 (活動的 timeZone 欄位)
+CALENDAR_TZ = ZoneInfo(CALENDAR_TIMEZONE)
+FREEBUSY_CACHE_PATH = os.path.join(SCRIPT_DIR, 'freebusy_cache.json')
+FREEBUSY_TTL = 10 * 60  # 忙碌區間快取 10 分鐘
+WORKDAY_START = time(9, 0)
+WORKDAY_END = time(18, 0)
+SLOT_STEP = timedelta(minutes=15)  # 建議的開始時間對齊到每 15 分鐘
+SEARCH_DAYS = 7  # 從選擇的日期起往後找幾天
+DEFAULT_SUGGESTIONS = 3
+
+
+def calendar_now():
+    """CALENDAR_TIMEZONE 的現在時間 (naive)。"""
+    return datetime.now(CALENDAR_TZ).replace(tzinfo=None)
+
+
+def merge_intervals(intervals):
+    """把可能重疊、未排序的 (開始, 結束) 合併成排好序、互不重疊的 list。"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]: merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _align(moment, step):
+    # 無條件進位到 step 的整數倍 (從當天 0 點算起)
+    midnight = datetime.combine(moment.date(), time())
+    steps = -(-(moment - midnight) // step)
+    return midnight + steps * step
+
+
+def find_free_slots(busy, window_start, window_end, duration, count=DEFAULT_SUGGESTIONS,
+                    workday=(WORKDAY_START, WORKDAY_END), skip_weekends=True, step=SLOT_STEP):
+    """
+    在 window_start ~ window_end 之間找出最早的 count 個長度為 duration、所有人都有空的時段。
+
+    :param busy: 所有人的忙碌區間 [(開始, 結束)]，不必排序、可以重疊。
+    :param workday: 每天只在這段時間內找 (開始, 結束)。
+    :return: [(開始, 結束)]，依時間排序。
+    """
+    merged = merge_intervals(interval for interval in busy if interval[1] > window_start and interval[0] < window_end)
+    slots, i = [], 0
+    day = window_start.date()
+    while day <= window_end.date() and len(slots) < count:
+        if skip_weekends and day.weekday() >= 5:
+            day += timedelta(days=1); continue
+        day_end = min(window_end, datetime.combine(day, workday[1]))
+        cursor = _align(max(window_start, datetime.combine(day, workday[0])), step)
+        while cursor + duration <= day_end and len(slots) < count:
+            # cursor 只會往後走，所以忙碌區間的指標也只需要往後走 (整體只掃一次)
+            while i < len(merged) and merged[i][1] <= cursor: i += 1
+            if i < len(merged) and merged[i][0] < cursor + duration:
+                cursor = _align(merged[i][1], step); continue
+            slots.append((cursor, cursor + duration))
+            cursor += duration
+        day += timedelta(days=1)
+    return slots
+
+
+class FreeBusyCache:
+    """
+    每個行事曆的忙碌區間快取 (執行緒安全)。每筆項目記著查詢的時間範圍與查詢時間：
+        {"start", "end", "fetched_at" (epoch 秒), "busy": [[開始, 結束], ...], "error"}
+    要查的範圍落在快取的範圍內、而且還沒過期才算命中。查不到的行事曆也記下錯誤原因，TTL 內不會一直重查。
+
+    :param path: 快取檔路徑；None 代表只放在記憶體。
+    :param ttl: 快取有效秒數。
+    """
+
+    def __init__(self, path=FREEBUSY_CACHE_PATH, ttl=FREEBUSY_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                print(f"空閒時段快取 {path} 無法讀取，將重新建立。")
+
+    def save(self):
+        if not self.path:
+            return
+        now = time_module.time()
+        with self._lock:
+            # 過期的項目不必留著
+            self.entries = {key: entry for key, entry in self.entries.items() if now - entry["fetched_at"] < self.ttl}
+            write_json_atomic(self.path, self.entries)
+
+    def get(self, calendar_id, start, end, now=None):
+        """快取命中時回傳 ([(開始, 結束)], 錯誤原因或 None)，否則回傳 None。"""
+        now = time_module.time() if now is None else now
+        with self._lock:
+            entry = self.entries.get(calendar_id)
+        if (entry is None or now - entry["fetched_at"] >= self.ttl
+                or entry["start"] > start.isoformat() or entry["end"] < end.isoformat()):
+            return None
+        return [(datetime.fromisoformat(s), datetime.fromisoformat(e)) for s, e in entry["busy"]], entry.get("error")
+
+    def put(self, calendar_id, start, end, busy, error=None, now=None):
+        entry = {"start": start.isoformat(), "end": end.isoformat(),
+                 "fetched_at": time_module.time() if now is None else now,
+                 "busy": [[s.isoformat(), e.isoformat()] for s, e in busy], "error": error}
+        with self._lock:
+            self.entries[calendar_id] = entry
+
+    def invalidate(self, calendar_ids=None):
+        """行事曆有變動時 (例如剛建立了會議) 清掉它們的快取；None 代表全部清掉。"""
+        with self._lock:
+            if calendar_ids is None: self.entries = {}
+            for calendar_id in calendar_ids or []: self.entries.pop(calendar_id, None)
+
+
+def suggest_meeting_slots(calendar_ids, duration, window_start, window_end, query, cache=None, count=DEFAULT_SUGGESTIONS):
+    """
+    建議所有行事曆都有空的最早 count 個時段。
+
+    :param calendar_ids: 要一起開會的行事曆 (通常是 "primary" 加上與會者的 email)。
+    :param query: query(行事曆 list, 開始, 結束) -> ({行事曆: [(開始, 結束)]}, {行事曆: 錯誤原因})；
+                  只會對快取沒命中的行事曆呼叫一次，全部命中時完全不呼叫。
+    :return: (建議的 [(開始, 結束)], 查不到空閒狀態的 {行事曆: 錯誤原因})；查不到的行事曆當作整段都有空。
+    """
+    calendar_ids = list(dict.fromkeys(calendar_ids))
+    busy, missing, errors = [], [], {}
+    for calendar_id in calendar_ids:
+        cached = cache.get(calendar_id, window_start, window_end) if cache else None
+        if cached is None: missing.append(calendar_id); continue
+        busy.extend(cached[0])
+        if cached[1]: errors[calendar_id] = cached[1]
+    perf_metrics.inc("freebusy_cache_hits_total", len(calendar_ids) - len(missing))
+    perf_metrics.inc("freebusy_cache_misses_total", len(missing))
+    if missing:
+        fetched, fetch_errors = query(missing, window_start, window_end)
+        errors.update(fetch_errors)
+        for calendar_id, intervals in fetched.items():
+            busy.extend(intervals)
+            if cache: cache.put(calendar_id, window_start, window_end, intervals)
+        for calendar_id, error in fetch_errors.items():
+            if cache: cache.put(calendar_id, window_start, window_end, [], error)
+        if cache: cache.save()
+    return find_free_slots(busy, window_start, window_end, duration, count), errors
@@ -0,0 +1,97 @@
+# background_tasks.py
+#
+# 把會卡住畫面的工作 (取得 Google 憑證、建立 service、呼叫 API) 丟到 QThreadPool 執行，
+# 結果再透過 signal 送回主執行緒，Qt 事件迴圈在等待網路的期間仍可正常運作。
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class TaskCancelled(Exception):
+    """使用者按下取消後，工作在下一個檢查點丟出這個例外結束。"""
+
+
+class WorkerSignals(QObject):
+    # QRunnable 不是 QObject，signal 要放在另一個於主執行緒建立的物件上
+    progress = pyqtSignal(str)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+
+class TaskContext:
+    """傳給背景函式的參數，用來回報進度與檢查是否已被取消。"""
+
+    def __init__(self, signals):
+        self._signals = signals
+        self.is_cancelled = False
+
+    def report(self, message):
+        self._signals.progress.emit(message)
+
+    def check_cancelled(self):
+        if self.is_cancelled:
+            raise TaskCancelled()
+
+
+class BackgroundTask(QRunnable):
+    """
+    在 QThreadPool 中執行 fn(context)。
+
+    網路請求本身無法中途打斷，所以取消是「合作式」的：fn 在每個步驟之間呼叫
+    context.check_cancelled()；已送出的請求若在取消後才回來，結果會被丟棄，不會觸發 succeeded。
+    """
+
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.signals = WorkerSignals()
+        self.context = TaskContext(self.signals)
+
+    def cancel(self):
+        self.context.is_cancelled = True
+
+    def run(self):
+        try:
+            result = self.fn(self.context)
+            if self.context.is_cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.succeeded.emit(result)
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            if self.context.is_cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.failed.emit(e)
+        finally:
+            self.signals.finished.emit()
+
+
+class BackgroundRunner:
+    """持有執行緒池與執行中的工作 (避免 Python 物件在完成前被回收)。"""
+
+    def __init__(self, max_threads=4):
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self._active = set()
+
+    def start(self, fn, on_success=None, on_error=None, on_progress=None, on_cancelled=None, on_finished=None):
+        task = BackgroundTask(fn)
+        if on_success: task.signals.succeeded.connect(on_success)
+        if on_error: task.signals.failed.connect(on_error)
+        if on_progress: task.signals.progress.connect(on_progress)
+        if on_cancelled: task.signals.cancelled.connect(on_cancelled)
+        if on_finished: task.signals.finished.connect(on_finished)
+        task.signals.finished.connect(lambda: self._active.discard(task))
+        self._active.add(task)
+        self.pool.start(task)
+        return task
+
+    def cancel_all(self):
+        for task in list(self._active):
+            task.cancel()
+
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
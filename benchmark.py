@@ -0,0 +1,347 @@
+# benchmark.py
+#
+# 可重現的效能量測：用固定 seed 產生 1k ~ 1M 筆的合成 tasks.json，量測
+#   store   : TaskManager 載入、存檔、add_task (一般 / 日誌 / 二進位模式)、get_task、list_tasks
+#   gui     : offscreen Qt 平台下 refresh_all_lists (含版面配置)
+#   minutes : parse_meeting_minutes 解析大型合成會議記錄
+#   scan    : scan_potential_meeting_emails 對本機假 Gmail 伺服器 (fake_google_server.py)
+#   startup : 全新的 Python 行程啟動 main_gui：模組匯入、視窗第一次繪製、背景載入任務完成的時間
+# 結果寫成 JSON 報告，並與存好的基準 (benchmark_baseline.json) 比較，變慢的項目直接列出數字。
+#
+# 用法:
+#   python benchmark.py                              # 預設 1k / 10k / 100k
+#   python benchmark.py --sizes 1000,1000000 --only store,gui
+#   python benchmark.py --save-baseline              # 把這次的結果併入基準 (同名項目覆寫)
+# 有項目比基準慢超過 --threshold (預設 25%) 時以 exit code 1 結束，可以直接放進 CI。
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from memory_report import generate_tasks_data
+from task_index import write_tasks_file
+from task_logic import TaskManager, SCRIPT_DIR, VALID_STATUSES
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPORT_PATH = os.path.join(SCRIPT_DIR, 'benchmark_report.json')
+DEFAULT_BASELINE_PATH = os.path.join(SCRIPT_DIR, 'benchmark_baseline.json')
+DEFAULT_THRESHOLD = 0.25
+NOISE_FLOOR_S = 0.001  # 單次量測短於這個時間的項目誤差太大，不判定為變慢
+SUITES = ("store", "gui", "minutes", "scan", "startup")
+SCAN_MESSAGE_COUNTS = (30, 200)
+SCAN_LATENCY = 0.02  # 假伺服器每個請求的延遲 (秒)，模擬真實網路往返
+SCAN_ATTACHMENT_BYTES = 64 * 1024  # 每封假郵件附帶的附件大小，掃描時不應該被下載
+
+
+def _repeat_for(size):
+    # 大型任務庫每次量測就要好幾秒，重複次數跟著減少
+    return 5 if size <= 10000 else 3 if size <= 100000 else 1
+
+
+class BenchmarkReport:
+    """收集量測結果；每個項目記錄每次量測的秒數，ops 是一次量測內做了幾次操作。"""
+
+    def __init__(self, sizes):
+        self.results = {}
+        self.meta = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "commit": _git_commit(),
+            "sizes": list(sizes),
+        }
+
+    def record(self, name, samples, ops=1, **extra):
+        median = statistics.median(samples)
+        self.results[name] = {
+            "median_s": median, "min_s": min(samples), "repeat": len(samples),
+            "ops": ops, "per_op_s": median / ops, **extra,
+        }
+        print(f"  {name:<36} {_format_seconds(median / ops):>10}/op  (中位數 {_format_seconds(median)}，{len(samples)} 次)")
+
+    def skip(self, name, reason):
+        self.results[name] = {"skipped": reason}
+        print(f"  {name:<36} 略過: {reason}")
+
+    def to_dict(self):
+        return {"meta": self.meta, "results": self.results}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=4)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def _format_seconds(seconds):
+    if seconds >= 1: return f"{seconds:.2f} s"
+    if seconds >= 1e-3: return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def time_runs(fn, repeat, setup=None):
+    """執行 fn repeat 次，回傳每次的秒數；setup 在每次量測前執行且不計時。"""
+    samples = []
+    for _ in range(repeat):
+        if setup: setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def make_tasks_store(directory, size):
+    """產生 size 筆合成任務的 tasks.json (連同截止日索引)，回傳路徑。"""
+    path = os.path.join(directory, f"tasks_{size}.json")
+    if not os.path.exists(path):
+        write_tasks_file(path, generate_tasks_data(size))
+    return path
+
+
+def make_minutes_file(directory, task_count, seed=42):
+    """產生含 task_count 個任務區塊的合成會議記錄 (任務之間穿插一般討論內容)。"""
+    path = os.path.join(directory, f"minutes_{task_count}.md")
+    if os.path.exists(path):
+        return path
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# 合成會議記錄\n\n## 討論事項\n")
+        for i in range(task_count):
+            f.write(f"- 第 {i} 項討論：大家對進度沒有意見。\n")
+            f.write(f"* **任務:** 整理第 {i} 份報告\n")
+            f.write(f"  * **負責人:** 成員{rng.randrange(20)}\n")
+            if rng.random() < 0.8:
+                f.write(f"  * **截止日期:** 2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}\n")
+            f.write("\n")
+    return path
+
+
+# --- 各組量測 ---
+def bench_store(report, directory, size):
+    path = make_tasks_store(directory, size)
+    repeat = _repeat_for(size)
+    report.record(f"store.load[{size}]", time_runs(lambda: TaskManager(path), repeat))
+
+    manager = TaskManager(path)
+    report.record(f"store.save[{size}]", time_runs(manager._save_tasks, repeat))
+    report.record(f"store.add_task.json[{size}]", time_runs(lambda: manager.add_task("量測用任務", due_date="2025-06-01"), repeat))
+
+    rng = random.Random(size)
+    ids = [rng.choice(manager.tasks).task_id for _ in range(10000)]
+    def lookup_all():
+        for task_id in ids: manager.get_task(task_id)
+    report.record(f"store.get_task[{size}]", time_runs(lookup_all, 5), ops=len(ids))
+    report.record(f"store.list_tasks[{size}]", time_runs(manager.list_tasks, repeat))
+    report.record(f"store.list_tasks.status[{size}]", time_runs(lambda: manager.list_tasks(VALID_STATUSES[0]), repeat))
+
+    # 日誌模式：每次新增只追加一筆紀錄；壓實門檻設大，避免量到背景壓實
+    journal_path = os.path.join(directory, f"journal_{size}.json")
+    shutil.copyfile(path, journal_path)
+    journal_manager = TaskManager(journal_path, storage="journal", compact_every=10 ** 9)
+    adds = 100
+    def add_many():
+        for i in range(adds): journal_manager.add_task(f"日誌任務 {i}", due_date="2025-06-01")
+    report.record(f"store.add_task.journal[{size}]", time_runs(add_many, 3), ops=adds)
+    journal_manager.close()
+
+    # 二進位快照：開檔只讀排序用的欄，任務被存取時才解碼；先存一次，讓快照帶有排好的順序
+    binary_path = os.path.join(directory, f"binary_{size}.json")
+    shutil.copyfile(path, binary_path)
+    TaskManager(binary_path, storage="binary")._save_tasks()
+    report.record(f"store.load.binary[{size}]", time_runs(lambda: TaskManager(binary_path, storage="binary"), repeat))
+    binary_manager = TaskManager(binary_path, storage="binary")
+    report.record(f"store.add_task.binary[{size}]", time_runs(lambda: binary_manager.add_task("量測用任務", due_date="2025-06-01"), repeat))
+
+
+def bench_gui(report, directory, size):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtWidgets import QApplication
+        from main_gui import TaskManagerApp
+    except ImportError as e:
+        report.skip(f"gui.refresh_all_lists[{size}]", f"無法載入 PyQt6: {e}")
+        return
+    app = QApplication.instance() or QApplication([])
+    window = TaskManagerApp(TaskManager(make_tasks_store(directory, size)))
+    window.show()
+    app.processEvents()
+    def refresh():
+        window.refresh_all_lists()
+        app.processEvents()  # 讓各分頁的 view 完成重新配置與繪製
+    report.record(f"gui.refresh_all_lists[{size}]", time_runs(refresh, _repeat_for(size)))
+    window.close()
+    app.processEvents()
+
+
+def bench_minutes(report, directory, size):
+    path = make_minutes_file(directory, size)
+    manager = TaskManager(os.path.join(directory, "minutes_tasks.json"))
+    parsed = []
+    samples = time_runs(lambda: parsed.append(len(manager.parse_meeting_minutes(path))), _repeat_for(size))
+    report.record(f"minutes.parse[{size}]", samples, tasks_found=parsed[-1], file_bytes=os.path.getsize(path))
+
+
+def bench_scan(report, directory, message_counts=SCAN_MESSAGE_COUNTS, latency=SCAN_LATENCY):
+    try:
+        from google.oauth2.credentials import Credentials
+        from fake_google_server import FakeGoogleServer
+        from google_calendar_service import scan_potential_meeting_emails, fetch_email_details
+    except ImportError as e:
+        for count in message_counts: report.skip(f"scan.cold[{count}]", f"無法載入 Google 套件: {e}")
+        return
+    creds = Credentials(token="benchmark-token")
+    for count in message_counts:
+        with FakeGoogleServer(latency=latency) as server:
+            server.populate_messages(count, attachment_bytes=SCAN_ATTACHMENT_BYTES)
+            def cold_scan():
+                return scan_potential_meeting_emails(creds, max_results=count, api_endpoint=server.url, use_cache=False)
+            before, bytes_before = server.request_count, server.bytes_sent
+            report.record(f"scan.cold[{count}]", time_runs(cold_scan, 3), requests=(server.request_count - before) // 3,
+                          kb_transferred=round((server.bytes_sent - bytes_before) / 3 / 1024, 1))
+
+            # 使用者選了一封郵件之後才讀內文找連結
+            bytes_before = server.bytes_sent
+            details = lambda: fetch_email_details(creds, "msg00000", api_endpoint=server.url, cache_path=None)
+            report.record(f"scan.details[{count}]", time_runs(details, 3), kb_transferred=round((server.bytes_sent - bytes_before) / 3 / 1024, 1))
+
+            # 快取已暖、信箱沒有變動：只需要一次 history.list
+            cache_path = os.path.join(directory, f"scan_cache_{count}.json")
+            scan = lambda: scan_potential_meeting_emails(creds, max_results=count, api_endpoint=server.url, cache_path=cache_path)
+            scan()
+            before = server.request_count
+            report.record(f"scan.incremental[{count}]", time_runs(scan, 3), requests=(server.request_count - before) // 3)
+
+
+# 在全新的行程裡啟動視窗，等背景載入完成後把 main_gui 記下的各階段時間印成 JSON
+_STARTUP_SCRIPT = """
+import json, sys
+from PyQt6.QtWidgets import QApplication
+import main_gui
+from task_logic import TaskManager
+app = QApplication([])
+window = main_gui.TaskManagerApp(TaskManager(sys.argv[1], lazy=True))
+window.show()
+while "tasks_loaded_s" not in window.startup_timings:
+    app.processEvents()
+print(json.dumps(window.startup_timings))
+"""
+
+
+def bench_startup(report, directory, size):
+    path = make_tasks_store(directory, size)
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    env.pop("STARTUP_TIMING", None)
+    runs = []
+    for _ in range(3):
+        completed = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT, path], cwd=SCRIPT_DIR, env=env,
+                                   capture_output=True, text=True, timeout=600)
+        if completed.returncode != 0:
+            report.skip(f"startup.first_paint[{size}]", completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "啟動失敗")
+            return
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    # 匯入時間與任務庫大小無關，只在第一個大小記錄一次
+    if "startup.import" not in report.results:
+        report.record("startup.import", [run["import_s"] for run in runs])
+    report.record(f"startup.first_paint[{size}]", [run["first_paint_s"] for run in runs])
+    report.record(f"startup.tasks_loaded[{size}]", [run["tasks_loaded_s"] for run in runs])
+
+
+# --- 與基準比較 ---
+def compare_with_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    逐項比較中位數，回傳 (name, 基準秒數, 目前秒數, 比值, 是否變慢) 的 list。
+    兩邊都有數字的項目才比較；單次量測短於 NOISE_FLOOR_S 的不判定為變慢。
+    """
+    rows = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "median_s" not in base or "median_s" not in current or not base["median_s"]:
+            continue
+        ratio = current["median_s"] / base["median_s"]
+        regressed = ratio > 1 + threshold and current["median_s"] >= NOISE_FLOOR_S
+        rows.append((name, base["per_op_s"], current["per_op_s"], ratio, regressed))
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"\n與基準比較 (超過 {threshold:.0%} 視為變慢):")
+    for name, base, current, ratio, regressed in rows:
+        flag = "⚠️ 變慢" if regressed else ("✅ 變快" if ratio < 1 - threshold else "")
+        print(f"  {name:<36} {_format_seconds(base):>10} → {_format_seconds(current):>10}  {(ratio - 1) * 100:+7.1f}%  {flag}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="量測任務庫、GUI 重新整理、會議記錄解析與郵件掃描的效能。")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="合成任務庫的筆數，以逗號分隔 (預設 1000,10000,100000；最多可到 1000000)")
+    parser.add_argument("--only", default=",".join(SUITES), help=f"只跑指定的量測組，以逗號分隔 ({', '.join(SUITES)})")
+    parser.add_argument("--output", default=DEFAULT_REPORT_PATH, help="JSON 報告輸出路徑")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="要比較的基準報告")
+    parser.add_argument("--save-baseline", action="store_true", help="把這次的結果併入基準 (同名項目覆寫)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="比基準慢多少比例算變慢 (預設 0.25)")
+    parser.add_argument("--workdir", help="放合成資料的目錄 (預設用暫存目錄，跑完刪除)")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",") if size]
+    args.only = [suite for suite in args.only.split(",") if suite]
+    unknown = set(args.only) - set(SUITES)
+    if unknown:
+        parser.error(f"未知的量測組: {', '.join(sorted(unknown))}")
+    return args
+
+
+def run(args):
+    report = BenchmarkReport(args.sizes)
+    directory = args.workdir or tempfile.mkdtemp(prefix="task-bench-")
+    os.makedirs(directory, exist_ok=True)
+    try:
+        for size in args.sizes:
+            print(f"\n=== {size} 筆任務 ===")
+            if "store" in args.only: bench_store(report, directory, size)
+            if "gui" in args.only: bench_gui(report, directory, size)
+            if "minutes" in args.only: bench_minutes(report, directory, size)
+            if "startup" in args.only: bench_startup(report, directory, size)
+        if "scan" in args.only:
+            print("\n=== 郵件掃描 (假 Gmail 伺服器) ===")
+            bench_scan(report, directory)
+    finally:
+        if not args.workdir: shutil.rmtree(directory, ignore_errors=True)
+
+    report.save(args.output)
+    print(f"\n報告已寫入 {args.output}")
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    if args.save_baseline:
+        # 只跑部分量測組時，其他項目保留原本的基準
+        merged = {"meta": report.meta, "results": {**(baseline or {}).get("results", {}), **report.results}}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False, indent=4)
+        print(f"已併入基準 {args.baseline}")
+        return 0
+    if baseline is None:
+        print("找不到基準報告，略過比較 (可用 --save-baseline 建立)。")
+        return 0
+    rows = compare_with_baseline(report.results, baseline, args.threshold)
+    print_comparison(rows, args.threshold)
+    return 1 if any(regressed for *_, regressed in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
@@ -0,0 +1,171 @@
+# calendar_outbox.py
+#
+# Google 日曆寫入的本機待送佇列 (calendar_outbox.json)。
+# 「建立會議」不再當場同步呼叫 API：請求先存進佇列，再由背景 worker 送出。
+#   - 網路不穩或被限流時依指數退避自動重試 (回應帶 Retry-After 時照它等)，程式關掉重開也會接著送；
+#   - 同時有多筆到期時合併成一個批次請求；
+#   - 每筆請求有固定的 id，同時當成活動 id 與 Meet 的 requestId，重送不會建立重複的活動；
+#   - 活動建立後由 on_created 把 Meet 連結寫回擁有它的任務 (meeting_link)。
+# 送出請求的 submit 由呼叫端提供 (GUI 用的是 google_calendar_service.insert_calendar_events)。
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from atomic_write import write_json_atomic
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+OUTBOX_PATH = os.path.join(SCRIPT_DIR, 'calendar_outbox.json')
+BASE_BACKOFF = 2.0  # 第一次重試前等待的秒數，之後每次加倍
+MAX_BACKOFF = 30 * 60.0  # 最長等 30 分鐘再試
+MAX_BATCH = 50
+
+
+def backoff_delay(attempts, retry_after=None):
+    """
+    第 attempts 次失敗後要等多久再試：指數退避加上隨機抖動 (避免多個請求同時重試)，
+    伺服器要求的 Retry-After 較長時以它為準。
+    """
+    delay = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+    return max(delay, retry_after or 0)
+
+
+class CalendarOutbox:
+    """
+    持久化的會議建立請求佇列 (執行緒安全)。每筆項目:
+        {"id", "task_id", "summary", "start", "end", "attendees", "description", "recurrence" (週期性會議的重複規則),
+         "attempts", "next_attempt_at" (epoch 秒), "last_error", "created_at"}
+
+    :param path: 佇列檔路徑；None 代表只放在記憶體。
+    """
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        self.entries = []
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                print(f"會議待送佇列 {path} 無法讀取，將重新建立。")
+
+    def _save(self):
+        if not self.path:
+            return
+        write_json_atomic(self.path, self.entries, indent=4)
+
+    def enqueue(self, task_id, summary, start_time, end_time, attendees=None, description="", recurrence=None):
+        """加入一筆建立會議的請求並立即存檔，回傳該項目。"""
+        entry = {
+            # uuid4 的十六進位字元都落在活動 id 允許的 base32hex 範圍 (0-9、a-v) 內
+            "id": uuid.uuid4().hex, "task_id": task_id,
+            "summary": summary, "start": start_time.isoformat(), "end": end_time.isoformat(),
+            "attendees": list(attendees or []), "description": description, "recurrence": recurrence,
+            "attempts": 0, "next_attempt_at": 0.0, "last_error": None,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self.entries.append(entry)
+            self._save()
+        return entry
+
+    def due_entries(self, now=None, limit=MAX_BATCH):
+        """到了可以送出時間的項目 (依加入順序)。"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [dict(entry) for entry in self.entries if entry["next_attempt_at"] <= now][:limit]
+
+    def seconds_until_next(self, now=None):
+        """距離下一筆可送出還要幾秒；佇列是空的時回傳 None。"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self.entries: return None
+            return max(0.0, min(entry["next_attempt_at"] for entry in self.entries) - now)
+
+    def record_results(self, entries, outcomes, now=None):
+        """
+        依送出結果更新佇列並存檔。
+
+        :param outcomes: 與 entries 同順序的 ("ok", 活動, None) / ("retry", 訊息, Retry-After) / ("fail", 訊息, None)。
+        :return: (建立成功的 [(項目, 活動)], 放棄的 [(項目, 錯誤訊息)])。
+        """
+        now = time.time() if now is None else now
+        created, failed, done_ids = [], [], set()
+        with self._lock:
+            by_id = {entry["id"]: entry for entry in self.entries}
+            for submitted, (status, payload, retry_after) in zip(entries, outcomes):
+                entry = by_id.get(submitted["id"])
+                if entry is None: continue
+                if status == "ok":
+                    created.append((entry, payload)); done_ids.add(entry["id"])
+                elif status == "fail":
+                    failed.append((entry, payload)); done_ids.add(entry["id"])
+                else:
+                    entry["attempts"] += 1; entry["last_error"] = payload
+                    entry["next_attempt_at"] = now + backoff_delay(entry["attempts"], retry_after)
+            self.entries = [entry for entry in self.entries if entry["id"] not in done_ids]
+            self._save()
+        return created, failed
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class OutboxWorker:
+    """
+    背景執行緒：佇列中有到期的項目就整批交給 submit 送出，沒有就睡到下一筆到期 (或被 wake() 叫醒)。
+
+    :param submit: submit(項目 list) -> 同順序的結果 list (見 CalendarOutbox.record_results)；
+                   丟出例外時整批視為可重試的錯誤 (例如暫時拿不到憑證)。
+    :param on_created: on_created(項目, 活動)，在 worker 執行緒中呼叫。
+    :param on_failed: on_failed(項目, 錯誤訊息)，在 worker 執行緒中呼叫。
+    """
+
+    def __init__(self, outbox, submit, on_created=None, on_failed=None):
+        self.outbox = outbox
+        self.submit = submit
+        self.on_created = on_created
+        self.on_failed = on_failed
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="calendar-outbox", daemon=True)
+        self._thread.start()
+        return self
+
+    def wake(self):
+        """有新的請求加入時呼叫，讓 worker 立刻送出。"""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stopped.set(); self._wake.set()
+        if self._thread: self._thread.join(timeout)
+
+    def drain_once(self):
+        """送出目前到期的項目一次，回傳 (建立成功, 放棄) 的筆數。"""
+        entries = self.outbox.due_entries()
+        if not entries: return 0, 0
+        try:
+            outcomes = self.submit(entries)
+        except Exception as e:
+            outcomes = [("retry", str(e) or type(e).__name__, None)] * len(entries)
+        created, failed = self.outbox.record_results(entries, outcomes)
+        for entry, event in created:
+            if self.on_created: self.on_created(entry, event)
+        for entry, message in failed:
+            print(f"會議「{entry['summary']}」無法建立，已放棄: {message}")
+            if self.on_failed: self.on_failed(entry, message)
+        return len(created), len(failed)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.drain_once()
+            self._wake.wait(self.outbox.seconds_until_next())
+            self._wake.clear()
@@ -0,0 +1,98 @@
+# due_scheduler.py
+#
+# 任務到期事件的排程器 (最小堆積)。每筆有截止日、還沒完成的任務排兩個事件：
+#   "remind"  截止日當天 REMINDER_TIME (與提醒事項相同的上午 9 點) 提醒
+#   "overdue" 截止日隔天 0 點起變成逾期 (清單上那一列改成紅字)
+# 呼叫端只要在 next_fire_at() 那一刻醒來，處理 pop_due() 取出的事件即可，不必輪詢、也不必整份重掃。
+# 任務改期、完成或刪除時不去堆積裡找舊事件，而是記下每筆任務目前這一次排程的編號，
+# 取出時與事件上的編號不符就直接略過 (延遲刪除；用編號而不是截止日，改期後又改回原日期時舊事件才不會復活)。
+# 失效的事件累積太多時才整理一次。
+# 週期性任務一次只排「下一次」：呼叫端在它的 overdue 事件觸發後再用下一次的日期 schedule() 即可。
+
+import heapq
+from datetime import datetime, timedelta
+from itertools import count
+
+from reminder_syncer import REMINDER_TIME
+from task_logic import parse_due_date
+
+REMIND = "remind"
+OVERDUE = "overdue"
+
+
+class DueScheduler:
+    """
+    :param reminder_time: 截止日當天幾點提醒 (datetime.time)。
+    """
+
+    def __init__(self, reminder_time=REMINDER_TIME):
+        self.reminder_time = reminder_time
+        self._heap = []  # (觸發時間, 事件種類, task_id, 截止日字串, 排程編號)
+        self._scheduled = {}  # task_id -> (目前排程用的截止日字串, 排程編號)
+        self._sequence = count()
+
+    def _events_for(self, task_id, due_date, now):
+        due = parse_due_date(due_date)
+        self._scheduled[task_id] = key = (due_date, next(self._sequence))
+        if due is None: return
+        remind_at = datetime.combine(due, self.reminder_time)
+        overdue_at = datetime.combine(due + timedelta(days=1), datetime.min.time())
+        # 已經過去的轉變不補發：逾期的顏色本來就是畫面繪製時依當天日期判斷
+        if remind_at > now: yield (remind_at, REMIND, task_id, *key)
+        if overdue_at > now: yield (overdue_at, OVERDUE, task_id, *key)
+
+    def rebuild(self, items, now=None):
+        """
+        以 (task_id, 截止日字串) 重建整個排程 (只傳入還沒完成的任務)。
+
+        :param items: 通常是 TaskManager.due_task_ids_from(今天)。
+        """
+        now = now or datetime.now()
+        self._scheduled = {}
+        self._heap = []
+        for task_id, due_date in items:
+            self._heap.extend(self._events_for(task_id, due_date, now))
+        heapq.heapify(self._heap)
+
+    def schedule(self, task_id, due_date, done=False, now=None):
+        """任務新增或修改後呼叫；截止日沒變就什麼都不做。回傳排程是否有變動。"""
+        if done or not due_date:
+            return self._scheduled.pop(task_id, None) is not None
+        if self._scheduled.get(task_id, (None,))[0] == due_date:
+            return False
+        for event in self._events_for(task_id, due_date, now or datetime.now()):
+            heapq.heappush(self._heap, event)
+        if len(self._heap) > 4 * len(self._scheduled) + 64:
+            self._compact()
+        return True
+
+    def unschedule(self, task_id):
+        self._scheduled.pop(task_id, None)
+
+    def _is_live(self, event):
+        return self._scheduled.get(event[2]) == event[3:]
+
+    def _compact(self):
+        self._heap = [event for event in self._heap if self._is_live(event)]
+        heapq.heapify(self._heap)
+
+    def next_fire_at(self):
+        """下一個有效事件的觸發時間；沒有事件時回傳 None。"""
+        heap = self._heap
+        while heap and not self._is_live(heap[0]):
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now=None):
+        """取出所有已到時間的有效事件，回傳 [(事件種類, task_id, 截止日字串)]，依觸發時間排序。"""
+        now = now or datetime.now()
+        heap, fired = self._heap, []
+        while heap and heap[0][0] <= now:
+            event = heapq.heappop(heap)
+            if not self._is_live(event): continue
+            fired.append((event[1], event[2], event[3]))
+            if event[1] == OVERDUE: self._scheduled.pop(event[2], None)  # 這筆任務之後沒有事件了
+        return fired
+
+    def __len__(self):
+        return len(self._scheduled)
@@ -0,0 +1,118 @@
+# email_scan_cache.py
+#
+# 「📧 掃描郵件建議」的本機快取。
+# 每封郵件解析後的結果 (標題、寄件人、摘要、連結) 以 message id 為鍵存在 email_scan_cache.json，
+# 同時記住上次掃描時的 Gmail historyId 與結果順序，下次掃描就能先問 Gmail「之後有沒有變動」，
+# 沒變動就直接回傳上次的結果，有變動也只需要下載快取裡沒有的郵件。
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from atomic_write import write_json_atomic
+
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+SCAN_CACHE_PATH = os.path.join(SCRIPT_DIR, 'email_scan_cache.json')
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024  # 快取內容超過約 2 MB 就淘汰最久沒用到的郵件
+
+
+class EmailScanCache:
+    """
+    以 message id 為鍵的解析結果快取，依最近使用順序 (LRU) 做容量淘汰。
+
+    :param path: 快取檔路徑；None 代表只放在記憶體。
+    :param max_bytes: 所有項目序列化後的大小上限。
+    """
+
+    def __init__(self, path=SCAN_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.history_id = None
+        self.query = None
+        self.result_ids = []  # 上次掃描結果的 message id，依 Gmail 列表順序
+        self._entries = OrderedDict()  # message_id -> (parsed_dict, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- 讀寫檔案 ---
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            print(f"郵件快取 {self.path} 無法讀取，將重新建立。")
+            return
+        self.history_id = data.get("history_id")
+        self.query = data.get("query")
+        self.result_ids = data.get("result_ids", [])
+        for message_id, parsed in data.get("entries", []):
+            self._put(message_id, parsed)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                "history_id": self.history_id, "query": self.query, "result_ids": self.result_ids,
+                # 依 LRU 順序存成 list，載入後仍保留淘汰順序
+                "entries": [[message_id, parsed] for message_id, (parsed, _) in self._entries.items()],
+            }
+        write_json_atomic(self.path, data)
+
+    # --- 快取操作 ---
+    def get(self, message_id):
+        with self._lock:
+            entry = self._entries.get(message_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(message_id)
+            return entry[0]
+
+    def put(self, message_id, parsed):
+        with self._lock:
+            self._put(message_id, parsed)
+
+    def _put(self, message_id, parsed):
+        size = len(json.dumps(parsed, ensure_ascii=False).encode('utf-8'))
+        old = self._entries.pop(message_id, None)
+        if old is not None:
+            self._total_bytes -= old[1]
+        self._entries[message_id] = (parsed, size)
+        self._total_bytes += size
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+
+    def cached_results(self):
+        """依上次的列表順序回傳快取中的結果；任何一封被淘汰就回傳 None (需要重新掃描)。"""
+        results = []
+        for message_id in self.result_ids:
+            parsed = self.get(message_id)
+            if parsed is None:
+                return None
+            results.append(parsed)
+        return results
+
+    def remember_scan(self, query, history_id, result_ids):
+        self.query = query
+        self.history_id = history_id
+        self.result_ids = list(result_ids)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self.history_id = None
+            self.query = None
+            self.result_ids = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
@@ -0,0 +1,353 @@
+# fake_google_server.py
+#
+# 本機的假 Google API 伺服器，讓掃描郵件、建立會議等功能不必連上真正的 Google 也能測試與量測。
+# 只實作本專案用得到的幾個端點，回應格式與 Google REST API 相同，
+# 因此 googleapiclient 只要把 api_endpoint 指到這裡就能直接使用。
+#
+# 用法:
+#   python fake_google_server.py [郵件數量]
+#   然後 export GMAIL_API_ENDPOINT=http://127.0.0.1:<port>/ CALENDAR_API_ENDPOINT=http://127.0.0.1:<port>/ 再啟動 main_gui.py
+
+import base64
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from email.message import EmailMessage
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+from zoneinfo import ZoneInfo
+
+from availability import CALENDAR_TIMEZONE
+
+
+def make_message(subject, sender, body, attachment=None):
+    """組出一封郵件；attachment 為 (檔名, bytes) 時附上一個附件。"""
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = sender
+    message["To"] = "me@example.com"
+    message.set_content(body)
+    if attachment:
+        filename, data = attachment
+        message.add_attachment(data, maintype="application", subtype="octet-stream", filename=filename)
+    return message
+
+
+def make_raw_message(subject, sender, body):
+    """組出一封 Gmail format=raw 會回傳的 base64url 郵件。"""
+    return base64.urlsafe_b64encode(make_message(subject, sender, body).as_bytes()).decode("ASCII")
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).decode("ASCII")
+
+
+def message_payload(message):
+    """仿照 Gmail format=full 的 payload 結構；附件只給 attachmentId 與大小，不內嵌資料。"""
+    payload = {"mimeType": message.get_content_type(),
+               "headers": [{"name": name, "value": str(value)} for name, value in message.items()]}
+    if message.is_multipart():
+        payload["body"] = {"size": 0}
+        payload["parts"] = [message_payload(part) for part in message.iter_parts()]
+        return payload
+    data = message.get_payload(decode=True) or b""
+    if message.get_filename():
+        payload["filename"] = message.get_filename()
+        payload["body"] = {"attachmentId": f"att-{len(data)}", "size": len(data)}
+    else:
+        payload["body"] = {"size": len(data), "data": _b64(data)}
+    return payload
+
+
+class FakeGoogleServer:
+    """
+    在背景執行緒跑的假 Google API 伺服器。
+
+    :param latency: 每個 HTTP 請求額外等待的秒數，用來模擬真實網路往返。
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.messages = {}  # message_id -> {"id", "threadId", "snippet", "message"}
+        self.history_id = 1000
+        self.history = []  # [(history_id, message_id)]，每次信箱變動都追加一筆
+        self.request_count = 0
+        self.request_log = []  # (method, path) 依序紀錄，方便檢查打了哪些 API
+        self.bytes_sent = 0  # 送出的回應本文總位元組數 (批次請求以整個 multipart 回應計)
+        self.events = {}  # 日曆活動 id -> 活動
+        self.insert_attempts = 0  # 收到的 events.insert 次數 (含被模擬失敗的)
+        self._insert_failures = []  # 接下來幾次 events.insert 要模擬的失敗 (見 fail_next_inserts)
+        self.busy = {}  # 行事曆 id -> [(開始, 結束)] 額外的忙碌區間 (見 set_busy)
+        self.hidden_calendars = set()  # freeBusy 查詢時回傳 notFound 的行事曆 (沒有分享空閒狀態)
+        self.broken_messages = set()  # messages.get 一律回傳 500 的郵件 id (列表中仍會出現)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    # --- 測試資料 ---
+    def add_message(self, message_id, subject, sender, body, snippet=None, attachment=None):
+        self.messages[message_id] = {
+            "id": message_id, "threadId": message_id,
+            "snippet": snippet if snippet is not None else body[:100],
+            "message": make_message(subject, sender, body, attachment),
+        }
+        self._record_history(message_id)
+
+    def remove_message(self, message_id):
+        """模擬郵件被讀取或刪除 (不再符合 is:unread 搜尋)。"""
+        self.messages.pop(message_id, None)
+        self._record_history(message_id)
+
+    def _record_history(self, message_id):
+        self.history_id += 1
+        self.history.append((self.history_id, message_id))
+
+    def populate_messages(self, count, attachment_bytes=0):
+        """:param attachment_bytes: 大於 0 時每封郵件附上這麼大的附件 (模擬帶簡報、文件的會議邀約)。"""
+        for i in range(count):
+            self.add_message(
+                f"msg{i:05d}", f"會議 {i}: 下週開會討論一下",
+                f"同事 {i} <colleague{i}@example.com>",
+                f"嗨，下週約個時間討論一下專案進度。\n會議連結: https://meet.google.com/abc-defg-{i:03d}\n",
+                attachment=(f"議程{i}.pdf", bytes(attachment_bytes)) if attachment_bytes else None,
+            )
+
+    def fail_next_inserts(self, count, status=503, retry_after=None, land=False):
+        """
+        讓接下來 count 次 events.insert 回傳錯誤。
+
+        :param status: 429 時回應帶 rateLimitExceeded，其他狀態碼回傳一般錯誤。
+        :param retry_after: 回應的 Retry-After 秒數。
+        :param land: True 時活動其實已建立、只是回應出錯 (模擬回應在網路上遺失)。
+        """
+        self._insert_failures.extend([(status, retry_after, land)] * count)
+
+    def set_busy(self, calendar_id, intervals):
+        """:param intervals: [(開始, 結束)]，datetime (naive 視為 CALENDAR_TIMEZONE) 或 RFC 3339 字串。"""
+        self.busy[calendar_id] = list(intervals)
+
+    # --- 生命週期 ---
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        server = self
+
+        class Handler(_FakeGoogleHandler):
+            fake = server
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # --- 路由 ---
+    def handle(self, method, path, query, body):
+        """回傳 (status, content_type, body_bytes, 額外的回應標頭或 None)。batch 以外的請求都從這裡分派。"""
+        with self._lock:
+            self.request_count += 1
+            self.request_log.append((method, path))
+        parts = [unquote(p) for p in path.strip("/").split("/")]
+        if parts[:3] == ["calendar", "v3", "calendars"] and len(parts) >= 5 and parts[4] == "events":
+            if method == "POST" and len(parts) == 5:
+                return self._insert_event(body)
+            if method == "GET" and len(parts) == 6:
+                return self._get_event(parts[5])
+        if method == "POST" and parts == ["calendar", "v3", "freeBusy"]:
+            return self._query_freebusy(body)
+        if method == "GET" and parts == ["gmail", "v1", "users", "me", "profile"]:
+            return _json_response(200, {"emailAddress": "me@example.com", "historyId": str(self.history_id)})
+        if method == "GET" and parts == ["gmail", "v1", "users", "me", "history"]:
+            return self._list_history(query)
+        if parts[:4] == ["gmail", "v1", "users", "me"] and len(parts) >= 5 and parts[4] == "messages":
+            if method == "GET" and len(parts) == 5:
+                return self._list_messages(query)
+            if method == "GET" and len(parts) == 6:
+                return self._get_message(parts[5], query)
+        return _json_response(404, {"error": {"code": 404, "message": f"未實作的端點: {method} {path}"}})
+
+    def _list_messages(self, query):
+        max_results = int(query.get("maxResults", ["100"])[0])
+        ids = sorted(self.messages)[:max_results]
+        payload = {"messages": [{"id": i, "threadId": self.messages[i]["threadId"]} for i in ids],
+                   "resultSizeEstimate": len(ids)}
+        return _json_response(200, payload)
+
+    def _list_history(self, query):
+        start = int(query["startHistoryId"][0])
+        max_results = int(query.get("maxResults", ["100"])[0])
+        changes = [(hid, mid) for hid, mid in self.history if hid > start][:max_results]
+        payload = {"historyId": str(self.history_id)}
+        if changes:
+            payload["history"] = [{"id": str(hid), "messages": [{"id": mid, "threadId": mid}]} for hid, mid in changes]
+        return _json_response(200, payload)
+
+    def _get_message(self, message_id, query):
+        """支援 format=raw / full / metadata (metadataHeaders 篩選標頭)；fields 部分回應未實作，一律回傳該格式的全部欄位。"""
+        if message_id in self.broken_messages:
+            return _json_response(500, {"error": {"code": 500, "message": "Backend Error"}})
+        stored = self.messages.get(message_id)
+        if stored is None:
+            return _json_response(404, {"error": {"code": 404, "message": "Requested entity was not found."}})
+        message = stored["message"]
+        response = {"id": stored["id"], "threadId": stored["threadId"], "snippet": stored["snippet"]}
+        fmt = query.get("format", ["full"])[0]
+        if fmt == "raw":
+            response["raw"] = _b64(message.as_bytes())
+        elif fmt == "metadata":
+            wanted = {name.lower() for name in query.get("metadataHeaders", [])}
+            response["payload"] = {"mimeType": message.get_content_type(), "headers": [
+                {"name": name, "value": str(value)} for name, value in message.items() if not wanted or name.lower() in wanted]}
+        else:
+            response["payload"] = message_payload(message)
+        return _json_response(200, response)
+
+    def _insert_event(self, body):
+        event = json.loads(body or b"{}")
+        with self._lock:
+            self.insert_attempts += 1
+            failure = self._insert_failures.pop(0) if self._insert_failures else None
+            event_id = event.get("id") or f"evt{len(self.events):06d}"
+            if event_id in self.events and not failure:
+                return _json_response(409, {"error": {"code": 409, "message": "The requested identifier already exists.",
+                                                      "errors": [{"reason": "duplicate"}]}})
+            if failure is None or failure[2]:
+                request_id = event.get("conferenceData", {}).get("createRequest", {}).get("requestId", event_id)
+                self.events[event_id] = dict(event, id=event_id, status="confirmed",
+                                             hangoutLink=f"https://meet.google.com/fake-{request_id[:10]}")
+        if failure:
+            status, retry_after, _ = failure
+            reason = "rateLimitExceeded" if status == 429 else "backendError"
+            return _json_response(status, {"error": {"code": status, "message": reason, "errors": [{"reason": reason}]}},
+                                  {"Retry-After": str(retry_after)} if retry_after is not None else None)
+        return _json_response(200, self.events[event_id])
+
+    def _get_event(self, event_id):
+        event = self.events.get(event_id)
+        if event is None:
+            return _json_response(404, {"error": {"code": 404, "message": "Not Found"}})
+        return _json_response(200, event)
+
+    def _query_freebusy(self, body):
+        """set_busy 設定的區間加上已建立的活動 (對主辦人 "primary" 與每位與會者都算忙碌)。"""
+        query = json.loads(body or b"{}")
+        time_min, time_max = _utc(query["timeMin"]), _utc(query["timeMax"])
+        by_calendar = {calendar_id: [(_utc(start), _utc(end)) for start, end in intervals] for calendar_id, intervals in self.busy.items()}
+        for event in list(self.events.values()):
+            interval = (_utc(event["start"]["dateTime"], event["start"].get("timeZone")), _utc(event["end"]["dateTime"], event["end"].get("timeZone")))
+            for calendar_id in ["primary"] + [attendee["email"] for attendee in event.get("attendees", [])]:
+                by_calendar.setdefault(calendar_id, []).append(interval)
+        calendars = {}
+        for item in query.get("items", []):
+            calendar_id = item["id"]
+            if calendar_id in self.hidden_calendars:
+                calendars[calendar_id] = {"errors": [{"domain": "global", "reason": "notFound"}], "busy": []}
+                continue
+            calendars[calendar_id] = {"busy": [
+                {"start": start.strftime("%Y-%m-%dT%H:%M:%SZ"), "end": end.strftime("%Y-%m-%dT%H:%M:%SZ")}
+                for start, end in sorted(by_calendar.get(calendar_id, [])) if end > time_min and start < time_max]}
+        return _json_response(200, {"kind": "calendar#freeBusy", "timeMin": query["timeMin"], "timeMax": query["timeMax"], "calendars": calendars})
+
+    def handle_batch(self, content_type, body):
+        """處理 multipart/mixed 的批次請求，逐一分派後組成 multipart/mixed 回應。"""
+        with self._lock:
+            self.request_count += 1
+            self.request_log.append(("POST", "batch"))
+        envelope = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        boundary = "fake_batch_boundary"
+        chunks = []
+        for part in envelope.iter_parts():
+            content_id = part["Content-ID"] or "<unknown + 0>"
+            inner = part.get_payload(decode=True) or part.get_payload().encode()
+            request_line, _, rest = inner.partition(b"\r\n" if b"\r\n" in inner else b"\n")
+            method, target, _ = request_line.decode().split(" ", 2)
+            separator = b"\r\n\r\n" if b"\r\n\r\n" in rest else b"\n\n"
+            inner_body = rest.split(separator, 1)[1] if separator in rest else b""
+            url = urlsplit(target)
+            status, inner_type, payload, headers = self.handle(method, url.path, parse_qs(url.query), inner_body)
+            extra_headers = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+            chunks.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id.strip('<>')}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: {inner_type}\r\nContent-Length: {len(payload)}\r\n{extra_headers}\r\n".encode() + payload + b"\r\n"
+            )
+        chunks.append(f"--{boundary}--\r\n".encode())
+        return 200, f"multipart/mixed; boundary={boundary}", b"".join(chunks), None
+
+
+def _utc(value, time_zone=None):
+    # RFC 3339 字串或 datetime -> UTC 的 datetime；沒帶時區的視為 time_zone (活動的 timeZone 欄位)，預設 CALENDAR_TIMEZONE
+    moment = datetime.fromisoformat(value) if isinstance(value, str) else value
+    if moment.tzinfo is None: moment = moment.replace(tzinfo=ZoneInfo(time_zone or CALENDAR_TIMEZONE))
+    return moment.astimezone(timezone.utc)
+
+
+def _json_response(status, payload, headers=None):
+    return status, "application/json; charset=UTF-8", json.dumps(payload, ensure_ascii=False).encode("utf-8"), headers
+
+
+class _FakeGoogleHandler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # 不要把每個請求都印到終端機
+
+    def _dispatch(self, method):
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        url = urlsplit(self.path)
+        if method == "POST" and url.path.startswith("/batch/"):
+            status, content_type, payload, headers = self.fake.handle_batch(self.headers.get("Content-Type", ""), body)
+        else:
+            status, content_type, payload, headers = self.fake.handle(method, url.path, parse_qs(url.query), body)
+        with self.fake._lock:
+            self.fake.bytes_sent += len(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    fake = FakeGoogleServer()
+    fake.populate_messages(count)
+    print(f"假 Google API 伺服器已啟動: {fake.start()}  (共 {count} 封郵件，Ctrl+C 結束)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
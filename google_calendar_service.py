@@ -3,15 +3,31 @@
 import os
 import datetime as dt
 import base64
-import email
+import hashlib
+import json
 import re # <-- 【新增】匯入正規表示式工具
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from email.header import decode_header, make_header # <-- 【新增】匯入標頭解碼工具
+from time import perf_counter
+from urllib.parse import urljoin, urlsplit
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.discovery_cache.base import Cache as DiscoveryCacheBase
 from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest, build_http
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
+
+import perf_metrics
+from availability import CALENDAR_TIMEZONE, CALENDAR_TZ
+from email_scan_cache import EmailScanCache, SCAN_CACHE_PATH
+from recurrence import to_rrule
 
 SCOPES = [
     "https://www.googleapis.com/auth/calendar",
@@ -21,85 +37,511 @@ SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 CREDENTIALS_PATH = os.path.join(SCRIPT_DIR, 'credentials.json')
 TOKEN_PATH = os.path.join(SCRIPT_DIR, 'token.json')
 
-def get_google_credentials():
-    # (此函式不變)
-    creds = None
-    if os.path.exists(TOKEN_PATH):
-        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
+# --- 全程式共用的憑證與 service 快取 ---
+# 憑證只從 token.json 讀一次並留在記憶體，快到期前主動更新；
+# discovery 文件只解析一次，建好的 service 依執行緒重複使用 (httplib2 不是執行緒安全的，
+# 每條執行緒各自保有一條持續連線的 AuthorizedHttp)。
+CREDENTIAL_REFRESH_MARGIN = dt.timedelta(minutes=5)
+DISCOVERY_CACHE_DIR = os.path.join(SCRIPT_DIR, '.discovery_cache')
+_client_lock = threading.RLock()
+_cached_creds = None
+_refresh_timer = None
+_discovery_docs = {}
+_thread_clients = threading.local()
+
+def _expires_soon(creds):
+    # google-auth 的 expiry 是不含時區的 UTC 時間
+    return creds.expiry is not None and creds.expiry - dt.datetime.utcnow() < CREDENTIAL_REFRESH_MARGIN
+
+def _save_token(creds):
+    with open(TOKEN_PATH, "w") as token:
+        token.write(creds.to_json())
+
+def _schedule_proactive_refresh(creds):
+    """在憑證到期前 CREDENTIAL_REFRESH_MARGIN 於背景自動更新，按下按鈕時就不必再等 refresh。"""
+    global _refresh_timer
+    if _refresh_timer: _refresh_timer.cancel()
+    if creds.expiry is None or not creds.refresh_token: return
+    delay = (creds.expiry - dt.datetime.utcnow() - CREDENTIAL_REFRESH_MARGIN).total_seconds()
+    _refresh_timer = threading.Timer(max(delay, 0), _refresh_in_background, args=(creds,))
+    _refresh_timer.daemon = True
+    _refresh_timer.start()
+
+def _refresh_in_background(creds):
+    with _client_lock:
+        if creds is not _cached_creds: return
+        try:
             creds.refresh(Request())
+            _save_token(creds)
+        except Exception as e:
+            print(f"背景更新 Google 憑證失敗，下次使用時會再試一次: {e}"); return
+    _schedule_proactive_refresh(creds)
+
+@perf_metrics.timed("google_credentials_seconds")
+def get_google_credentials(force_reload=False):
+    """
+    取得 Google 憑證。第一次呼叫時讀 token.json (必要時跑 OAuth 流程)，之後直接回傳記憶體中的憑證；
+    快到期時會先更新再回傳。
+    """
+    global _cached_creds
+    with _client_lock:
+        creds = None if force_reload else _cached_creds
+        if creds is None and os.path.exists(TOKEN_PATH):
+            creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+        if not creds or not creds.valid or _expires_soon(creds):
+            if creds and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
+                creds = flow.run_local_server(port=0)
+            _save_token(creds)
+        if creds is not _cached_creds:
+            _cached_creds = creds
+            _schedule_proactive_refresh(creds)
+        return creds
+
+class FileDiscoveryCache(DiscoveryCacheBase):
+    """googleapiclient 沒有內建某個 API 的 discovery 文件時，把下載到的文件存在本機。"""
+    def __init__(self, directory=DISCOVERY_CACHE_DIR):
+        self.directory = directory
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+    def get(self, url):
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                return f.read()
+        except IOError:
+            return None
+    def set(self, url, content):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(url), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+def _discovery_document(name, version):
+    """解析好的 discovery 文件 (dict)，每個 API 在整個程式中只解析一次。"""
+    key = (name, version)
+    with _client_lock:
+        if key not in _discovery_docs:
+            content = get_static_doc(name, version)
+            _discovery_docs[key] = json.loads(content) if content else None
+        return _discovery_docs[key]
+
+def _api_label(uri):
+    # /gmail/v1/... → gmail、/calendar/v3/... → calendar、/batch/... → batch、oauth2.googleapis.com/token → token
+    parts = urlsplit(uri)
+    return parts.path.strip("/").split("/")[0] or parts.hostname or "unknown"
+
+class InstrumentedHttp:
+    """
+    包在 httplib2.Http 外層，替每個 HTTP 請求記錄延遲、傳送 / 接收的位元組數與狀態碼 (perf_metrics)。
+    包在 AuthorizedHttp 裡面，所以憑證過期 (401) 後的自動重送、token 更新也都會被算到。
+    """
+    RETRYABLE_STATUSES = (401, 429, 500, 502, 503, 504)
+    def __init__(self, http):
+        object.__setattr__(self, "_http", http)
+    def __getattr__(self, name):
+        return getattr(self._http, name)
+    def __setattr__(self, name, value):
+        # AuthorizedHttp 會設定 follow_redirects 等屬性，要轉給真正的 Http
+        setattr(self._http, name, value)
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        api = _api_label(uri)
+        start = perf_counter()
+        try:
+            response, content = self._http.request(uri, method, body, headers, *args, **kwargs)
+        except Exception:
+            perf_metrics.inc("google_api_errors_total", api=api)
+            raise
+        finally:
+            perf_metrics.observe("google_api_request_seconds", perf_counter() - start, api=api, method=method)
+        perf_metrics.inc("google_api_requests_total", api=api, status=response.status)
+        perf_metrics.inc("google_api_bytes_sent_total", len(body.encode("utf-8") if isinstance(body, str) else body or b""), api=api)
+        perf_metrics.inc("google_api_bytes_received_total", len(content) if content else 0, api=api)
+        if response.status in self.RETRYABLE_STATUSES:
+            perf_metrics.inc("google_api_retryable_responses_total", api=api, status=response.status)
+        return response, content
+
+def _thread_http(creds):
+    """目前執行緒專用、會重複使用連線的 AuthorizedHttp (啟用 perf_metrics 時每個請求都會被計時)。"""
+    if getattr(_thread_clients, "creds", None) is not creds:
+        _thread_clients.__dict__.clear()
+        _thread_clients.creds = creds
+        http = InstrumentedHttp(build_http()) if perf_metrics.ENABLED else build_http()
+        _thread_clients.http = AuthorizedHttp(creds, http=http) if creds else http
+        _thread_clients.services = {}
+    return _thread_clients.http
+
+@perf_metrics.timed("google_service_build_seconds")
+def get_google_service(name, version, creds=None, api_endpoint=None):
+    """
+    取得可重複使用的 Google API service (例如 "calendar", "v3")。
+    同一條執行緒、同一組憑證與端點只會 build 一次。
+    """
+    if creds is None: creds = get_google_credentials()
+    http = _thread_http(creds)
+    key = (name, version, api_endpoint)
+    service = _thread_clients.services.get(key)
+    if service is None:
+        client_options = {"api_endpoint": api_endpoint} if api_endpoint else None
+        document = _discovery_document(name, version)
+        if document is not None:
+            service = build_from_document(document, http=http, client_options=client_options)
         else:
-            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open(TOKEN_PATH, "w") as token:
-            token.write(creds.to_json())
-    return creds
-
-def create_google_meet_event(service, summary, start_time, end_time, attendees=None, description=""):
-    # (此函式不變)
+            service = build(name, version, http=http, client_options=client_options, static_discovery=False, cache=FileDiscoveryCache())
+        _thread_clients.services[key] = service
+    return service
+
+# --- Google 日曆 ---
+# 設定後改連本機的假伺服器 (見 fake_google_server.py)
+CALENDAR_API_ENDPOINT = os.environ.get("CALENDAR_API_ENDPOINT")
+CALENDAR_BATCH_SIZE = 50  # Calendar API 建議一個批次請求不超過 50 筆
+# 值得稍後重試的錯誤：流量限制與伺服器暫時性錯誤
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+def build_calendar_service(creds, api_endpoint=None):
+    # api_endpoint 會取代整個 base URL (Gmail 的路徑本身就含 gmail/v1，Calendar 要自己補上 calendar/v3/)
+    api_endpoint = api_endpoint or CALENDAR_API_ENDPOINT
+    return get_google_service("calendar", "v3", creds, urljoin(api_endpoint, "calendar/v3/") if api_endpoint else None)
+
+def _calendar_batch_uri(api_endpoint=None):
+    return urljoin(api_endpoint or CALENDAR_API_ENDPOINT or "https://www.googleapis.com/", "batch/calendar/v3")
+
+def build_meet_event(summary, start_time, end_time, attendees=None, description="", request_id=None, recurrence=None):
+    """
+    組出附帶 Google Meet 的活動內容。
+
+    :param recurrence: 週期性會議的重複規則 (見 recurrence.py)，轉成活動的 RRULE。
+
+    :param request_id: 固定的請求 id (小寫英數，見 calendar_outbox)；同時當成活動 id 與 Meet 的 requestId，
+                       同一個請求重送時 Google 會回 409 而不是再建立一個活動。
+    """
     if attendees is None: attendees = []
+    request_id = request_id or uuid.uuid4().hex
     event = {
+        "id": request_id,
         "summary": summary, "description": description,
-        "start": {"dateTime": start_time.isoformat(), "timeZone": "Asia/Taipei"},
-        "end": {"dateTime": end_time.isoformat(), "timeZone": "Asia/Taipei"},
+        "start": {"dateTime": start_time.isoformat(), "timeZone": CALENDAR_TIMEZONE},
+        "end": {"dateTime": end_time.isoformat(), "timeZone": CALENDAR_TIMEZONE},
         "attendees": [{"email": email} for email in attendees],
-        "conferenceData": {"createRequest": {"requestId": f"meet-{dt.datetime.now().timestamp()}", "conferenceSolutionKey": {"type": "hangoutsMeet"}}},
+        "conferenceData": {"createRequest": {"requestId": request_id, "conferenceSolutionKey": {"type": "hangoutsMeet"}}},
         "reminders": {"useDefault": True},
     }
+    if recurrence: event["recurrence"] = [to_rrule(recurrence)]
+    return event
+
+@perf_metrics.timed("calendar_create_event_seconds")
+def create_google_meet_event(service, summary, start_time, end_time, attendees=None, description="", request_id=None):
+    """同步建立一個會議並回傳 Meet 連結 (失敗回傳 None)。GUI 改走 calendar_outbox 的待送佇列。"""
+    event = build_meet_event(summary, start_time, end_time, attendees, description, request_id)
     try:
         created_event = service.events().insert(calendarId="primary", body=event, conferenceDataVersion=1, sendUpdates="all").execute()
         return created_event.get("hangoutLink")
     except HttpError as error:
+        if error.resp.status == 409:  # 同一個 request_id 先前已建立成功
+            return service.events().get(calendarId="primary", eventId=event["id"]).execute().get("hangoutLink")
         print(f"建立活動時發生錯誤: {error}"); return None
 
+def _retry_after(error):
+    """HTTP 回應的 Retry-After (秒)，沒有給就回傳 None。"""
+    try:
+        return float(error.resp.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def classify_calendar_error(error):
+    """
+    把送出失敗的原因分成 ("retry", 訊息, Retry-After 秒數或 None) 與 ("fail", 訊息, None)。
+    網路錯誤、429、5xx 與 403 的流量限制都值得稍後重試；其他 4xx (例如資料格式錯誤) 重試也沒有用。
+    """
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        reasons = {detail.get("reason") for detail in (getattr(error, "error_details", None) or []) if isinstance(detail, dict)}
+        if status in RETRYABLE_STATUSES or (status == 403 and reasons & set(RATE_LIMIT_REASONS)):
+            return "retry", f"HTTP {status}", _retry_after(error)
+        return "fail", f"HTTP {status}: {error.reason}", None
+    return "retry", str(error) or type(error).__name__, None
+
+@perf_metrics.timed("calendar_insert_events_seconds")
+def insert_calendar_events(service, requests, batch_uri=None):
+    """
+    建立多個會議，回傳與 requests 同順序的結果：("ok", 建立好的活動, None) 或 classify_calendar_error 的結果。
+    兩筆以上時合併成批次請求 (每批最多 CALENDAR_BATCH_SIZE 筆)。
+
+    :param requests: calendar_outbox 的佇列項目 (id / summary / start / end / attendees / description)。
+    """
+    def insert_request(request):
+        event = build_meet_event(request["summary"], dt.datetime.fromisoformat(request["start"]), dt.datetime.fromisoformat(request["end"]),
+                                 request.get("attendees"), request.get("description", ""), request["id"], request.get("recurrence"))
+        return service.events().insert(calendarId="primary", body=event, conferenceDataVersion=1, sendUpdates="all")
+
+    outcomes = {}
+    def on_response(request_id, response, exception):
+        outcomes[request_id] = ("ok", response, None) if exception is None else exception
+    for start in range(0, len(requests), CALENDAR_BATCH_SIZE):
+        chunk = requests[start:start + CALENDAR_BATCH_SIZE]
+        try:
+            if len(chunk) == 1:
+                on_response(chunk[0]["id"], insert_request(chunk[0]).execute(), None)
+            else:
+                batch = BatchHttpRequest(callback=on_response, batch_uri=batch_uri or _calendar_batch_uri())
+                for request in chunk: batch.add(insert_request(request), request_id=request["id"])
+                batch.execute()
+        except (HttpError, OSError, httplib2.HttpLib2Error) as error:
+            # 整個請求沒有送達 (或單筆請求失敗)：這一批還沒有結果的都依同一個錯誤處理
+            for request in chunk: outcomes.setdefault(request["id"], error)
+
+    results = []
+    for request in requests:
+        outcome = outcomes[request["id"]]
+        if isinstance(outcome, HttpError) and outcome.resp.status == 409:
+            # 活動 id 已存在：先前某次送出其實成功了 (只是回應沒收到)，取回那個活動即可
+            try:
+                outcome = ("ok", service.events().get(calendarId="primary", eventId=request["id"]).execute(), None)
+            except (HttpError, OSError, httplib2.HttpLib2Error) as error:
+                outcome = error
+        results.append(outcome if isinstance(outcome, tuple) else classify_calendar_error(outcome))
+    return results
+
+FREEBUSY_MAX_CALENDARS = 50  # freebusy.query 一次最多查 50 個行事曆
+
+# 與 build_meet_event 相同，naive datetime 一律視為 CALENDAR_TIMEZONE (不是電腦本機的時區)
+def _rfc3339(moment):
+    # CALENDAR_TIMEZONE 的 naive datetime -> 帶時區的 RFC 3339 字串
+    return moment.replace(tzinfo=CALENDAR_TZ).isoformat()
+
+def _calendar_naive(value):
+    return dt.datetime.fromisoformat(value).astimezone(CALENDAR_TZ).replace(tzinfo=None)
+
+@perf_metrics.timed("calendar_freebusy_seconds")
+def query_freebusy(service, calendar_ids, start, end):
+    """
+    一次查詢多個行事曆在 start ~ end (CALENDAR_TIMEZONE 的 naive datetime) 的忙碌區間。
+    回傳 ({行事曆: [(開始, 結束)]}, {行事曆: 錯誤原因})；
+    查不到的行事曆 (例如對方沒有分享空閒狀態) 放在第二個 dict。
+    """
+    busy, errors = {}, {}
+    for i in range(0, len(calendar_ids), FREEBUSY_MAX_CALENDARS):
+        body = {"timeMin": _rfc3339(start), "timeMax": _rfc3339(end),
+                "items": [{"id": calendar_id} for calendar_id in calendar_ids[i:i + FREEBUSY_MAX_CALENDARS]]}
+        response = service.freebusy().query(body=body).execute()
+        for calendar_id, info in response.get("calendars", {}).items():
+            if info.get("errors"):
+                errors[calendar_id] = ", ".join(error.get("reason", "") for error in info["errors"]); continue
+            busy[calendar_id] = [(_calendar_naive(period["start"]), _calendar_naive(period["end"])) for period in info.get("busy", [])]
+    return busy, errors
+
+# --- 掃描郵件的抓取設定 ---
+# 每個批次請求包含幾封郵件 (Gmail 上限 100；1 代表不用批次、一封一個請求)，以及同時進行的批次數
+SCAN_MAX_RESULTS = 30
+SCAN_BATCH_SIZE = 10
+SCAN_MAX_WORKERS = 4
+# 設定後改連本機的假伺服器 (見 fake_google_server.py)
+GMAIL_API_ENDPOINT = os.environ.get("GMAIL_API_ENDPOINT")
+MEETING_EMAIL_QUERY = 'in:inbox is:unread ("約個時間" OR "開會" OR "會議" OR "討論一下")'
+
+def build_gmail_service(creds, api_endpoint=None):
+    return get_google_service("gmail", "v1", creds, api_endpoint or GMAIL_API_ENDPOINT)
+
+def _gmail_batch_uri(api_endpoint=None):
+    # service.new_batch_http_request() 固定使用 discovery 文件裡的 rootUrl，換成假伺服器時要自己組
+    return urljoin(api_endpoint or GMAIL_API_ENDPOINT or "https://gmail.googleapis.com/", "batch/gmail/v1")
+
+# 掃描清單只需要標題、寄件人與摘要：用 format=metadata 加上 fields 部分回應，
+# 不下載內文與附件；內文與連結等使用者選了某一封郵件才用 fetch_email_details 讀取。
+METADATA_HEADERS = ["Subject", "From"]
+METADATA_FIELDS = "id,snippet,payload/headers"
+# 內文部分回應只取 MIME 結構與內嵌的文字資料 (附件在 format=full 中只有 attachmentId，不會被下載)
+_PART_FIELDS = "mimeType,body/data"
+DETAIL_FIELDS = f"id,payload({_PART_FIELDS},parts({_PART_FIELDS},parts({_PART_FIELDS},parts({_PART_FIELDS}))))"
+DETAIL_MAX_BODY_BYTES = 64 * 1024  # 只解碼內文的前 64 KB 來找連結
+# 先找常見的視訊會議連結，找不到才退回第一個網址
+MEETING_LINK_PATTERNS = (
+    re.compile(r'https://meet\.google\.com/[\w-]+'),
+    re.compile(r'https://[\w.-]*zoom\.us/[\w/?=&.-]+'),
+    re.compile(r'https://teams\.microsoft\.com/[^\s<>"]+'),
+    re.compile(r'https?://[\w\./-]*'),
+)
+
+def _decode_header_value(value):
+    # 【修正亂碼】使用 decode_header 來正確解碼標題
+    return str(make_header(decode_header(value)))
+
+def _parse_metadata_message(msg):
+    """把 format=metadata 的郵件轉成掃描結果 dict (此時還沒有 link，見 fetch_email_details)。"""
+    headers = {header["name"].lower(): header["value"] for header in msg.get("payload", {}).get("headers", [])}
+    return {
+        "message_id": msg.get("id", ""),
+        "subject": _decode_header_value(headers.get("subject", "無標題")),
+        "sender": _decode_header_value(headers.get("from", "未知寄件人")),
+        "snippet": msg.get("snippet", ""),
+    }
+
+def _find_text_part(payload, mime_type):
+    """深度優先找出第一個指定類型、內嵌資料的 MIME 部分。"""
+    if payload.get("mimeType") == mime_type and payload.get("body", {}).get("data"):
+        return payload
+    for part in payload.get("parts", []):
+        found = _find_text_part(part, mime_type)
+        if found: return found
+    return None
+
+def _decode_body_data(data, max_bytes):
+    # base64url 每 4 個字元對應 3 個位元組，只解碼前 max_bytes 需要的部分
+    data = data[:(max_bytes + 2) // 3 * 4]
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode('utf-8', errors='ignore')
+
+def find_meeting_link(body):
+    """依 MEETING_LINK_PATTERNS 的優先順序回傳內文中的會議連結，找不到回傳空字串。"""
+    for pattern in MEETING_LINK_PATTERNS:
+        match = pattern.search(body)
+        if match: return match.group(0)
+    return ""
+
+@perf_metrics.timed("gmail_fetch_details_seconds")
+def fetch_email_details(creds, message_id, api_endpoint=None, max_body_bytes=DETAIL_MAX_BODY_BYTES, cache_path=SCAN_CACHE_PATH,
+                        need_body=True):
+    """
+    讀取單一郵件的內文 (最多 max_body_bytes) 並找出會議連結，回傳 {"body", "link"}。
+    找到的連結會寫回掃描快取；內文不進快取 (每封最多 64 KB，很快就會把快取裡的掃描結果擠掉)。
+
+    :param need_body: False 代表只需要連結 (例如 GUI 填入會議連結)：快取裡已有連結時直接回傳、不必下載，
+                      此時 body 為 None。True 時一律下載，回傳的 body 一定是讀到的內文。
+    """
+    cache = get_scan_cache(cache_path) if cache_path else None
+    cached = cache.get(message_id) if cache is not None else None
+    if not need_body and cached is not None and "link" in cached:
+        return {"body": None, "link": cached["link"]}
+    gmail_service = build_gmail_service(creds, api_endpoint)
+    msg = gmail_service.users().messages().get(userId="me", id=message_id, format="full", fields=DETAIL_FIELDS).execute()
+    payload = msg.get("payload", {})
+    part = _find_text_part(payload, "text/plain") or _find_text_part(payload, "text/html")
+    body = _decode_body_data(part["body"]["data"], max_body_bytes) if part else ""
+    details = {"body": body, "link": find_meeting_link(body)}
+    if cached is not None:
+        cache.put(message_id, dict(cached, link=details["link"]))
+        cache.save()
+    return details
+
+def _fetch_and_parse_chunk(gmail_service, message_ids, http, batch_uri):
+    """
+    在 worker 執行緒中抓取一組郵件並解析，回傳與 message_ids 同順序的結果 (抓取失敗的為 None)。
+    httplib2 不是執行緒安全的，所以每個 worker 都用自己的 http 物件。
+    """
+    responses = {}
+    def metadata_request(message_id):
+        return gmail_service.users().messages().get(userId="me", id=message_id, format="metadata",
+                                                    metadataHeaders=METADATA_HEADERS, fields=METADATA_FIELDS)
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            print(f"抓取郵件 {request_id} 時發生錯誤: {exception}"); return
+        responses[request_id] = response
+    if len(message_ids) == 1:
+        # 只有一封時不必包成批次；失敗時與批次中的單封失敗一樣略過，不中斷整個掃描
+        try:
+            on_response(message_ids[0], metadata_request(message_ids[0]).execute(http=http), None)
+        except HttpError as error:
+            on_response(message_ids[0], None, error)
+    else:
+        batch = BatchHttpRequest(callback=on_response, batch_uri=batch_uri)
+        for message_id in message_ids:
+            batch.add(metadata_request(message_id), request_id=message_id)
+        batch.execute(http=http)
+    return [_parse_metadata_message(responses[mid]) if mid in responses else None for mid in message_ids]
+
+_scan_executors = {}
+def _scan_executor(max_workers):
+    # 執行緒池跨掃描重複使用，每條 worker 執行緒的持續連線 (_thread_http) 也就能一直沿用
+    max_workers = max(1, max_workers)
+    with _client_lock:
+        if max_workers not in _scan_executors:
+            _scan_executors[max_workers] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gmail-scan")
+        return _scan_executors[max_workers]
+
+_scan_caches = {}
+def get_scan_cache(cache_path=SCAN_CACHE_PATH):
+    """同一個快取檔在程式中只載入一次。"""
+    if cache_path not in _scan_caches:
+        _scan_caches[cache_path] = EmailScanCache(cache_path)
+    return _scan_caches[cache_path]
+
+def _mailbox_unchanged_since(gmail_service, history_id):
+    """
+    用一次 history.list 詢問 Gmail：history_id 之後信箱有沒有任何變動 (新信、已讀、刪除…)。
+    回傳 (是否沒有變動, 最新的 historyId)；history_id 太舊 (404) 時視為有變動。
+    """
+    try:
+        response = gmail_service.users().history().list(userId="me", startHistoryId=history_id, maxResults=1).execute()
+    except HttpError as error:
+        if error.resp.status == 404: return False, None
+        raise
+    return not response.get("history"), response.get("historyId", history_id)
+
 # --- 【重大升級】scan_potential_meeting_emails 函式 ---
-def scan_potential_meeting_emails(creds):
+@perf_metrics.timed("gmail_scan_seconds")
+def scan_potential_meeting_emails(creds, max_results=SCAN_MAX_RESULTS, batch_size=SCAN_BATCH_SIZE, max_workers=SCAN_MAX_WORKERS,
+                                  api_endpoint=None, use_cache=True, incremental=True, cache_path=SCAN_CACHE_PATH):
+    """
+    掃描收件匣中可能是會議邀約的未讀郵件。
+
+    郵件以 batch_size 封為一組用 Gmail 批次請求抓取 (只抓標題、寄件人與摘要)，最多 max_workers 組同時進行，
+    每組抓完就在同一個 worker 內解析；回傳結果維持 Gmail 列表的原始順序。
+    結果不含內文與連結，需要時對使用者選的那一封呼叫 fetch_email_details。
+
+    use_cache 時解析結果會存進本機快取 (email_scan_cache.py)，只下載快取中沒有的郵件；
+    incremental 時先用 Gmail historyId 確認信箱自上次掃描後是否有變動，沒有就只花這一個請求。
+    """
     try:
-        gmail_service = build("gmail", "v1", credentials=creds)
-        query = 'in:inbox is:unread ("約個時間" OR "開會" OR "會議" OR "討論一下")'
-        results = gmail_service.users().messages().list(userId="me", q=query, maxResults=30).execute()
+        gmail_service = build_gmail_service(creds, api_endpoint)
+        cache = get_scan_cache(cache_path) if use_cache else None
+        query_key = f"{MEETING_EMAIL_QUERY}|{max_results}"
+
+        if cache is not None and incremental and cache.history_id and cache.query == query_key:
+            unchanged, latest_history_id = _mailbox_unchanged_since(gmail_service, cache.history_id)
+            cached_results = cache.cached_results() if unchanged else None
+            if cached_results is not None:
+                print("信箱自上次掃描後沒有變動，使用快取結果。")
+                # 存下最新的 historyId：下次從這裡問起，舊的 id 放久了會過期 (404) 而被迫完整重掃
+                cache.history_id = latest_history_id
+                cache.save()
+                return cached_results
+
+        # 先記下目前的 historyId，列表之後才發生的變動下次仍會被偵測到
+        history_id = gmail_service.users().getProfile(userId="me").execute().get("historyId") if cache is not None else None
+        results = gmail_service.users().messages().list(userId="me", q=MEETING_EMAIL_QUERY, maxResults=max_results).execute()
         messages = results.get("messages", [])
 
-        if not messages: return []
-        
-        potential_meetings = []
-        for message in messages:
-            msg = gmail_service.users().messages().get(userId="me", id=message["id"], format="raw").execute()
-            raw_email = base64.urlsafe_b64decode(msg["raw"].encode("ASCII"))
-            email_message = email.message_from_bytes(raw_email)
-            
-            # 【修正亂碼】使用 decode_header 來正確解碼標題
-            subject_header = email_message.get("Subject", "無標題")
-            decoded_subject = decode_header(subject_header)
-            subject = str(make_header(decoded_subject))
-
-            sender_header = email_message.get("From", "未知寄件人")
-            decoded_sender = decode_header(sender_header)
-            sender = str(make_header(decoded_sender))
-            
-            # 【新增功能】解析郵件內文並尋找連結
-            body = ""
-            if email_message.is_multipart():
-                for part in email_message.walk():
-                    if part.get_content_type() == "text/plain":
-                        body = part.get_payload(decode=True).decode(part.get_content_charset() or 'utf-8', errors='ignore')
-                        break
-            else:
-                body = email_message.get_payload(decode=True).decode(email_message.get_content_charset() or 'utf-8', errors='ignore')
-
-            # 使用正規表示式尋找 http, https, meet.google.com, zoom.us 的連結
-            link_pattern = r'https?://[\w\./-]*'
-            found_link_match = re.search(link_pattern, body)
-            found_link = found_link_match.group(0) if found_link_match else ""
-
-            potential_meetings.append({
-                "subject": subject,
-                "sender": sender,
-                "snippet": msg.get("snippet", ""),
-                "link": found_link # <-- 把找到的連結也加進去
-            })
-        
+        if not messages:
+            if cache is not None: cache.remember_scan(query_key, history_id, []); cache.save()
+            return []
+
+        message_ids = [message["id"] for message in messages]
+        parsed_by_id = {}
+        if cache is not None:
+            for message_id in message_ids:
+                parsed = cache.get(message_id)
+                if parsed is not None: parsed_by_id[message_id] = parsed
+        to_fetch = [message_id for message_id in message_ids if message_id not in parsed_by_id]
+
+        if to_fetch:
+            batch_size = max(1, min(batch_size, 100))
+            chunks = [to_fetch[i:i + batch_size] for i in range(0, len(to_fetch), batch_size)]
+            batch_uri = _gmail_batch_uri(api_endpoint)
+
+            def worker(chunk):
+                return _fetch_and_parse_chunk(gmail_service, chunk, _thread_http(creds), batch_uri)
+
+            for chunk, parsed_chunk in zip(chunks, _scan_executor(max_workers).map(worker, chunks)):
+                for message_id, parsed in zip(chunk, parsed_chunk):
+                    if parsed is None: continue
+                    parsed_by_id[message_id] = parsed
+                    if cache is not None: cache.put(message_id, parsed)
+
+        # 依 Gmail 列表的原始順序組合結果
+        potential_meetings = [parsed_by_id[message_id] for message_id in message_ids if message_id in parsed_by_id]
+        if cache is not None:
+            cache.remember_scan(query_key, history_id, [m["message_id"] for m in potential_meetings])
+            cache.save()
         return potential_meetings
 
     except HttpError as error:
@@ -1,5 +1,10 @@
 # main_gui.py (最終版本 v2.7)
 
+# 啟動計時從這裡開始 (設定 STARTUP_TIMING=1 會在任務載入完成後印出各階段耗時)
+from time import perf_counter
+STARTUP_T0 = perf_counter()
+
+import os
 import sys
 import webbrowser
 import re
@@ -9,17 +14,24 @@ from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QListWidget, QLineEdit, QPushButton, QMessageBox, QListWidgetItem,
     QTabWidget, QDateEdit, QLabel, QMenu, QFileDialog,
-    QDialog, QDialogButtonBox, QCheckBox, QTimeEdit, QPlainTextEdit
+    QDialog, QDialogButtonBox, QCheckBox, QTimeEdit, QPlainTextEdit, QListView, QProgressDialog, QComboBox
 )
 from PyQt6.QtGui import QColor, QAction
-from PyQt6.QtCore import Qt, QDate
-
-# 從 googleapiclient 匯入 build，因為現在要在這裡建立 service
-from googleapiclient.discovery import build
+from PyQt6.QtCore import Qt, QDate, QTime, QTimer, QAbstractListModel, QModelIndex, QSortFilterProxyModel, QFileSystemWatcher, QObject, pyqtSignal
 
-from task_logic import TaskManager
-# 匯入我們重構後的函式
-from google_calendar_service import get_google_credentials, create_google_meet_event, scan_potential_meeting_emails
+from task_logic import TaskManager, TaskConflictError, parse_meeting_minutes_files, parse_meeting_minutes_dir, email_source
+from task_lock import TaskLockTimeout
+from background_tasks import BackgroundRunner
+from calendar_outbox import CalendarOutbox, OutboxWorker
+from due_scheduler import DueScheduler, REMIND, OVERDUE
+from run_daily_sync import sync_task_reminders
+from availability import FreeBusyCache, suggest_meeting_slots, calendar_now, SEARCH_DAYS
+from recurrence import describe_rule
+import perf_metrics
+# Google 相關套件 (google-auth、oauthlib、googleapiclient) 載入要好幾百毫秒，
+# 只在使用者第一次按「建立會議」或「掃描郵件」時才在背景工作裡匯入 google_calendar_service
+IMPORT_SECONDS = perf_counter() - STARTUP_T0
+DUE_TIMER_MAX_MS = 60 * 60 * 1000
 
 # --- 特製的中文輸入框 Class ---
 class PatchedPlainTextEdit(QPlainTextEdit):
@@ -27,15 +39,107 @@ class PatchedPlainTextEdit(QPlainTextEdit):
         super().focusInEvent(event)
         QApplication.instance().inputMethod().reset()
 
+# --- 任務清單的 Model / View ---
+STATUS_ROLE = Qt.ItemDataRole.UserRole + 1
+RECURRENCE_CHOICES = [("不重複", None), ("每天", {"freq": "daily"}), ("每週", {"freq": "weekly"}), ("每月", {"freq": "monthly"})]
+STATUS_BACKGROUNDS = {"已完成": QColor("#d4edda"), "進行中": QColor("#fff3cd")}
+DEFAULT_BACKGROUND = QColor("white"); DEFAULT_FOREGROUND = QColor("black"); OVERDUE_FOREGROUND = QColor("#dc3545")
+
+def task_item_data(task, role):
+    """任務清單 (各分頁與搜尋結果) 共用的顯示規則。"""
+    if role == Qt.ItemDataRole.DisplayRole:
+        due_date_str = f" (截止: {task.due_date})" if task.due_date else ""; meeting_icon = " 📹" if task.meeting_link else ""
+        if task.recurrence:
+            # 週期性任務只顯示一列：規則與下一個還沒完成的那一次 (當場算，不展開整個系列)
+            next_day = task.next_occurrence(date.today())
+            due_date_str = f" (🔁 {describe_rule(task.recurrence)}，" + (f"下次: {next_day.isoformat()})" if next_day else "已結束)")
+        return f"[{task.status}] {task.title}{due_date_str}{meeting_icon}"
+    if role == Qt.ItemDataRole.UserRole: return task.task_id
+    if role == STATUS_ROLE: return task.status
+    if role == Qt.ItemDataRole.BackgroundRole: return STATUS_BACKGROUNDS.get(task.status, DEFAULT_BACKGROUND)
+    if role == Qt.ItemDataRole.ForegroundRole:
+        if task.due and task.due < date.today() and task.status != "已完成" and not task.recurrence: return OVERDUE_FOREGROUND
+        return DEFAULT_FOREGROUND
+    return None
+
+class TaskListModel(QAbstractListModel):
+    """
+    四個分頁共用的單一任務 model，列的順序與 TaskManager.list_tasks() 相同。
+    TaskManager 每次異動只會讓這裡發出一列的 insert / dataChanged / remove，不再整份重建。
+    """
+    def __init__(self, task_manager, parent=None):
+        super().__init__(parent)
+        self.task_manager = task_manager
+        self._ids = task_manager.list_task_ids()
+        task_manager.add_listener(self.on_task_event)
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+    def task_at(self, row):
+        return self.task_manager.get_task(self._ids[row])
+    def status_at(self, row):
+        # 篩選分頁只需要狀態，二進位模式下不必為了篩選解碼每一筆任務
+        return self.task_manager.task_status(self._ids[row])
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        task = self.task_at(index.row())
+        return task_item_data(task, role) if task else None
+    def on_task_event(self, event, task, row):
+        if event == "added":
+            self.beginInsertRows(QModelIndex(), row, row); self._ids.insert(row, task.task_id); self.endInsertRows()
+        elif event == "updated":
+            index = self.index(row); self.dataChanged.emit(index, index)
+        elif event == "removed":
+            self.beginRemoveRows(QModelIndex(), row, row); del self._ids[row]; self.endRemoveRows()
+        elif event == "reset":
+            self.reset()
+    def refresh_task(self, task_id):
+        # 到期排程器觸發時只重畫那一列 (例如剛變成逾期)
+        task = self.task_manager.get_task(task_id); row = self.task_manager.task_row(task) if task else None
+        if row is not None: index = self.index(row); self.dataChanged.emit(index, index)
+    @perf_metrics.timed("gui_model_reset_seconds")
+    def reset(self):
+        self.beginResetModel(); self._ids = self.task_manager.list_task_ids(); self.endResetModel()
+
+class SearchResultsModel(QAbstractListModel):
+    """「搜尋」分頁的結果，只放全文索引找到的那幾筆任務 (依相關度排序)。"""
+    def __init__(self, task_manager, parent=None):
+        super().__init__(parent)
+        self.task_manager = task_manager
+        self._ids = []
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+    def task_at(self, row):
+        return self.task_manager.get_task(self._ids[row])
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        task = self.task_at(index.row())
+        return task_item_data(task, role) if task else None
+    def set_tasks(self, tasks):
+        self.beginResetModel(); self._ids = [task.task_id for task in tasks]; self.endResetModel()
+    def refresh_task(self, task_id):
+        if task_id in self._ids: index = self.index(self._ids.index(task_id)); self.dataChanged.emit(index, index)
+
+class StatusFilterProxyModel(QSortFilterProxyModel):
+    """只顯示某一個狀態的任務；來源列狀態改變時 Qt 只會重新判斷那一列。"""
+    def __init__(self, status, parent=None):
+        super().__init__(parent)
+        self.status = status
+    def filterAcceptsRow(self, source_row, source_parent):
+        return self.sourceModel().status_at(source_row) == self.status
+
 # --- 彈出視窗 Class 定義 ---
 class ImportPreviewDialog(QDialog):
-    def __init__(self, potential_tasks, parent=None):
+    def __init__(self, potential_tasks, parent=None, duplicates=None):
+        """:param duplicates: 與 potential_tasks 同樣長度的 bool list (見 TaskManager.mark_duplicates)；重複的預設不勾選。"""
         super().__init__(parent)
         self.setWindowTitle("預覽匯入任務"); self.setMinimumWidth(400)
         self.layout = QVBoxLayout(self); self.checkboxes = []
-        for task in potential_tasks:
+        duplicates = duplicates or [False] * len(potential_tasks)
+        if any(duplicates): self.layout.addWidget(QLabel(f"有 {sum(duplicates)} 項已經匯入過，預設不勾選。"))
+        for task, duplicate in zip(potential_tasks, duplicates):
             due_date_str = f" (截止: {task['due_date']})" if task['due_date'] else ""
-            checkbox = QCheckBox(f"{task['title']}{due_date_str}"); checkbox.setChecked(True)
+            checkbox = QCheckBox(f"{task['title']}{due_date_str}{'（已存在）' if duplicate else ''}"); checkbox.setChecked(not duplicate)
+            if duplicate: checkbox.setStyleSheet("color: gray;")
             self.layout.addWidget(checkbox); self.checkboxes.append((checkbox, task))
         self.buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         self.buttons.accepted.connect(self.accept); self.buttons.rejected.connect(self.reject)
@@ -61,25 +165,42 @@ class QuickCaptureDialog(QDialog):
         if title and self.main_window:
             self.main_window.task_manager.add_task(title)
             self.capture_input.clear()
-            self.main_window.refresh_all_lists()
+
+class OutboxSignals(QObject):
+    """把日曆待送佇列 worker 執行緒的結果轉回主執行緒。"""
+    created = pyqtSignal(object, object); failed = pyqtSignal(object, object)
+
+def submit_calendar_requests(entries):
+    # 在 worker 執行緒中執行，Google 套件到真的要送出時才載入
+    from google_calendar_service import get_google_credentials, build_calendar_service, insert_calendar_events
+    creds = get_google_credentials()
+    if not creds: raise RuntimeError("無法獲取 Google 憑證。")
+    return insert_calendar_events(build_calendar_service(creds), entries)
 
 class EmailScanResultDialog(QDialog):
-    def __init__(self, potential_emails, parent=None):
+    def __init__(self, potential_emails, parent=None, load_details=None, existing_task=None):
+        """:param existing_task: existing_task(email_data) 回傳已經從這封郵件建立的 Task (沒有時為 None)，用來標示已處理過的郵件。"""
         super().__init__(parent)
         self.setWindowTitle("掃描到的會議建議"); self.setMinimumSize(500, 300)
         self.layout = QVBoxLayout(self); self.email_list_widget = QListWidget()
         self.selected_email_data = None
+        # 掃描結果只有標題、寄件人與摘要；點到哪一封才用 load_details(email_data, callback) 讀內文找連結
+        self.load_details = load_details; self.detail_label = QLabel(""); self.detail_label.setWordWrap(True)
+        self.email_list_widget.currentItemChanged.connect(self.on_current_email_changed)
         if not potential_emails:
             self.layout.addWidget(QLabel("在您的收件匣中找不到符合條件的未讀郵件。"))
         else:
             for email_data in potential_emails:
                 subject = email_data.get("subject", "無標題"); sender = email_data.get("sender", "未知寄件人")
                 display_text = f"標題: {subject}\n來自: {sender}"
+                task = existing_task(email_data) if existing_task else None
+                if task: display_text += f"\n（已建立任務「{task.title}」）"
                 item = QListWidgetItem(display_text)
+                if task: item.setForeground(QColor("gray"))
                 item.setData(Qt.ItemDataRole.UserRole, email_data)
                 self.email_list_widget.addItem(item)
             self.layout.addWidget(QLabel("請選擇一封郵件，以自動帶入資訊："))
-            self.layout.addWidget(self.email_list_widget)
+            self.layout.addWidget(self.email_list_widget); self.layout.addWidget(self.detail_label)
         self.buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         self.buttons.accepted.connect(self.accept); self.buttons.rejected.connect(self.reject)
         self.layout.addWidget(self.buttons)
@@ -89,14 +210,34 @@ class EmailScanResultDialog(QDialog):
         super().accept()
     def get_selected_email(self):
         return self.selected_email_data
+    def on_current_email_changed(self, item, _previous):
+        if item is None or not self.load_details: return
+        email_data = item.data(Qt.ItemDataRole.UserRole)
+        if "link" in email_data: self.show_email_details(email_data); return
+        self.detail_label.setText("正在讀取郵件內容...")
+        self.load_details(email_data, lambda details: self.on_details_loaded(item, details))
+    def on_details_loaded(self, item, details):
+        email_data = dict(item.data(Qt.ItemDataRole.UserRole), link=details["link"]); item.setData(Qt.ItemDataRole.UserRole, email_data)
+        if self.email_list_widget.currentItem() is item: self.show_email_details(email_data)
+    def show_email_details(self, email_data):
+        self.detail_label.setText(f"會議連結: {email_data['link']}" if email_data.get("link") else "郵件中沒有找到連結。")
 
 # --- 主應用程式 Class ---
 class TaskManagerApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, task_manager=None):
         super().__init__()
-        self.task_manager = TaskManager()
+        # 視窗先顯示，任務庫在背景讀取，讀完再一次填入清單
+        self.task_manager = task_manager or TaskManager(lazy=True)
+        self.task_model = TaskListModel(self.task_manager, self)
+        self.background = BackgroundRunner()
+        self.startup_timings = {"import_s": IMPORT_SECONDS}; perf_metrics.observe("gui_startup_seconds", IMPORT_SECONDS, phase="import")
         self.initUI()
-        self.refresh_all_lists()
+        self.load_tasks_in_background()
+        self.watch_task_store()
+        self.start_calendar_outbox()
+        self.start_due_scheduler()
+        self.freebusy_cache = FreeBusyCache()
+        self.pending_source = None  # 從郵件帶入資訊後，下一筆新增的任務的來源
 
     def initUI(self):
         self.setWindowTitle("智慧任務排程與進度追蹤器 v2.7")
@@ -104,50 +245,173 @@ class TaskManagerApp(QMainWindow):
         self.tabs = QTabWidget()
         self.tab_all = QWidget(); self.tab_todo = QWidget(); self.tab_inprogress = QWidget(); self.tab_done = QWidget()
         self.tabs.addTab(self.tab_all, "全部"); self.tabs.addTab(self.tab_todo, "待辦"); self.tabs.addTab(self.tab_inprogress, "進行中"); self.tabs.addTab(self.tab_done, "已完成")
-        self.list_all = self.create_list_widget(); self.list_todo = self.create_list_widget(); self.list_inprogress = self.create_list_widget(); self.list_done = self.create_list_widget()
+        self.tab_search = QWidget(); self.tabs.addTab(self.tab_search, "🔍 搜尋")
+        self.search_model = SearchResultsModel(self.task_manager, self); self.list_search = self.create_list_widget(self.search_model); self.setup_tab_layout(self.tab_search, self.list_search)
+        self.search_input = QLineEdit(); self.search_input.setPlaceholderText("🔍 搜尋任務標題或說明..."); self.search_input.setClearButtonEnabled(True)
+        # 打字時稍等一下再查，避免每個按鍵都查一次
+        self.search_timer = QTimer(self); self.search_timer.setSingleShot(True); self.search_timer.setInterval(150); self.search_timer.timeout.connect(self.run_search)
+        self.search_input.textChanged.connect(lambda _: self.search_timer.start())
+        self.task_manager.add_listener(lambda event, task, row: self.search_timer.start() if self.search_input.text().strip() else None)
+        self.status_proxies = {status: StatusFilterProxyModel(status, self) for status in ("待辦", "進行中", "已完成")}
+        for proxy in self.status_proxies.values(): proxy.setSourceModel(self.task_model)
+        self.list_all = self.create_list_widget(self.task_model); self.list_todo = self.create_list_widget(self.status_proxies["待辦"]); self.list_inprogress = self.create_list_widget(self.status_proxies["進行中"]); self.list_done = self.create_list_widget(self.status_proxies["已完成"])
         self.setup_tab_layout(self.tab_all, self.list_all); self.setup_tab_layout(self.tab_todo, self.list_todo); self.setup_tab_layout(self.tab_inprogress, self.list_inprogress); self.setup_tab_layout(self.tab_done, self.list_done)
         self.task_input = QLineEdit(); self.task_input.setPlaceholderText("在這裡輸入任務標題...")
         self.link_input = QLineEdit(); self.link_input.setPlaceholderText("貼上會議連結 (或由下方自動建立)...")
         self.attendees_input = QLineEdit(); self.attendees_input.setPlaceholderText("輸入與會者 Email，用逗號分隔...")
         self.description_input = PatchedPlainTextEdit(); self.description_input.setPlaceholderText("請在此輸入會議說明或議程..."); self.description_input.setFixedHeight(80)
         self.due_date_edit = QDateEdit(calendarPopup=True); self.due_date_edit.setDate(QDate.currentDate())
+        self.repeat_combo = QComboBox()
+        for label, rule in RECURRENCE_CHOICES: self.repeat_combo.addItem(label, rule)
         self.meet_start_time_edit = QTimeEdit(); self.meet_end_time_edit = QTimeEdit()
-        self.create_meet_button = QPushButton("📅 自動建立會議"); self.add_button = QPushButton("新增任務"); self.import_button = QPushButton("從會議記錄匯入"); self.meeting_mode_button = QPushButton("會議模式"); self.scan_emails_button = QPushButton("📧 掃描郵件建議")
+        self.create_meet_button = QPushButton("📅 自動建立會議"); self.suggest_time_button = QPushButton("🕒 建議時間"); self.add_button = QPushButton("新增任務"); self.import_button = QPushButton("從會議記錄匯入"); self.meeting_mode_button = QPushButton("會議模式"); self.scan_emails_button = QPushButton("📧 掃描郵件建議")
         main_layout = QVBoxLayout()
-        input_layout_1 = QHBoxLayout(); input_layout_1.addWidget(QLabel("任務:")); input_layout_1.addWidget(self.task_input); input_layout_1.addWidget(QLabel("會議日期:")); input_layout_1.addWidget(self.due_date_edit)
+        input_layout_1 = QHBoxLayout(); input_layout_1.addWidget(QLabel("任務:")); input_layout_1.addWidget(self.task_input); input_layout_1.addWidget(QLabel("會議日期:")); input_layout_1.addWidget(self.due_date_edit); input_layout_1.addWidget(self.repeat_combo)
         input_layout_2 = QHBoxLayout(); input_layout_2.addWidget(QLabel("會議時間:")); input_layout_2.addWidget(self.meet_start_time_edit); input_layout_2.addWidget(QLabel("到")); input_layout_2.addWidget(self.meet_end_time_edit); input_layout_2.addWidget(QLabel("連結:")); input_layout_2.addWidget(self.link_input)
         input_layout_3 = QHBoxLayout(); input_layout_3.addWidget(QLabel("邀請:")); input_layout_3.addWidget(self.attendees_input)
         description_layout = QVBoxLayout(); description_layout.addWidget(QLabel("會議說明:")); description_layout.addWidget(self.description_input)
-        button_layout = QHBoxLayout(); button_layout.addWidget(self.scan_emails_button); button_layout.addWidget(self.import_button); button_layout.addStretch(1); button_layout.addWidget(self.create_meet_button); button_layout.addWidget(self.add_button)
-        main_layout.addWidget(self.tabs); main_layout.addLayout(input_layout_1); main_layout.addLayout(input_layout_2); main_layout.addLayout(input_layout_3); main_layout.addLayout(description_layout); main_layout.addLayout(button_layout); main_layout.addStretch(1)
+        button_layout = QHBoxLayout(); button_layout.addWidget(self.scan_emails_button); button_layout.addWidget(self.import_button); button_layout.addStretch(1); button_layout.addWidget(self.suggest_time_button); button_layout.addWidget(self.create_meet_button); button_layout.addWidget(self.add_button)
+        main_layout.addWidget(self.search_input); main_layout.addWidget(self.tabs); main_layout.addLayout(input_layout_1); main_layout.addLayout(input_layout_2); main_layout.addLayout(input_layout_3); main_layout.addLayout(description_layout); main_layout.addLayout(button_layout); main_layout.addStretch(1)
         central_widget = QWidget(); central_widget.setLayout(main_layout); self.setCentralWidget(central_widget)
-        self.add_button.clicked.connect(self.handle_add_task); self.create_meet_button.clicked.connect(self.handle_create_meet); self.import_button.clicked.connect(self.handle_import_tasks); self.meeting_mode_button.clicked.connect(self.handle_meeting_mode); self.scan_emails_button.clicked.connect(self.handle_scan_emails); self.task_input.returnPressed.connect(self.handle_add_task)
+        import_menu = QMenu(self); self.import_button.setMenu(import_menu)
+        import_menu.addAction("選擇檔案...").triggered.connect(lambda: self.handle_import_tasks()); import_menu.addAction("匯入整個資料夾...").triggered.connect(lambda: self.handle_import_folder())
+        self.add_button.clicked.connect(self.handle_add_task); self.create_meet_button.clicked.connect(self.handle_create_meet); self.suggest_time_button.clicked.connect(self.handle_suggest_times); self.meeting_mode_button.clicked.connect(self.handle_meeting_mode); self.scan_emails_button.clicked.connect(self.handle_scan_emails); self.task_input.returnPressed.connect(self.handle_add_task)
 
-    def create_list_widget(self):
-        list_widget = QListWidget(); list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu); list_widget.customContextMenuRequested.connect(self.show_context_menu)
-        return list_widget
+    def load_tasks_in_background(self):
+        if self.task_manager.loaded: return
+        self.statusBar().showMessage("正在載入任務...")
+        self.background.start(lambda context: self.task_manager.prepare_indexes(), on_success=self.on_tasks_loaded,
+                              on_error=lambda error: self.statusBar().showMessage(f"載入任務失敗: {error}"))
+    def on_tasks_loaded(self, indexes):
+        self.task_manager.install_indexes(indexes)
+        self.statusBar().showMessage(f"已載入 {self.task_manager.count_tasks()} 項任務。", 3000)
+        self.record_startup_timing("tasks_loaded_s")
+    def record_startup_timing(self, name):
+        if name in self.startup_timings: return
+        self.startup_timings[name] = perf_counter() - STARTUP_T0
+        perf_metrics.observe("gui_startup_seconds", self.startup_timings[name], phase=name[:-2])
+        if name == "tasks_loaded_s" and os.environ.get("STARTUP_TIMING"):
+            print("啟動計時: " + ", ".join(f"{key}={value * 1000:.0f}ms" for key, value in self.startup_timings.items()))
+    def watch_task_store(self):
+        # 其他程式 (每日同步、另一個視窗) 寫入任務庫時，只把有變動的任務併進清單
+        self.store_watcher = QFileSystemWatcher(self); self.external_check_running = False
+        self.external_check_timer = QTimer(self); self.external_check_timer.setSingleShot(True); self.external_check_timer.setInterval(300); self.external_check_timer.timeout.connect(self.check_external_changes)
+        self.store_watcher.directoryChanged.connect(lambda _: self.external_check_timer.start()); self.store_watcher.fileChanged.connect(lambda _: self.external_check_timer.start())
+        self.update_watched_paths()
+    def update_watched_paths(self):
+        # 檔案被 os.replace 換掉後原本的監看會失效，每次檢查完都補回來
+        paths = [os.path.dirname(os.path.abspath(self.task_manager.filename))] + self.task_manager.data_paths()
+        watched = set(self.store_watcher.files()) | set(self.store_watcher.directories())
+        missing = [path for path in paths if os.path.exists(path) and path not in watched]
+        if missing: self.store_watcher.addPaths(missing)
+    def check_external_changes(self):
+        # 讀檔與比對在背景進行，套用 (逐筆更新 model) 回到主執行緒
+        if self.external_check_running: self.external_check_timer.start(); return
+        self.external_check_running = True
+        def on_finished(): self.external_check_running = False; self.update_watched_paths()
+        self.background.start(lambda context: self.task_manager.check_external_changes(), on_success=self.apply_external_changes,
+                              on_error=lambda error: print(f"檢查任務庫變動時發生錯誤: {error}"), on_finished=on_finished)
+    def apply_external_changes(self, changes):
+        count = self.task_manager.apply_external_changes(changes)
+        if count: self.statusBar().showMessage(f"已同步其他程式對 {count} 項任務的變更。", 3000)
+    def start_calendar_outbox(self):
+        # 建立會議的請求先存進待送佇列，由背景 worker 送出 (失敗自動重試)，建好後把連結寫回任務
+        self.calendar_outbox = CalendarOutbox(); self.outbox_signals = OutboxSignals(self)
+        self.outbox_signals.created.connect(self.on_meeting_created); self.outbox_signals.failed.connect(self.on_meeting_failed)
+        self.outbox_worker = OutboxWorker(self.calendar_outbox, submit_calendar_requests,
+                                          on_created=self.outbox_signals.created.emit, on_failed=self.outbox_signals.failed.emit).start()
+        if len(self.calendar_outbox): self.statusBar().showMessage(f"有 {len(self.calendar_outbox)} 個會議尚未建立，將在背景繼續送出。", 5000)
+    def on_meeting_created(self, entry, event):
+        link = event.get("hangoutLink") or event.get("htmlLink", "")
+        if self.write_tasks(lambda: self.task_manager.set_meeting_link(entry["task_id"], link)):
+            self.statusBar().showMessage(f"會議「{entry['summary']}」已建立，連結已寫入任務。", 5000)
+        else:
+            QMessageBox.information(self, "會議已建立", f"會議「{entry['summary']}」已建立，但對應的任務已被刪除。\n會議連結: {link}")
+    def start_due_scheduler(self):
+        # 到期提醒與逾期變色：最小堆積排好下一個到期事件，計時器只在那一刻醒來，任務異動時只增量更新
+        self.due_scheduler = DueScheduler()
+        self.due_timer = QTimer(self); self.due_timer.setSingleShot(True); self.due_timer.timeout.connect(self.fire_due_events)
+        self.task_manager.add_listener(self.on_task_event_for_schedule)
+        self.rebuild_due_schedule()
+    def rebuild_due_schedule(self):
+        self.due_scheduler.rebuild(self.task_manager.due_task_ids_from(date.today())); self.arm_due_timer()
+    def on_task_event_for_schedule(self, event, task, row):
+        if event == "reset": self.rebuild_due_schedule(); return
+        if event == "removed": self.due_scheduler.unschedule(task.task_id); return
+        self.schedule_task_due(task)
+    def schedule_task_due(self, task):
+        # 週期性任務只排下一個還沒完成的那一次
+        next_day = task.next_occurrence(date.today()) if task.recurrence else task.due
+        if self.due_scheduler.schedule(task.task_id, next_day.isoformat() if next_day else None, done=task.status == "已完成"): self.arm_due_timer()
+    def arm_due_timer(self):
+        next_fire_at = self.due_scheduler.next_fire_at()
+        if next_fire_at is None: self.due_timer.stop(); return
+        # 最多睡一小時就重新對時 (電腦休眠、調整系統時間後不會錯過太久)
+        delay_ms = (next_fire_at - datetime.now()).total_seconds() * 1000
+        self.due_timer.start(int(min(max(delay_ms, 0), DUE_TIMER_MAX_MS)) + 1)
+    def fire_due_events(self):
+        reminders = []
+        for kind, task_id, due_date in self.due_scheduler.pop_due():
+            task = self.task_manager.get_task(task_id)
+            if not task: continue
+            if kind == OVERDUE:
+                self.task_model.refresh_task(task_id); self.search_model.refresh_task(task_id)
+                if task.recurrence: self.schedule_task_due(task)  # 接著排下一次
+            elif kind == REMIND: reminders.append((task, due_date))
+        if reminders:
+            self.show_due_reminders([task for task, _ in reminders])
+            # 同時寫進「提醒事項」(與每日同步共用同步紀錄，cron 再跑一次也不會重複)；週期性任務以那一次的日期記錄
+            task_dicts = [dict(task.to_dict(), due_date=due_date) for task, due_date in reminders]
+            self.background.start(lambda context: sync_task_reminders(task_dicts), on_error=lambda error: print(f"建立提醒事項時發生錯誤: {error}"))
+        self.arm_due_timer()
+    def show_due_reminders(self, tasks):
+        titles = "\n".join(f"• {task.title}" for task in tasks[:20]) + (f"\n…等共 {len(tasks)} 項" if len(tasks) > 20 else "")
+        self.statusBar().showMessage(f"⏰ 今天有 {len(tasks)} 項任務到期。", 10000); QApplication.alert(self)
+        # 不用 exec()：提醒視窗不擋住主視窗的操作
+        box = QMessageBox(QMessageBox.Icon.Information, "任務到期提醒", f"今天到期的任務:\n{titles}", QMessageBox.StandardButton.Ok, self)
+        box.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose); box.setModal(False); box.show()
+    def on_meeting_failed(self, entry, message):
+        QMessageBox.warning(self, "無法建立會議", f"會議「{entry['summary']}」無法建立: {message}")
+    def write_tasks(self, action):
+        """執行會寫入任務庫的動作；任務已被其他程式改過或任務庫被鎖住時提示使用者，而不是讓程式當掉。"""
+        try:
+            return action()
+        except TaskConflictError as e:
+            QMessageBox.warning(self, "任務已被修改", f"{e}\n清單已更新為最新內容，請確認後再操作一次。")
+        except TaskLockTimeout as e:
+            QMessageBox.warning(self, "任務庫忙碌中", str(e))
+        return None
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        self.record_startup_timing("first_paint_s")
+    def create_list_widget(self, model):
+        # QListView + 固定列高：只會向 model 要畫面上看得到的那幾列 (虛擬化)
+        list_view = QListView(); list_view.setModel(model); list_view.setUniformItemSizes(True)
+        list_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu); list_view.customContextMenuRequested.connect(self.show_context_menu)
+        return list_view
     def setup_tab_layout(self, tab, list_widget):
         layout = QVBoxLayout(); layout.addWidget(list_widget); tab.setLayout(layout)
+    @perf_metrics.timed("gui_search_seconds")
+    def run_search(self):
+        query = self.search_input.text().strip()
+        if not query: self.search_model.set_tasks([]); return
+        self.search_model.set_tasks(self.task_manager.search_tasks(query))
+        if self.sender() is self.search_timer and self.search_input.hasFocus(): self.tabs.setCurrentWidget(self.tab_search)
+    @perf_metrics.timed("gui_refresh_seconds")
     def refresh_all_lists(self):
-        all_tasks = self.task_manager.list_tasks(); self.list_all.clear(); self.list_todo.clear(); self.list_inprogress.clear(); self.list_done.clear()
-        for task in all_tasks:
-            item = QListWidgetItem(); self.update_item_display(item, task); self.list_all.addItem(item.clone())
-            if task.status == "待辦": self.list_todo.addItem(item.clone())
-            elif task.status == "進行中": self.list_inprogress.addItem(item.clone())
-            elif task.status == "已完成": self.list_done.addItem(item.clone())
-    def update_item_display(self, item, task):
-        due_date_str = f" (截止: {task.due_date})" if task.due_date else ""; meeting_icon = " 📹" if task.meeting_link else ""
-        item.setText(f"[{task.status}] {task.title}{due_date_str}{meeting_icon}"); item.setData(Qt.ItemDataRole.UserRole, task.task_id)
-        item.setBackground(QColor("white")); item.setForeground(QColor("black"))
-        if task.status == "已完成": item.setBackground(QColor("#d4edda"))
-        elif task.status == "進行中": item.setBackground(QColor("#fff3cd"))
-        if task.due_date and date.fromisoformat(task.due_date) < date.today() and task.status != "已完成": item.setForeground(QColor("#dc3545"))
+        # 平常的異動都由 TaskListModel 逐列更新；只有整份任務庫換掉時才需要重建
+        self.task_model.reset()
     def handle_add_task(self):
         title = self.task_input.text().strip()
         if not title: QMessageBox.warning(self, "輸入錯誤", "任務標題不能為空！"); return
         due_date = self.due_date_edit.date().toString("yyyy-MM-dd"); link = self.link_input.text().strip()
-        self.task_manager.add_task(title, due_date=due_date, meeting_link=link)
-        self.task_input.clear(); self.link_input.clear(); self.attendees_input.clear(); self.description_input.clear(); self.refresh_all_lists()
+        if not self.write_tasks(lambda: self.task_manager.add_task(title, due_date=due_date, meeting_link=link, recurrence=self.selected_recurrence(), source=self.pending_source)): return
+        self.pending_source = None
+        self.task_input.clear(); self.link_input.clear(); self.attendees_input.clear(); self.description_input.clear(); self.repeat_combo.setCurrentIndex(0)
+    def selected_recurrence(self):
+        # 「每週」以選擇的日期那一天為準 (例如選了週三就是每週三)
+        rule = self.repeat_combo.currentData()
+        return dict(rule) if rule else None
 
     def handle_create_meet(self):
         title = self.task_input.text().strip()
@@ -156,58 +420,131 @@ class TaskManagerApp(QMainWindow):
         start_qtime = self.meet_start_time_edit.time().toPyTime(); end_qtime = self.meet_end_time_edit.time().toPyTime()
         start_time = datetime.combine(selected_date, start_qtime); end_time = datetime.combine(selected_date, end_qtime)
         if end_time <= start_time: QMessageBox.warning(self, "時間錯誤", "結束時間必須晚於開始時間！"); return
-        attendees_text = self.attendees_input.text().strip()
-        attendees = [email.strip() for email in attendees_text.split(',') if email.strip()]
+        attendees = self.parse_attendees()
         description = self.description_input.toPlainText().strip()
-        try:
-            print("正在獲取 Google Credentials...")
-            creds = get_google_credentials()
-            if not creds: QMessageBox.critical(self, "錯誤", "無法獲取 Google 憑證。"); return
-            
-            calendar_service = build("calendar", "v3", credentials=creds)
-            
-            QMessageBox.information(self, "處理中", "正在為您建立 Google Meet 會議並發送邀請，請稍候...")
-            meet_link = create_google_meet_event(calendar_service, title, start_time, end_time, attendees=attendees, description=description)
-            
-            if meet_link:
-                self.link_input.setText(meet_link)
-                QMessageBox.information(self, "成功", f"會議建立且邀請已發送！\n連結已自動填入，請記得按下「新增任務」來儲存。")
-            else:
-                QMessageBox.warning(self, "失敗", "無法建立 Google Meet 會議，請檢查終端機的錯誤訊息。")
-        except Exception as e:
-            QMessageBox.critical(self, "發生預期外的錯誤", f"發生錯誤: {e}")
-            print(f"處理 handle_create_meet 時發生錯誤: {e}")
+
+        # 先建立任務，會議交給待送佇列；活動建好後 Meet 連結會自動寫進這個任務
+        recurrence = self.selected_recurrence()
+        task = self.write_tasks(lambda: self.task_manager.add_task(title, description=description, due_date=selected_date.isoformat(), recurrence=recurrence,
+                                                                   source=self.pending_source))
+        if not task: return
+        self.pending_source = None
+        self.calendar_outbox.enqueue(task.task_id, title, start_time, end_time, attendees=attendees, description=description,
+                                     recurrence=task.recurrence); self.outbox_worker.wake()
+        self.freebusy_cache.invalidate(["primary"] + attendees)  # 這些人的行事曆馬上就會多一個會議
+        self.task_input.clear(); self.link_input.clear(); self.attendees_input.clear(); self.description_input.clear(); self.repeat_combo.setCurrentIndex(0)
+        self.statusBar().showMessage(f"已新增任務「{title}」，正在背景建立會議並發送邀請，完成後連結會自動填入。", 5000)
+
+    def parse_attendees(self):
+        return [email.strip() for email in self.attendees_input.text().split(',') if email.strip()]
+
+    def handle_suggest_times(self):
+        # 一次查出自己與所有與會者的忙碌區間 (快取還有效的行事曆不再查)，找出最早的共同空檔
+        selected_date = self.due_date_edit.date().toPyDate()
+        start_qtime = self.meet_start_time_edit.time().toPyTime(); end_qtime = self.meet_end_time_edit.time().toPyTime()
+        duration = datetime.combine(selected_date, end_qtime) - datetime.combine(selected_date, start_qtime)
+        if duration <= timedelta(0): duration = timedelta(minutes=30)  # 還沒設定時間時先以 30 分鐘找
+        window_start = max(calendar_now(), datetime.combine(selected_date, time()))
+        window_end = datetime.combine(selected_date + timedelta(days=SEARCH_DAYS), time())
+        calendar_ids = ["primary"] + self.parse_attendees()
+
+        def job(context):
+            def query(missing, start, end):
+                context.report("正在查詢與會者的空閒時段...")
+                from google_calendar_service import get_google_credentials, build_calendar_service, query_freebusy
+                creds = get_google_credentials()
+                if not creds: raise RuntimeError("無法獲取 Google 憑證。")
+                context.check_cancelled()
+                return query_freebusy(build_calendar_service(creds), missing, start, end)
+            return suggest_meeting_slots(calendar_ids, duration, window_start, window_end, query, self.freebusy_cache)
+
+        self.run_in_background("查詢空閒時段", job, self.show_slot_suggestions, self.suggest_time_button)
+
+    def show_slot_suggestions(self, result):
+        slots, errors = result
+        if errors: self.statusBar().showMessage(f"無法查詢 {', '.join(errors)} 的行事曆，已當作有空。", 8000)
+        if not slots: QMessageBox.information(self, "沒有共同空檔", f"接下來 {SEARCH_DAYS} 天的上班時間內找不到所有人都有空的時段。"); return
+        weekdays = "一二三四五六日"
+        menu = QMenu(self)
+        for start, end in slots:
+            action = menu.addAction(f"{start:%m/%d} ({weekdays[start.weekday()]}) {start:%H:%M} – {end:%H:%M}")
+            action.triggered.connect(lambda checked=False, start=start, end=end: self.apply_meeting_slot(start, end))
+        menu.exec(self.suggest_time_button.mapToGlobal(self.suggest_time_button.rect().bottomLeft()))
+    def apply_meeting_slot(self, start, end):
+        self.due_date_edit.setDate(QDate(start.year, start.month, start.day))
+        self.meet_start_time_edit.setTime(QTime(start.hour, start.minute)); self.meet_end_time_edit.setTime(QTime(end.hour, end.minute))
 
     def handle_scan_emails(self):
-        QMessageBox.information(self, "處理中", "正在掃描您的 Gmail 收件匣，請稍候...")
-        try:
+        def job(context):
+            context.report("正在獲取 Google 憑證...")
+            from google_calendar_service import get_google_credentials, scan_potential_meeting_emails
+            creds = get_google_credentials()
+            if not creds: raise RuntimeError("無法獲取 Google 憑證。")
+            context.check_cancelled()
+            context.report("正在掃描您的 Gmail 收件匣，請稍候...")
+            return scan_potential_meeting_emails(creds)
+
+        self.run_in_background("掃描郵件", job, self.show_email_scan_results, self.scan_emails_button)
+
+    def show_email_scan_results(self, potential_emails):
+        dialog = EmailScanResultDialog(potential_emails, self, load_details=self.load_email_details,
+                                       existing_task=lambda email_data: self.task_manager.task_for_source(email_source(email_data["message_id"])) if email_data.get("message_id") else None)
+
+        if dialog.exec():
+            selected_email = dialog.get_selected_email()
+            if selected_email:
+                self.task_input.setText(selected_email.get("subject", ""))
+                # 接下來新增的任務記下是從這封郵件來的，下次掃描就會標示出來
+                self.pending_source = email_source(selected_email["message_id"]) if selected_email.get("message_id") else None
+
+                sender_full = selected_email.get("sender", "")
+                sender_email = self._parse_email_from_sender(sender_full)
+                self.attendees_input.setText(sender_email)
+
+                self.description_input.setPlainText(selected_email.get("snippet", ""))
+
+                # 【新增】如果郵件內文有連結，就自動填入 (對話框裡還沒讀到的話現在才讀)
+                if "link" in selected_email: self.fill_email_link(selected_email)
+                else: self.load_email_details(selected_email, self.fill_email_link)
+
+                QMessageBox.information(self, "帶入成功", "郵件資訊已成功帶入，請設定會議時間。")
+
+    def load_email_details(self, email_data, on_loaded):
+        """在背景找出一封郵件的會議連結，完成後在主執行緒呼叫 on_loaded({"body", "link"}) (只用到連結，已快取時 body 為 None)。"""
+        def job(context):
+            from google_calendar_service import get_google_credentials, fetch_email_details
             creds = get_google_credentials()
-            if not creds:
-                QMessageBox.critical(self, "錯誤", "無法獲取 Google 憑證。"); return
-
-            potential_emails = scan_potential_meeting_emails(creds)
-            dialog = EmailScanResultDialog(potential_emails, self)
-            
-            if dialog.exec():
-                selected_email = dialog.get_selected_email()
-                if selected_email:
-                    self.task_input.setText(selected_email.get("subject", ""))
-                    
-                    sender_full = selected_email.get("sender", "")
-                    sender_email = self._parse_email_from_sender(sender_full)
-                    self.attendees_input.setText(sender_email)
-                    
-                    self.description_input.setPlainText(selected_email.get("snippet", ""))
-
-                    # 【新增】如果掃描結果包含連結，就自動填入
-                    found_link = selected_email.get("link", "")
-                    if found_link:
-                        self.link_input.setText(found_link)
-                    
-                    QMessageBox.information(self, "帶入成功", "郵件資訊已成功帶入，請設定會議時間。")
-        except Exception as e:
-            QMessageBox.critical(self, "發生預期外的錯誤", f"掃描郵件時發生錯誤: {e}")
-            print(f"處理 handle_scan_emails 時發生錯誤: {e}")
+            if not creds: raise RuntimeError("無法獲取 Google 憑證。")
+            return fetch_email_details(creds, email_data["message_id"], need_body=False)
+        self.background.start(job, on_success=on_loaded, on_error=lambda error: print(f"讀取郵件內容時發生錯誤: {error}"))
+
+    def fill_email_link(self, details):
+        if details.get("link"): self.link_input.setText(details["link"])
+
+    def run_in_background(self, title, job, on_success, button=None):
+        """
+        在背景執行緒執行 job(context)，期間顯示可取消的進度視窗並停用觸發的按鈕；
+        完成後 on_success(result) 會在主執行緒被呼叫。
+        """
+        progress = QProgressDialog("處理中，請稍候...", "取消", 0, 0, self)
+        progress.setWindowTitle(title); progress.setWindowModality(Qt.WindowModality.NonModal); progress.setMinimumDuration(0)
+        if button: button.setEnabled(False)
+        started = perf_counter()
+
+        def on_error(error):
+            QMessageBox.critical(self, "發生預期外的錯誤", f"{title}時發生錯誤: {error}")
+            print(f"背景工作「{title}」發生錯誤: {error}")
+
+        def on_finished():
+            perf_metrics.observe("gui_background_job_seconds", perf_counter() - started, job=title)
+            progress.reset(); progress.deleteLater()
+            if button: button.setEnabled(True)
+
+        task = self.background.start(job, on_success=on_success, on_error=on_error, on_progress=progress.setLabelText,
+                                     on_cancelled=lambda: print(f"已取消「{title}」。"), on_finished=on_finished)
+        progress.canceled.connect(task.cancel)
+        progress.show()
+        return task
 
     def _parse_email_from_sender(self, sender_full):
         match = re.search(r'<(.+?)>', sender_full)
@@ -215,46 +552,68 @@ class TaskManagerApp(QMainWindow):
         return sender_full
 
     def show_context_menu(self, pos):
-        list_widget = self.sender(); item = list_widget.itemAt(pos)
-        if not item: return
-        task_id = item.data(Qt.ItemDataRole.UserRole); task = self.task_manager.get_task(task_id)
+        list_widget = self.sender(); index = list_widget.indexAt(pos)
+        if not index.isValid(): return
+        task_id = index.data(Qt.ItemDataRole.UserRole); task = self.task_manager.get_task(task_id)
         if not task: return
+        version = task.version  # 選單打開時看到的版本；期間被其他程式改過就拒絕這次操作
         menu = QMenu()
         if task.meeting_link:
             join_action = menu.addAction("➡️ 加入會議"); join_action.triggered.connect(lambda: self.handle_join_meeting(task.meeting_link)); menu.addSeparator()
+        next_day = task.next_occurrence(date.today()) if task.recurrence and task.status != "已完成" else None
+        if next_day:
+            done_once_action = menu.addAction(f"完成這一次 ({next_day.isoformat()})"); done_once_action.triggered.connect(lambda: self.set_occurrence_status(task_id, next_day, "已完成", version)); menu.addSeparator()
         if task.status != "待辦":
-            set_todo_action = menu.addAction("設定為「待辦」"); set_todo_action.triggered.connect(lambda: self.set_task_status(task_id, "待辦"))
+            set_todo_action = menu.addAction("設定為「待辦」"); set_todo_action.triggered.connect(lambda: self.set_task_status(task_id, "待辦", version))
         if task.status != "進行中":
-            set_inprogress_action = menu.addAction("設定為「進行中」"); set_inprogress_action.triggered.connect(lambda: self.set_task_status(task_id, "進行中"))
+            set_inprogress_action = menu.addAction("設定為「進行中」"); set_inprogress_action.triggered.connect(lambda: self.set_task_status(task_id, "進行中", version))
         if task.status != "已完成":
-            set_done_action = menu.addAction("設定為「已完成」"); set_done_action.triggered.connect(lambda: self.set_task_status(task_id, "已完成"))
+            set_done_action = menu.addAction("設定為「已完成」"); set_done_action.triggered.connect(lambda: self.set_task_status(task_id, "已完成", version))
         menu.addSeparator()
-        delete_action = menu.addAction("刪除任務"); delete_action.triggered.connect(lambda: self.handle_delete_task(task_id))
+        delete_action = menu.addAction("刪除任務"); delete_action.triggered.connect(lambda: self.handle_delete_task(task_id, version))
         menu.exec(list_widget.mapToGlobal(pos))
     def handle_join_meeting(self, link):
         if not link.startswith("http"): link = "https://" + link
         webbrowser.open(link)
-    def set_task_status(self, task_id, status):
-        self.task_manager.update_task_status(task_id, status); self.refresh_all_lists()
-    def handle_delete_task(self, task_id):
-        self.task_manager.delete_task(task_id); self.refresh_all_lists()
+    def set_task_status(self, task_id, status, version=None):
+        self.write_tasks(lambda: self.task_manager.update_task_status(task_id, status, expected_version=version))
+    def set_occurrence_status(self, task_id, day, status, version=None):
+        self.write_tasks(lambda: self.task_manager.set_occurrence_status(task_id, day, status, expected_version=version))
+    def handle_delete_task(self, task_id, version=None):
+        self.write_tasks(lambda: self.task_manager.delete_task(task_id, expected_version=version))
     def handle_import_tasks(self):
-        filepath, _ = QFileDialog.getOpenFileName(self,"選擇會議記錄檔案","","Text Files (*.txt);;All Files (*)")
-        if not filepath: return
-        potential_tasks = self.task_manager.parse_meeting_minutes(filepath)
+        filepaths, _ = QFileDialog.getOpenFileNames(self,"選擇會議記錄檔案","","Text Files (*.txt);;All Files (*)")
+        if not filepaths: return
+        if len(filepaths) == 1:
+            self.preview_and_import(self.task_manager.parse_meeting_minutes(filepaths[0]))
+        else:
+            self.run_in_background("解析會議記錄", lambda context: parse_meeting_minutes_files(filepaths), self.preview_and_import, self.import_button)
+    def handle_import_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "選擇會議記錄資料夾")
+        if not directory: return
+        # 多個檔案交給行程池平行解析，並在背景執行以免畫面卡住
+        self.run_in_background("解析會議記錄", lambda context: parse_meeting_minutes_dir(directory), self.preview_and_import, self.import_button)
+    def preview_and_import(self, potential_tasks):
         if not potential_tasks: QMessageBox.information(self, "匯入完成", "在檔案中沒有找到符合格式的任務。"); return
-        dialog = ImportPreviewDialog(potential_tasks, self)
+        # 已經匯入過的 (同樣的標題、截止日與會議記錄檔) 用指紋索引標出來
+        dialog = ImportPreviewDialog(potential_tasks, self, duplicates=self.task_manager.mark_duplicates(potential_tasks))
         if dialog.exec():
-            selected_tasks = dialog.get_selected_tasks(); tasks_added_count = 0
-            for task_data in selected_tasks:
-                if self.task_manager.add_task(task_data["title"], due_date=task_data["due_date"]): tasks_added_count += 1
-            QMessageBox.information(self, "匯入成功", f"成功匯入了 {tasks_added_count} 項任務。")
-            self.refresh_all_lists()
+            # 勾選的任務一次寫入，不再每筆都整份存檔
+            added_tasks = self.write_tasks(lambda: self.task_manager.add_tasks(dialog.get_selected_tasks()))
+            if added_tasks is None: return
+            QMessageBox.information(self, "匯入成功", f"成功匯入了 {len(added_tasks)} 項任務。")
     def handle_meeting_mode(self):
         dialog = QuickCaptureDialog(self); dialog.show()
+    def closeEvent(self, event):
+        # 取消還在跑的背景工作，並在日誌模式下等待背景壓實寫完再關閉
+        self.background.cancel_all(); self.background.wait(3000)
+        self.outbox_worker.stop(timeout=1)  # 還沒送出的會議留在佇列檔，下次開啟時繼續
+        self.task_manager.close()
+        super().closeEvent(event)
 
 # --- 程式進入點 (引擎點火開關) ---
 def main():
+    perf_metrics.start_profiling()  # 設定 TASK_PROFILE=<路徑> 時用 cProfile 記錄這一次執行
     app = QApplication(sys.argv)
     window = TaskManagerApp()
     window.show()
@@ -0,0 +1,165 @@
+# perf_metrics.py
+#
+# 輕量的效能量測：計時器 (次數 / 總秒數 / 最大值) 與計數器，程式結束時匯出成 JSON 或 Prometheus 文字格式。
+# 預設關閉；啟動前設定 TASK_METRICS=<路徑> 才啟用 (副檔名 .prom 輸出 Prometheus 格式，其他為 JSON)。
+# 關閉時 @timed 直接回傳原函式、timer() 回傳共用的空 context manager、inc/observe 立即返回，幾乎沒有額外負擔。
+#
+# 另外設定 TASK_PROFILE=<路徑> 時，start_profiling() 會用 cProfile 記錄這一次執行 (只含主執行緒)，
+# 結束時寫出 .prof 檔，可用 python -m pstats <路徑> 或 snakeviz 查看。
+
+import atexit
+import cProfile
+import json
+import os
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+from functools import wraps
+from time import perf_counter
+
+from atomic_write import write_text_atomic
+
+METRICS_PATH = os.environ.get("TASK_METRICS")
+PROFILE_PATH = os.environ.get("TASK_PROFILE")
+ENABLED = bool(METRICS_PATH)
+
+_NULL_TIMER = nullcontext()
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class MetricsRegistry:
+    """執行緒安全的計時器與計數器集合；同名但標籤不同的視為不同序列。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timers = {}  # (name, labels) -> [count, sum_s, max_s]
+        self.counters = {}  # (name, labels) -> value
+
+    def observe(self, name, seconds, labels=()):
+        with self._lock:
+            stats = self.timers.get((name, labels))
+            if stats is None:
+                self.timers[(name, labels)] = [1, seconds, seconds]
+            else:
+                stats[0] += 1; stats[1] += seconds
+                if seconds > stats[2]: stats[2] = seconds
+
+    def inc(self, name, amount=1, labels=()):
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self.timers.clear(); self.counters.clear()
+
+    def snapshot(self):
+        with self._lock:
+            timers = [
+                {"name": name, "labels": dict(labels), "count": count, "sum_s": total, "max_s": peak, "avg_s": total / count}
+                for (name, labels), (count, total, peak) in sorted(self.timers.items())
+            ]
+            counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(self.counters.items())]
+        return {"exported_at": datetime.now().isoformat(timespec="seconds"), "pid": os.getpid(), "timers": timers, "counters": counters}
+
+    def to_prometheus(self):
+        """Prometheus 文字格式：計時器輸出成 summary (_count / _sum) 加上 _max gauge。"""
+        snapshot = self.snapshot()
+        lines, declared = [], set()
+        def declare(name, kind):
+            if name not in declared: declared.add(name); lines.append(f"# TYPE {name} {kind}")
+        for timer in snapshot["timers"]:
+            labels = _prometheus_labels(timer["labels"])
+            declare(timer["name"], "summary")
+            lines.append(f"{timer['name']}_count{labels} {timer['count']}")
+            lines.append(f"{timer['name']}_sum{labels} {timer['sum_s']:.6f}")
+        for timer in snapshot["timers"]:
+            declare(f"{timer['name']}_max", "gauge")
+            lines.append(f"{timer['name']}_max{_prometheus_labels(timer['labels'])} {timer['max_s']:.6f}")
+        for counter in snapshot["counters"]:
+            declare(counter["name"], "counter")
+            lines.append(f"{counter['name']}{_prometheus_labels(counter['labels'])} {counter['value']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """依副檔名寫出 JSON 或 Prometheus 文字檔。"""
+        prometheus = path.endswith((".prom", ".txt"))
+        content = self.to_prometheus() if prometheus else json.dumps(self.snapshot(), ensure_ascii=False, indent=4)
+        write_text_atomic(path, content)
+
+
+def _prometheus_labels(labels):
+    if not labels: return ""
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+registry = MetricsRegistry()
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "start")
+    def __init__(self, name, labels):
+        self.name = name; self.labels = labels
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+    def __exit__(self, *exc_info):
+        registry.observe(self.name, perf_counter() - self.start, self.labels)
+
+
+def timer(name, **labels):
+    """with timer("task_store_save_seconds"): ... ；關閉時回傳共用的空 context manager。"""
+    if not ENABLED: return _NULL_TIMER
+    return _Timer(name, _label_key(labels))
+
+
+def timed(name, **labels):
+    """函式計時的裝飾器。關閉時在定義當下就直接回傳原函式，呼叫時完全沒有額外負擔。"""
+    def decorator(fn):
+        if not ENABLED: return fn
+        label_key = _label_key(labels)
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                registry.observe(name, perf_counter() - start, label_key)
+        return wrapper
+    return decorator
+
+
+def inc(name, amount=1, **labels):
+    if ENABLED: registry.inc(name, amount, _label_key(labels))
+
+
+def observe(name, seconds, **labels):
+    if ENABLED: registry.observe(name, seconds, _label_key(labels))
+
+
+def export(path=None):
+    path = path or METRICS_PATH
+    if path: registry.export(path)
+
+
+_profiler = None
+def start_profiling(path=None):
+    """設定了 TASK_PROFILE (或傳入 path) 時開始 cProfile，程式結束時把結果寫到該路徑。回傳是否已啟動。"""
+    global _profiler
+    path = path or PROFILE_PATH
+    if not path or _profiler is not None: return False
+    _profiler = cProfile.Profile()
+    def dump():
+        _profiler.disable(); _profiler.dump_stats(path)
+        print(f"效能剖析結果已寫入 {path}")
+    atexit.register(dump)
+    _profiler.enable()
+    return True
+
+
+if ENABLED:
+    atexit.register(export)
@@ -0,0 +1,142 @@
+# recurrence.py
+#
+# 週期性任務的重複規則。規則存在任務的 "recurrence" 欄位，系列的第一次就是任務的 due_date：
+#   {"freq": "daily" | "weekly" | "monthly", "interval": 每幾天 / 週 / 月,
+#    "weekdays": [0-6] (只用於 weekly，0 是週一；省略時與第一次同一天),
+#    "until": "YYYY-MM-DD" (含，可省略), "count": 總次數 (可省略)}
+# occurrences() 直接算出查詢範圍開頭是第幾次，再逐一產生範圍內的日期：
+# 不會從第一次開始列舉，也不會把整個系列展開存起來。
+# 個別某一次的狀態 (例如這週的站立會議已完成) 以 {日期: 狀態} 稀疏地存在任務的 "occurrence_status"，
+# 沒有記錄的那幾次都是「待辦」。
+
+import calendar
+from datetime import date, timedelta
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+FREQUENCY_UNITS = {"daily": "天", "weekly": "週", "monthly": "個月"}
+WEEKDAY_NAMES = "一二三四五六日"
+DEFAULT_OCCURRENCE_STATUS = "待辦"
+
+
+def normalize_rule(rule):
+    """檢查並整理重複規則；不合法時丟出 ValueError。None 或空的規則回傳 None (代表不重複)。"""
+    if not rule:
+        return None
+    freq = rule.get("freq")
+    if freq not in FREQUENCIES:
+        raise ValueError(f"不支援的重複頻率: {freq}")
+    normalized = {"freq": freq, "interval": int(rule.get("interval") or 1)}
+    if normalized["interval"] < 1:
+        raise ValueError("重複間隔必須是正整數。")
+    if freq == "weekly" and rule.get("weekdays"):
+        weekdays = sorted(set(int(day) for day in rule["weekdays"]))
+        if not all(0 <= day <= 6 for day in weekdays):
+            raise ValueError("星期必須是 0 (週一) 到 6 (週日)。")
+        normalized["weekdays"] = weekdays
+    if rule.get("until"):
+        normalized["until"] = date.fromisoformat(rule["until"]).isoformat()
+    if rule.get("count"):
+        normalized["count"] = int(rule["count"])
+    return normalized
+
+
+def _add_months(day, months, day_of_month):
+    # 該月沒有這一天 (例如 31 號) 時改在月底
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    return date(year, month + 1, min(day_of_month, calendar.monthrange(year, month + 1)[1]))
+
+
+def occurrences(rule, first, start, end):
+    """
+    依序產生 start ~ end (含) 之間的每一次的日期。
+
+    :param rule: normalize_rule 整理過的規則。
+    :param first: 系列的第一次 (任務的截止日，date)。
+    """
+    if rule.get("until"):
+        end = min(end, date.fromisoformat(rule["until"]))
+    start = max(start, first)
+    if end < start:
+        return
+    interval, count = rule.get("interval", 1), rule.get("count")
+    if rule["freq"] == "daily":
+        n = -(-(start - first).days // interval)  # 第一個不早於 start 的是第幾次
+        day = first + timedelta(days=n * interval)
+        while day <= end and (count is None or n < count):
+            yield day
+            n += 1; day += timedelta(days=interval)
+    elif rule["freq"] == "weekly":
+        weekdays = rule.get("weekdays") or [first.weekday()]
+        week0 = first - timedelta(days=first.weekday())  # 第一次那一週的週一
+        skipped = sum(1 for weekday in weekdays if weekday < first.weekday())  # 第一週裡早於第一次的不算
+        period = (start - week0).days // 7 // interval
+        while True:
+            monday = week0 + timedelta(weeks=period * interval)
+            if monday > end: return
+            for i, weekday in enumerate(weekdays):
+                n = period * len(weekdays) + i - skipped
+                day = monday + timedelta(days=weekday)
+                if n < 0 or day < start: continue
+                if day > end or (count is not None and n >= count): return
+                yield day
+            period += 1
+    else:
+        n = max(0, ((start.year - first.year) * 12 + start.month - first.month) // interval)
+        while count is None or n < count:
+            day = _add_months(first, n * interval, first.day)
+            n += 1
+            if day < start: continue
+            if day > end: return
+            yield day
+
+
+def next_occurrence(rule, first, on_or_after):
+    """on_or_after (含) 之後的第一次；系列已經結束時回傳 None。"""
+    return next(occurrences(rule, first, on_or_after, date.max - timedelta(days=31)), None)
+
+
+def describe_rule(rule):
+    """給畫面顯示的中文描述，例如「每週一、三」、「每 2 天，共 10 次」。"""
+    interval, freq = rule.get("interval", 1), rule["freq"]
+    text = f"每{FREQUENCY_UNITS[freq] if interval == 1 else f' {interval} {FREQUENCY_UNITS[freq]}'}"
+    if freq == "daily" and interval == 1: text = "每天"
+    if freq == "weekly" and rule.get("weekdays"):
+        text += ("" if interval == 1 else "的週") + "、".join(WEEKDAY_NAMES[day] for day in rule["weekdays"])
+    if rule.get("until"): text += f"，到 {rule['until']}"
+    if rule.get("count"): text += f"，共 {rule['count']} 次"
+    return text
+
+
+def to_rrule(rule):
+    """轉成 Google 日曆活動的 RRULE 字串。"""
+    parts = [f"FREQ={rule['freq'].upper()}", f"INTERVAL={rule.get('interval', 1)}"]
+    if rule.get("weekdays"): parts.append("BYDAY=" + ",".join(("MO", "TU", "WE", "TH", "FR", "SA", "SU")[day] for day in rule["weekdays"]))
+    if rule.get("until"): parts.append(f"UNTIL={rule['until'].replace('-', '')}")
+    if rule.get("count"): parts.append(f"COUNT={rule['count']}")
+    return "RRULE:" + ";".join(parts)
+
+
+def expand_task_dicts(task_dicts, start, end, skip_done=True):
+    """
+    把任務 dict 展開成 start ~ end 之間的「每一次」：一般任務原樣產生，
+    週期性任務每一次產生一份 due_date / status 換成該次的複本 (task_id 不變)。
+
+    :param skip_done: 略過已完成的系列與已完成的那幾次 (每日同步用，已完成的不必再提醒)。
+    """
+    for task_dict in task_dicts:
+        rule = task_dict.get("recurrence")
+        if not rule:
+            yield task_dict; continue
+        if skip_done and task_dict.get("status") == "已完成": continue
+        try:
+            first = date.fromisoformat(task_dict.get("due_date") or "")
+        except ValueError:
+            # 舊版沒有檢查第一次的日期格式；略過這一筆，不讓整次同步失敗
+            print(f"週期性任務「{task_dict.get('title')}」的日期格式錯誤 ({task_dict.get('due_date')!r})，略過。")
+            continue
+        overrides = task_dict.get("occurrence_status") or {}
+        for day in occurrences(rule, first, start, end):
+            status = overrides.get(day.isoformat(), DEFAULT_OCCURRENCE_STATUS)
+            if skip_done and status == "已完成": continue
+            yield dict(task_dict, due_date=day.isoformat(), status=status)
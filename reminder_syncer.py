@@ -1,62 +1,177 @@
-# reminder_syncer.py (修正後)
+# reminder_syncer.py (批次版)
 
 import subprocess
 import json
+import os
+import sys
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta, time
 
-def create_reminder(title, due_date_str, list_name="提醒事項"):
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+# 非 macOS (或設定 REMINDER_BACKEND=file) 時，提醒會寫進這個 JSON Lines 檔，方便在 Linux 上測試
+FILE_BACKEND_PATH = os.path.join(SCRIPT_DIR, 'reminders.jsonl')
+REMINDER_TIME = time(9, 0)  # 提醒時間固定為到期日上午 9 點
+DEFAULT_LIST_NAME = "提醒事項"
+# osascript 回傳的各筆結果以 ASCII 30 (record separator) 分隔：錯誤訊息可能有多行，不能用換行分隔
+RESULT_SEPARATOR = '\x1e'
+
+
+def _result(reminder, success, error=None):
+    return {"title": reminder["title"], "due_date": reminder["due_date"], "success": success, "error": error}
+
+
+def _applescript_string(text):
+    # AppleScript 字串常值只需跳脫反斜線與雙引號；分隔字元不會出現在標題裡，錯誤訊息引用標題時也就不會切錯
+    return '"' + text.replace(RESULT_SEPARATOR, ' ').replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class ReminderBackend(ABC):
+    """
+    提醒事項後端的介面。create_reminders 一次處理多筆，回傳與輸入同順序的結果 list：
+    {"title", "due_date", "success", "error"}。
+    每筆 reminder 是 {"title": ..., "due_date": "YYYY-MM-DD", "due_datetime": datetime}。
     """
-    使用 AppleScript 在 macOS 的「提醒事項」App 中建立一個新的提醒。
+
+    @abstractmethod
+    def create_reminders(self, reminders, list_name=DEFAULT_LIST_NAME):
+        pass
+
+
+class AppleScriptBackend(ReminderBackend):
+    """透過 osascript 寫入 macOS「提醒事項」。N 筆提醒只啟動一次 osascript。"""
+
+    def build_script(self, reminders, list_name):
+        lines = [
+            'set results to {}',
+            'tell application "Reminders"',
+            f'    tell list {_applescript_string(list_name)}',
+        ]
+        for reminder in reminders:
+            due_str = reminder["due_datetime"].strftime("%Y-%m-%d %H:%M:%S")
+            # 每筆各自 try，單筆失敗不會影響其他筆，並把結果逐筆回傳
+            lines += [
+                '        try',
+                f'            make new reminder with properties {{name:{_applescript_string(reminder["title"])}, due date:date "{due_str}"}}',
+                '            set end of results to "ok"',
+                '        on error errMsg',
+                '            set end of results to "error:" & errMsg',
+                '        end try',
+            ]
+        lines += [
+            '    end tell',
+            'end tell',
+            "set AppleScript's text item delimiters to (character id 30)",
+            'return results as text',
+        ]
+        return '\n'.join(lines)
+
+    def create_reminders(self, reminders, list_name=DEFAULT_LIST_NAME):
+        if not reminders:
+            return []
+        try:
+            result = subprocess.run(
+                ['osascript', '-e', self.build_script(reminders, list_name)],
+                capture_output=True,
+                text=True,
+                check=True
+            )
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            error = getattr(e, "stderr", None) or str(e)
+            print(f"AppleScript 錯誤訊息: {error}")
+            return [_result(reminder, False, error) for reminder in reminders]
+        outputs = result.stdout.rstrip('\n').split(RESULT_SEPARATOR)
+        results = []
+        for i, reminder in enumerate(reminders):
+            output = outputs[i] if i < len(outputs) else "error:osascript 沒有回傳這一筆的結果"
+            results.append(_result(reminder, output == "ok", None if output == "ok" else output[len("error:"):]))
+        return results
+
+
+class FileReminderBackend(ReminderBackend):
+    """把提醒追加寫入 JSON Lines 檔的替身後端，讓同步流程在 Linux 上也能執行與測試。"""
+
+    def __init__(self, path=None):
+        self.path = path or FILE_BACKEND_PATH
+
+    def create_reminders(self, reminders, list_name=DEFAULT_LIST_NAME):
+        if not reminders:
+            return []
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for reminder in reminders:
+                    f.write(json.dumps({
+                        "list": list_name, "title": reminder["title"],
+                        "due": reminder["due_datetime"].isoformat(),
+                    }, ensure_ascii=False) + '\n')
+        except IOError as e:
+            return [_result(reminder, False, str(e)) for reminder in reminders]
+        return [_result(reminder, True) for reminder in reminders]
+
+
+def get_default_backend():
+    backend_name = os.environ.get("REMINDER_BACKEND")
+    if backend_name == "file" or (backend_name is None and sys.platform != "darwin"):
+        return FileReminderBackend()
+    return AppleScriptBackend()
+
+
+def create_reminders(items, list_name=DEFAULT_LIST_NAME, backend=None):
+    """
+    一次建立多個提醒事項，整批只呼叫後端一次。
+
+    :param items: (title, due_date_str) 的 list，due_date_str 為 YYYY-MM-DD。
+    :param list_name: 要加入到哪個提醒事項列表，預設是 "提醒事項"。
+    :param backend: ReminderBackend；預設在 macOS 用 AppleScript，其他平台用檔案替身。
+    :return: 與 items 同順序的結果 list，每筆為 {"title", "due_date", "success", "error"}。
+    """
+    backend = backend or get_default_backend()
+    results = [None] * len(items)
+    valid, valid_positions = [], []
+    for i, (title, due_date_str) in enumerate(items):
+        reminder = {"title": title, "due_date": due_date_str}
+        try:
+            # 將日期和上午 9 點的時間結合，變成一個完整的 datetime 物件
+            date_part = datetime.strptime(due_date_str or "", "%Y-%m-%d").date()
+        except ValueError:
+            results[i] = _result(reminder, False, f"日期格式錯誤: '{due_date_str}'。請使用 YYYY-MM-DD 格式。")
+            continue
+        reminder["due_datetime"] = datetime.combine(date_part, REMINDER_TIME)
+        valid.append(reminder)
+        valid_positions.append(i)
+    for position, result in zip(valid_positions, backend.create_reminders(valid, list_name)):
+        results[position] = result
+    return results
+
+
+def create_reminder(title, due_date_str, list_name=DEFAULT_LIST_NAME, backend=None):
+    """
+    在 macOS 的「提醒事項」App 中建立一個新的提醒 (單筆版，內部走 create_reminders)。
 
     :param title: 提醒事項的標題。
     :param due_date_str: YYYY-MM-DD 格式的日期字串。
     :param list_name: 要加入到哪個提醒事項列表，預設是 "提醒事項"。
     """
     print(f"正在嘗試建立提醒：'{title}'，日期：{due_date_str}")
-
-    try:
-        # 【修改】將日期字串轉換成 date 物件
-        date_part = datetime.strptime(due_date_str, "%Y-%m-%d").date()
-        # 【修改】將日期和上午 9 點的時間結合，變成一個完整的 datetime 物件
-        due_datetime_obj = datetime.combine(date_part, time(9, 0))
-        
-        # 【修改】組裝正確的 AppleScript 命令，移除了錯誤的 "remind me time" 屬性
-        applescript_command = f'''
-        tell application "Reminders"
-            tell list "{list_name}"
-                make new reminder with properties {{name:"{title}", due date:date "{due_datetime_obj.strftime("%Y-%m-%d %H:%M:%S")}"}}
-            end tell
-        end tell
-        '''
-
-        # 使用 subprocess 模組來執行 AppleScript 命令
-        result = subprocess.run(
-            ['osascript', '-e', applescript_command],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
+    result = create_reminders([(title, due_date_str)], list_name, backend)[0]
+    if result["success"]:
         print(f"✅ 成功！提醒 '{title}' 已建立。")
         print("請檢查你 Mac 和 iPhone 上的「提醒事項」App。")
-        return True
-
-    except subprocess.CalledProcessError as e:
-        print(f"❌ 建立提醒失敗！")
-        print(f"AppleScript 錯誤訊息: {e.stderr}")
-        return False
-    except ValueError:
-        print(f"❌ 日期格式錯誤: '{due_date_str}'。請使用 YYYY-MM-DD 格式。")
-        return False
+    else:
+        print(f"❌ 建立提醒失敗！{result['error']}")
+    return result["success"]
 
 # --- 測試區塊 ---
 if __name__ == "__main__":
     print("--- 開始測試提醒事項建立功能 ---")
-    
+
     # 獲取明天的日期作為測試日期
     tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-    
+
     # 測試一個有效的任務
     create_reminder("完成專題報告的最終版", tomorrow)
-    
-    print("\n--- 測試結束 ---")
\ No newline at end of file
+
+    # 測試批次建立 (其中一筆日期錯誤)
+    for result in create_reminders([("準備週會簡報", tomorrow), ("回覆客戶郵件", "明天")]):
+        print(f"{'✅' if result['success'] else '❌'} {result['title']} {result['error'] or ''}")
+
+    print("\n--- 測試結束 ---")
@@ -1,59 +1,140 @@
 # run_daily_sync.py
 
+import argparse
 import json
-from datetime import date
+from datetime import date, datetime, timedelta
 import os
 
-# 從我們寫好的工具檔案中，匯入建立提醒的函式
-from reminder_syncer import create_reminder
+# 從我們寫好的工具檔案中，匯入批次建立提醒的函式
+from reminder_syncer import create_reminders
+import perf_metrics
+from atomic_write import write_json_atomic
+from task_index import read_tasks_due_between
+from task_journal import journal_path_for
+from task_lock import TaskFileLock
+from task_snapshot import snapshot_path_for
+from task_sqlite import db_path_for
+from task_logic import DEFAULT_FILENAME, DEFAULT_STORAGE, SCRIPT_DIR
 
 # --- 設定 ---
-# 我們的任務數據儲存在哪裡
-TASKS_FILE_PATH = "tasks.json"
+# 我們的任務數據儲存在哪裡 (用絕對路徑，cron 從哪個目錄執行都找得到)
+TASKS_FILE_PATH = DEFAULT_FILENAME
+# 已同步過的 (task_id, 截止日) 紀錄，重複執行也不會建立重複的提醒
+SYNC_LEDGER_PATH = os.path.join(SCRIPT_DIR, 'sync_ledger.json')
+LEDGER_RETENTION_DAYS = 90  # 截止日早於同步範圍這麼多天的紀錄會被清掉
 
-def sync_tasks_for_today():
+
+class SyncLedger:
+    """以「task_id:截止日」為鍵記錄已建立過提醒的任務；任務改期後會被視為新的一筆。"""
+
+    def __init__(self, path=SYNC_LEDGER_PATH):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                print(f"同步紀錄 {path} 無法讀取，將重新建立。")
+
+    @staticmethod
+    def key(task_id, due_date):
+        return f"{task_id}:{due_date}"
+
+    def is_synced(self, task_id, due_date):
+        return self.key(task_id, due_date) in self.entries
+
+    def mark_synced(self, task_id, due_date):
+        self.entries[self.key(task_id, due_date)] = {"due_date": due_date, "synced_at": datetime.now().isoformat()}
+
+    def prune(self, before):
+        cutoff = before.isoformat()
+        self.entries = {k: v for k, v in self.entries.items() if v.get("due_date", "") >= cutoff}
+
+    def save(self):
+        write_json_atomic(self.path, self.entries, indent=4)
+
+
+@perf_metrics.timed("daily_sync_seconds")
+def sync_tasks_for_range(start, end, tasks_path=None, ledger_path=None, storage=None):
     """
-    讀取 tasks.json 檔案，找出今天到期的任務，並為它們建立提醒事項。
+    找出截止日在 start ~ end (含) 之間、且還沒同步過的任務，批次建立提醒事項。
+    只有成功建立的提醒會寫進同步紀錄，失敗的下次執行會再試。
+
+    :param storage: 任務庫的儲存模式，預設與 GUI 相同 (TASK_STORAGE 環境變數)。
     """
-    print(f"[{date.today()}] 開始執行每日任務同步...")
+    tasks_path = tasks_path or TASKS_FILE_PATH
+    storage = storage or DEFAULT_STORAGE
+    range_str = start.isoformat() if start == end else f"{start} ~ {end}"
+    print(f"[{date.today()}] 開始執行任務同步 ({range_str})...")
 
-    # 1. 檢查 tasks.json 檔案是否存在
-    if not os.path.exists(TASKS_FILE_PATH):
-        print(f"找不到任務檔案 {TASKS_FILE_PATH}。結束執行。")
+    # 1. 檢查這個模式的任務檔案是否存在 (tasks.json，或 SQLite 模式的 tasks.db、二進位模式的 tasks.tsnap、日誌模式還沒壓實過的日誌)
+    candidates = {"sqlite": [db_path_for(tasks_path)], "binary": [tasks_path, snapshot_path_for(tasks_path)],
+                  "journal": [tasks_path, journal_path_for(tasks_path)]}.get(storage, [tasks_path])
+    if not any(os.path.exists(p) for p in candidates):
+        print(f"找不到任務檔案 {tasks_path}。結束執行。")
         return
 
-    # 2. 讀取並解析 JSON 檔案
-    try:
-        with open(TASKS_FILE_PATH, 'r', encoding='utf-8') as f:
-            all_tasks = json.load(f)
-    except (json.JSONDecodeError, IOError):
-        print(f"讀取或解析 {TASKS_FILE_PATH} 失敗。檔案可能為空或格式錯誤。")
-        return
+    # 2. 透過截止日索引只讀出範圍內的任務
+    tasks_due = read_tasks_due_between(tasks_path, start, end, storage)
 
-    if not all_tasks:
-        print("任務清單為空，沒有需要同步的任務。")
-        return
+    # 3. 略過已經同步過的任務，為其餘的建立提醒
+    sync_task_reminders(tasks_due, ledger_path, prune_before=start - timedelta(days=LEDGER_RETENTION_DAYS), range_str=range_str)
+
+
+def sync_task_reminders(tasks_due, ledger_path=None, prune_before=None, range_str="今天"):
+    """
+    為還沒同步過的任務 dict 批次建立提醒事項，回傳成功建立的筆數。
+    每日同步與 GUI 的到期排程器 (到期當天 REMINDER_TIME) 共用同一份同步紀錄，兩邊都跑也不會重複建立：
+    讀紀錄、建立提醒到寫回紀錄的整段期間持有同步紀錄的獨占鎖 (sync_ledger.json.lock)，同時執行的另一邊會等這邊寫完再讀。
+    """
+    ledger_path = ledger_path or SYNC_LEDGER_PATH
+    with TaskFileLock(ledger_path).exclusive():
+        ledger = SyncLedger(ledger_path)
+        pending = [task for task in tasks_due if not ledger.is_synced(task["task_id"], task["due_date"])]
+        skipped = len(tasks_due) - len(pending)
+
+        if not pending:
+            print(f"檢查完畢。{range_str} 沒有需要同步的任務 (已同步過 {skipped} 個)。")
+            return 0
+        print(f"找到 {len(pending)} 個到期的任務 (另有 {skipped} 個已同步過)，正在同步...")
+        # 整批只呼叫一次提醒後端 (macOS 上就是只啟動一次 osascript)
+        items = [(task.get("title", "無標題任務"), task.get("due_date")) for task in pending]
+        results = create_reminders(items)
+        for task, result in zip(pending, results):
+            if result["success"]:
+                ledger.mark_synced(task["task_id"], task["due_date"])
+            else:
+                print(f"❌ 建立提醒 '{result['title']}' 失敗: {result['error']}")
+        if prune_before: ledger.prune(prune_before)
+        ledger.save()
+    success_count = sum(1 for result in results if result["success"])
+    print(f"同步完成！成功建立了 {success_count} 個提醒事項。")
+    return success_count
+
+
+def sync_tasks_for_today():
+    """
+    找出今天到期的任務，並為它們建立提醒事項。
+    """
+    today = date.today()
+    sync_tasks_for_range(today, today)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="把到期的任務同步到「提醒事項」。")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="起始日期 YYYY-MM-DD (預設今天)，用來補跑錯過的日子")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="結束日期 YYYY-MM-DD (含，預設今天)")
+    args = parser.parse_args(argv)
+    today = date.today()
+    args.start = args.start or today
+    args.end = args.end or max(today, args.start)
+    if args.end < args.start:
+        parser.error("--to 不能早於 --from")
+    return args
 
-    # 3. 找出今天到期的任務
-    todays_date_str = date.today().strftime("%Y-%m-%d")
-    tasks_due_today = []
-    for task in all_tasks:
-        # 確保任務有 due_date 且不為 None，並且等於今天的日期
-        if task.get("due_date") == todays_date_str:
-            tasks_due_today.append(task)
-
-    # 4. 為找到的任務建立提醒
-    if not tasks_due_today:
-        print(f"檢查完畢。今天 ({todays_date_str}) 沒有到期的任務。")
-    else:
-        print(f"找到 {len(tasks_due_today)} 個今天到期的任務，正在同步...")
-        success_count = 0
-        for task in tasks_due_today:
-            title = task.get("title", "無標題任務")
-            due_date = task.get("due_date")
-            if create_reminder(title, due_date):
-                success_count += 1
-        print(f"同步完成！成功建立了 {success_count} 個提醒事項。")
 
 if __name__ == "__main__":
-    sync_tasks_for_today()
\ No newline at end of file
+    perf_metrics.start_profiling()
+    args = parse_args()
+    sync_tasks_for_range(args.start, args.end)
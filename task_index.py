@@ -0,0 +1,209 @@
+# task_index.py
+#
+# tasks.json 的「截止日索引」附檔 (tasks.json.idx)。
+# 寫入 tasks.json 時同時記下每筆任務在檔案中的位元組位置，依截止日分組；
+# 每日同步只要讀索引，再 seek 到當天到期的那幾筆任務解析即可，不必載入整個 tasks.json。
+# 索引記著 tasks.json 的大小與修改時間，檔案被其他程式改過就自動退回完整讀取並重建索引
+# (重建時只寫索引附檔，不會動到 tasks.json：GUI 可能還拿著記憶體中的版本)。
+# 週期性任務的截止日只是系列的第一次，所以另外記下它們的位置 ("recurring")，讀出後依規則展開成範圍內的每一次。
+
+import json
+import os
+from contextlib import nullcontext
+from datetime import date, timedelta
+
+from atomic_write import tmp_path_for, write_json_atomic
+from recurrence import expand_task_dicts
+from task_lock import TaskFileLock
+from task_snapshot import snapshot_path_for, read_due_between
+from task_sqlite import SQLiteTaskStore, db_path_for
+
+INDEX_SUFFIX = '.idx'
+
+
+def _record_text(task_dict):
+    # 與 json.dump(list, indent=4) 產生的格式一模一樣：每筆 dict 再整體縮排 4 格
+    return '\n'.join('    ' + line for line in json.dumps(task_dict, ensure_ascii=False, indent=4).split('\n'))
+
+
+def file_signature(path):
+    """檔案目前的 (大小, 修改時間)，用來判斷檔案是否被其他程式換過；檔案不存在回傳 None。"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def write_tasks_file(path, tasks_data, fsync=False, replace_guard=None):
+    """
+    寫出 tasks.json (換檔方式同 atomic_write.write_text_atomic)，並同時寫出截止日索引。
+    產生的 tasks.json 內容與原本的 json.dump(..., indent=4) 完全相同。
+
+    :param path: tasks.json 路徑。
+    :param tasks_data: 任務 dict 的 list。
+    :param fsync: 是否在 replace 前 fsync (快照壓實時使用)。
+    :param replace_guard: 只包住「換上新檔」那一步的 context manager (例如跨行程鎖)；
+                          它丟出例外時放棄這次寫入，暫存檔會被刪掉。
+    """
+    by_due, recurring = {}, []
+    tmp_path = tmp_path_for(path)
+    with open(tmp_path, 'wb') as f:
+        if not tasks_data:
+            f.write(b'[]')
+        else:
+            f.write(b'[\n')
+            for i, task_dict in enumerate(tasks_data):
+                if i: f.write(b',\n')
+                data = _record_text(task_dict).encode('utf-8')
+                if task_dict.get("recurrence"):
+                    recurring.append([f.tell(), len(data)])
+                elif task_dict.get("due_date"):
+                    by_due.setdefault(task_dict["due_date"], []).append([f.tell(), len(data)])
+                f.write(data)
+            f.write(b'\n]')
+        f.flush()
+        if fsync: os.fsync(f.fileno())
+    try:
+        with replace_guard or nullcontext():
+            os.replace(tmp_path, path)
+            _write_index(path, by_due, recurring)
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+
+def _write_index(path, by_due, recurring, signature=None):
+    size, mtime_ns = signature or file_signature(path)
+    write_json_atomic(path + INDEX_SUFFIX, {"size": size, "mtime_ns": mtime_ns, "by_due": by_due, "recurring": recurring})
+
+
+def _load_fresh_index(path):
+    """索引存在且與 tasks.json 目前的大小、修改時間一致才回傳，否則回傳 None。"""
+    try:
+        with open(path + INDEX_SUFFIX, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        stat = os.stat(path)
+    except (IOError, OSError, json.JSONDecodeError):
+        return None
+    if index.get("size") != stat.st_size or index.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+    if "recurring" not in index:  # 支援週期性任務之前產生的索引
+        return None
+    return index
+
+
+def _rebuild_index(path):
+    """
+    完整讀取 tasks.json，找出每筆任務的位元組位置寫成索引附檔，回傳任務 dict 的 list。
+    逐筆 raw_decode 出位置，不論 tasks.json 是不是我們寫的格式都適用；tasks.json 本身不會被改寫。
+    """
+    signature = file_signature(path)
+    with open(path, 'rb') as f:
+        text = f.read().decode('utf-8')
+    char_at, byte_at = 0, 0
+    def byte_offset(char_position):
+        # 字元位置轉成位元組位置；只會往後查，所以每個字元只編碼一次
+        nonlocal char_at, byte_at
+        byte_at += len(text[char_at:char_position].encode('utf-8')); char_at = char_position
+        return byte_at
+    decoder = json.JSONDecoder()
+    by_due, recurring, tasks_data = {}, [], []
+    position = _skip_whitespace(text, 0)
+    if text[position:position + 1] != '[': raise ValueError(f"{path} 不是任務的 list")
+    position = _skip_whitespace(text, position + 1)
+    while text[position:position + 1] != ']':
+        task_dict, end = decoder.raw_decode(text, position)
+        start_byte = byte_offset(position)
+        entry = [start_byte, byte_offset(end) - start_byte]
+        if task_dict.get("recurrence"): recurring.append(entry)
+        elif task_dict.get("due_date"): by_due.setdefault(task_dict["due_date"], []).append(entry)
+        tasks_data.append(task_dict)
+        position = _skip_whitespace(text, end)
+        if text[position:position + 1] == ',': position = _skip_whitespace(text, position + 1)
+    _write_index(path, by_due, recurring, signature)
+    return tasks_data
+
+
+def _skip_whitespace(text, position):
+    while position < len(text) and text[position] in ' \t\r\n':
+        position += 1
+    return position
+
+
+def date_range(start, end):
+    """start 到 end (含) 的每一天，回傳 YYYY-MM-DD 字串。"""
+    day = start
+    while day <= end:
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+
+def read_tasks_due_between(path, start, end, storage="json"):
+    """
+    讀出截止日在 start ~ end (含，date 物件) 之間的任務 dict，依截止日排序。
+    週期性任務展開成範圍內每一次各一份 dict (due_date / status 是那一次的，已完成的那幾次略過)。
+    讀哪一份資料由 storage (與 TaskManager 相同的 TASK_STORAGE 模式) 決定，不看同目錄還留著哪些檔案
+    (切換過模式後，其他模式的檔案只是舊資料)：
+      - json / journal: 有新的索引時只讀取需要的位元組 (索引過期時完整讀取一次並重建索引)，journal 模式再套用日誌；
+      - binary: 改讀快照 (tasks.tsnap) 的截止日欄，只解碼範圍內的任務；還沒有快照時讀 tasks.json；
+      - sqlite: 用 tasks.db 的截止日索引查詢範圍。
+    讀取期間持有任務庫的共用鎖 (sqlite 模式由 SQLite 自己處理)。
+    """
+    if storage == "sqlite":
+        tasks_due = []
+        if os.path.exists(db_path_for(path)):
+            store = SQLiteTaskStore(db_path_for(path))
+            try:
+                tasks_due = store.load_due_between(start.isoformat(), end.isoformat())
+            finally:
+                store.close()
+    else:
+        with TaskFileLock(path).shared():
+            if storage == "binary" and os.path.exists(snapshot_path_for(path)):
+                tasks_due = read_due_between(snapshot_path_for(path), set(date_range(start, end)))
+            else:
+                tasks_due = _read_due_between(path, start, end, journal=storage == "journal").values()
+    return sorted(expand_task_dicts(tasks_due, start, end), key=lambda d: (d["due_date"], d.get("created_at", "")))
+
+
+def _read_due_between(path, start, end, journal=False):
+    # 週期性任務原樣回傳，由呼叫端展開；journal=True 時再套用還沒壓實進 tasks.json 的日誌
+    wanted = set(date_range(start, end))
+    by_id = {}
+    index = _load_fresh_index(path)
+    if index is not None:
+        with open(path, 'rb') as f:
+            positions = [position for due in sorted(wanted) for position in index["by_due"].get(due, [])]
+            for offset, length in positions + index["recurring"]:
+                f.seek(offset)
+                task_dict = json.loads(f.read(length))
+                by_id[task_dict["task_id"]] = task_dict
+    elif os.path.exists(path):
+        print(f"{path} 的截止日索引不存在或已過期，改為完整讀取並重建索引。")
+        try:
+            tasks_data = _rebuild_index(path)
+        except (ValueError, IOError):
+            tasks_data = []
+        by_id = {d["task_id"]: d for d in tasks_data if d.get("due_date") in wanted or d.get("recurrence")}
+
+    if not journal:
+        return by_id
+    # 套用還沒壓實進快照的日誌紀錄 (延遲匯入，避免循環相依)
+    from task_journal import TaskJournal, journal_path_for
+    if os.path.exists(journal_path_for(path)):
+        journal_view = TaskJournal(path)
+        for record in journal_view.iter_records():
+            if record.get("op") == "put":
+                task_dict = record["task"]
+                if task_dict.get("due_date") in wanted or task_dict.get("recurrence"): by_id[task_dict["task_id"]] = task_dict
+                else: by_id.pop(task_dict["task_id"], None)
+            elif record.get("op") == "del":
+                by_id.pop(record["task_id"], None)
+    return by_id
+
+
+if __name__ == "__main__":
+    from task_logic import DEFAULT_FILENAME, DEFAULT_STORAGE
+    today = date.today()
+    for task_dict in read_tasks_due_between(DEFAULT_FILENAME, today, today + timedelta(days=7), DEFAULT_STORAGE):
+        print(f"{task_dict['due_date']}  {task_dict['title']}")
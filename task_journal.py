@@ -0,0 +1,252 @@
+# task_journal.py
+#
+# TaskManager 的「附加式日誌」儲存模式。
+# 每次新增 / 修改 / 刪除只在 tasks.json.journal 尾端追加一行小紀錄，
+# 累積到一定數量後才在背景把整份清單壓實 (compact) 回 tasks.json 快照。
+#
+# 任何既有的 tasks.json 本身就是合法的快照，因此舊檔不需轉換即可直接以日誌模式開啟；
+# 反過來執行 `python task_journal.py compact tasks.json` 會把日誌併回一般的 tasks.json，
+# 讓直接讀檔的工具 (例如 run_daily_sync.py) 也能看到最新內容。
+
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager, nullcontext
+
+from task_index import write_tasks_file, file_signature
+from task_lock import TaskFileLock
+from perf_metrics import timed
+
+JOURNAL_SUFFIX = '.journal'
+DEFAULT_COMPACT_EVERY = 1000
+
+
+def journal_path_for(path):
+    """tasks.json 對應的日誌檔路徑 (tasks.json.journal)。"""
+    return path + JOURNAL_SUFFIX
+
+
+class StaleSnapshotError(Exception):
+    """壓實期間快照已被其他程式換掉，這次壓實作廢。"""
+
+
+@timed("task_journal_snapshot_seconds")
+def write_snapshot(path, tasks_data, replace_guard=None):
+    """
+    寫出完整的 tasks.json (連同截止日索引)，換檔前先 fsync。
+
+    :param path: 快照檔路徑。
+    :param tasks_data: 任務 dict 的 list。
+    :param replace_guard: 見 task_index.write_tasks_file。
+    """
+    write_tasks_file(path, tasks_data, fsync=True, replace_guard=replace_guard)
+
+
+class TaskJournal:
+    """
+    一個快照檔 + 一個 JSON Lines 日誌檔。
+
+    日誌只有兩種紀錄，而且都是「完整狀態」，重播幾次結果都一樣 (冪等)：
+        {"op": "put", "task": {...}}   新增或覆寫一筆任務
+        {"op": "del", "task_id": "..."} 刪除一筆任務
+    因為冪等，壓實時就算在「快照已換新、日誌還沒截短」之間當機，下次重播舊紀錄也不會出錯。
+
+    :param lock: 任務庫的 TaskFileLock；壓實換上新快照、截短日誌時會持有它的獨占鎖。
+    """
+
+    def __init__(self, snapshot_path, compact_every=DEFAULT_COMPACT_EVERY, fsync=True, lock=None):
+        self.snapshot_path = snapshot_path
+        self.path = journal_path_for(snapshot_path)
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.lock = lock
+        self.record_count = 0
+        self._lock = threading.Lock()
+        self._compacting = None
+
+    # --- 讀取 ---
+    def iter_records(self):
+        """唯讀地逐筆讀出完整的日誌紀錄 (略過寫到一半的尾巴)，給其他程式 (例如每日同步) 使用。"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    return
+                try:
+                    yield json.loads(raw_line)
+                except ValueError:
+                    return
+
+    def read_from(self, offset):
+        """從 offset 開始讀出完整的紀錄 (其他程式新追加的部分)，回傳 (紀錄 list, 讀到的結尾位置)。"""
+        records, end = [], offset
+        if not os.path.exists(self.path):
+            return records, end
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    break
+                try:
+                    records.append(json.loads(raw_line))
+                except ValueError:
+                    break
+                end += len(raw_line)
+        return records, end
+
+    def replay(self, tasks_data):
+        """
+        把日誌套用到快照讀出的 dict list 上，回傳新的 list (保留原本順序，新任務接在後面)。
+        最後一行若因當機而寫到一半，會被略過並從檔案中截掉。
+        """
+        return self.replay_with_offset(tasks_data)[0]
+
+    def replay_with_offset(self, tasks_data):
+        """同 replay，另外回傳套用到的日誌結尾位置 (之後用 read_from 從這裡接著讀)。"""
+        by_id = {data["task_id"]: data for data in tasks_data}
+        self.record_count = 0
+        if not os.path.exists(self.path):
+            return list(by_id.values()), 0
+        valid_end = 0
+        with open(self.path, 'rb') as f:
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    break  # 寫到一半的尾巴
+                try:
+                    record = json.loads(raw_line)
+                except ValueError:
+                    break
+                self._apply(by_id, record)
+                self.record_count += 1
+                valid_end += len(raw_line)
+        if valid_end != os.path.getsize(self.path):
+            print(f"日誌 {self.path} 尾端有不完整的紀錄，已忽略。")
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_end)
+        return list(by_id.values()), valid_end
+
+    @staticmethod
+    def _apply(by_id, record):
+        if record.get("op") == "put":
+            task = record["task"]
+            by_id[task["task_id"]] = task
+        elif record.get("op") == "del":
+            by_id.pop(record["task_id"], None)
+
+    # --- 寫入 ---
+    # 寫入都回傳寫完後日誌的結尾位置
+    def append_put(self, task_dict):
+        return self._append({"op": "put", "task": task_dict})
+
+    def append_puts(self, task_dicts):
+        """多筆一次寫入、只 fsync 一次 (批次匯入用)。"""
+        return self._append(*({"op": "put", "task": task_dict} for task_dict in task_dicts))
+
+    def append_delete(self, task_id):
+        return self._append({"op": "del", "task_id": task_id})
+
+    def _append(self, *records):
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+        with self._lock:
+            with open(self.path, 'ab') as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                end = f.tell()
+            self.record_count += len(records)
+        return end
+
+    def needs_compaction(self):
+        return self.record_count >= self.compact_every
+
+    # --- 壓實 ---
+    def compact(self, snapshot_fn, background=True, on_committed=None):
+        """
+        把目前的完整任務清單寫成新快照，並把日誌截到只剩快照之後才寫入的紀錄。
+
+        :param snapshot_fn: 回傳當下任務 dict list 的函式；會在鎖內與日誌位置一起取得，確保兩者一致。
+        :param background: True 時在背景執行緒寫檔，不會卡住呼叫端。
+        :param on_committed: 換上新快照後呼叫 on_committed(新快照的 file_signature, 從日誌開頭截掉的位元組數)。
+        """
+        with self._lock:
+            if self._compacting and self._compacting.is_alive():
+                return self._compacting
+            tasks_data = snapshot_fn()
+            offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            snapshot_signature = file_signature(self.snapshot_path)
+            self.record_count = 0
+        args = (tasks_data, offset, snapshot_signature, on_committed)
+        if not background:
+            self._compact(*args)
+            return None
+        self._compacting = threading.Thread(target=self._compact, args=args, daemon=True)
+        self._compacting.start()
+        return self._compacting
+
+    def _compact(self, tasks_data, offset, snapshot_signature, on_committed):
+        # 新快照先寫成暫存檔 (不持有鎖)，只有換檔與截短日誌時才持有跨行程鎖
+        try:
+            write_snapshot(self.snapshot_path, tasks_data,
+                           replace_guard=self._commit_guard(offset, snapshot_signature, on_committed))
+        except StaleSnapshotError:
+            print("其他程式已先壓實了任務日誌，略過這次壓實。")
+        except OSError as e:
+            print(f"壓實任務日誌時發生錯誤: {e}")
+
+    @contextmanager
+    def _commit_guard(self, offset, snapshot_signature, on_committed):
+        with self.lock.exclusive() if self.lock else nullcontext(), self._lock:
+            # 樂觀檢查：取快照之後若有別的程式換過快照，這份快照就過時了
+            if file_signature(self.snapshot_path) != snapshot_signature:
+                raise StaleSnapshotError()
+            yield
+            self._truncate_before(offset)
+            if on_committed:
+                on_committed(file_signature(self.snapshot_path), offset)
+
+    def _truncate_before(self, offset):
+        # 只留下快照之後才追加的紀錄
+        tail = b''
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                tail = f.read()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def wait(self):
+        """等待背景壓實結束 (程式結束前呼叫)。"""
+        if self._compacting:
+            self._compacting.join()
+
+
+def compact_store(snapshot_path):
+    """把 snapshot_path 的日誌併回一般的 tasks.json，並清空日誌 (全程持有任務庫的獨占鎖)。"""
+    file_lock = TaskFileLock(snapshot_path)
+    with file_lock.exclusive():
+        tasks_data = []
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                tasks_data = json.load(f)
+        journal = TaskJournal(snapshot_path, lock=file_lock)
+        tasks_data = journal.replay(tasks_data)
+        journal.compact(lambda: tasks_data, background=False)
+    return len(tasks_data)
+
+
+if __name__ == "__main__":
+    # 用法: python task_journal.py compact [tasks.json]
+    if len(sys.argv) < 2 or sys.argv[1] != "compact":
+        print("用法: python task_journal.py compact [tasks.json 路徑]")
+        sys.exit(1)
+    from task_logic import DEFAULT_FILENAME
+    target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_FILENAME
+    count = compact_store(target)
+    print(f"已將日誌併入 {target}，共 {count} 筆任務。")
@@ -0,0 +1,105 @@
+# task_lock.py
+#
+# tasks.json 的跨行程鎖 (tasks.json.lock)。GUI、cron 執行的 run_daily_sync.py、第二個 GUI 視窗
+# 都會讀寫同一份任務庫：寫入者持有獨占鎖完成「併入別人的變動 → 寫檔」，讀取者持有共用鎖，
+# 就不會讀到寫一半的狀態，也不會互相覆蓋。
+# 同一個行程內可以重入 (例如寫入時再呼叫需要共用鎖的讀取)，不同執行緒之間則依序取得 (一樣受 timeout 限制)。
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_SUFFIX = '.lock'
+LOCK_TIMEOUT = 10.0  # 秒；拿不到鎖時丟出 TaskLockTimeout，而不是讓畫面永遠卡住
+_RETRY_INTERVAL = 0.02
+
+
+class TaskLockTimeout(TimeoutError):
+    """等待其他程式釋放任務庫的鎖逾時。"""
+
+
+class TaskFileLock:
+    """
+    一個任務庫檔案的讀寫鎖。
+
+    :param path: 任務庫路徑 (tasks.json)；鎖檔是旁邊的 tasks.json.lock。
+    :param timeout: 等待其他行程釋放鎖的秒數上限。
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = path + LOCK_SUFFIX
+        self.timeout = timeout
+        self._thread_lock = threading.RLock()
+        self._fd = None
+        self._depth = 0
+        self._exclusive = False
+
+    def shared(self):
+        """讀取用的共用鎖 (Windows 上退化為獨占鎖)。"""
+        return self._hold(False)
+
+    def exclusive(self):
+        """寫入用的獨占鎖。"""
+        return self._hold(True)
+
+    @contextmanager
+    def _hold(self, exclusive):
+        # 同一行程的其他執行緒 (例如在背景讀檔的 check_external_changes) 持有鎖時也只等到 timeout，
+        # 等待執行緒與等待其他行程共用同一個期限
+        deadline = time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise self._timeout_error()
+        try:
+            if self._depth == 0:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    self._acquire(exclusive, deadline)
+                except BaseException:
+                    os.close(self._fd); self._fd = None
+                    raise
+                self._exclusive = exclusive or not fcntl
+            elif exclusive and not self._exclusive:
+                # 共用鎖升級成獨占鎖 (flock 的升級不是原子的，呼叫端應盡量一開始就拿獨占鎖)
+                self._acquire(True, deadline)
+                self._exclusive = True
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._release()
+                    os.close(self._fd); self._fd = None
+        finally:
+            self._thread_lock.release()
+
+    def _acquire(self, exclusive, deadline):
+        while True:
+            try:
+                if fcntl:
+                    fcntl.flock(self._fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+                else:
+                    os.lseek(self._fd, 0, os.SEEK_SET)
+                    msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise self._timeout_error()
+                time.sleep(_RETRY_INTERVAL)
+
+    def _timeout_error(self):
+        return TaskLockTimeout(f"等待 {self.path} 逾時，可能有其他程式正在寫入任務庫。")
+
+    def _release(self):
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
@@ -1,39 +1,166 @@
-# task_logic.py (修正路徑問題)
+# task_logic.py
+#
+# Task 與 TaskManager：任務庫的載入、索引、存檔 (json / journal / sqlite / binary 四種模式) 與會議記錄解析。
 
 import uuid
 import json
 import os
-from datetime import datetime, date
+import re
+import sys
+import glob
+import hashlib
+import unicodedata
+import threading
+from bisect import bisect_left, insort
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+
+from task_journal import TaskJournal, DEFAULT_COMPACT_EVERY
+from task_index import write_tasks_file, file_signature
+from task_lock import TaskFileLock
+from task_sqlite import SQLiteTaskStore, DEFAULT_SEARCH_LIMIT, db_path_for
+from task_snapshot import (TaskSnapshot, LazyTaskMap, SnapshotFormatError, write_snapshot, entry_from_dict,
+                           snapshot_path_for, json_to_snapshot, read_snapshot)
+from perf_metrics import timed
+from recurrence import normalize_rule, next_occurrence, DEFAULT_OCCURRENCE_STATUS
 
 # --- 【新增】自動計算 tasks.json 的絕對路徑 ---
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 DEFAULT_FILENAME = os.path.join(SCRIPT_DIR, 'tasks.json')
+DEFAULT_DB_FILENAME = os.path.join(SCRIPT_DIR, 'tasks.db')
 # --------------------------------
 
+# 儲存模式: "json" 每次異動都整份重寫 tasks.json；"journal" 只追加日誌，定期在背景壓實 (見 task_journal.py)；
+# "sqlite" 存在 tasks.db，每次異動只更新一列，並有持久的全文索引 (見 task_sqlite.py)；
+# "binary" 存在 mmap 的二進位快照 tasks.tsnap，開檔只讀排序用的欄，任務被存取時才解碼 (見 task_snapshot.py)
+DEFAULT_STORAGE = os.environ.get("TASK_STORAGE", "json")
+
+VALID_STATUSES = ["待辦", "進行中", "已完成"]
+NO_DUE_DATE = '9999-12-31'  # 沒有截止日的任務排在最後
+BULK_RESET_THRESHOLD = 200  # add_tasks 超過這個筆數就發出 "reset" 而不是逐筆 "added"
+
+class TaskConflictError(Exception):
+    """任務在畫面讀取之後已被其他程式 (或另一個視窗) 修改過，這次修改被拒絕。"""
+    def __init__(self, task):
+        super().__init__(f"任務「{task.title}」已被其他程式修改過。")
+        self.task = task
+
+@lru_cache(maxsize=4096)
+def parse_due_date(due_date_str):
+    """把 YYYY-MM-DD 轉成 date；同一個日期字串只會解析一次。格式錯誤回傳 None。"""
+    try:
+        return date.fromisoformat(due_date_str)
+    except (TypeError, ValueError):
+        return None
+
+def checked_recurrence(recurrence, due_date):
+    """整理重複規則 (見 recurrence.normalize_rule)；週期性任務的截止日就是第一次，必須是 YYYY-MM-DD，否則丟出 ValueError。"""
+    recurrence = normalize_rule(recurrence)
+    if recurrence and parse_due_date(due_date) is None:
+        raise ValueError(f"週期性任務的第一次必須是 YYYY-MM-DD 格式的日期，收到: {due_date!r}")
+    return recurrence
+
+# --- 匯入來源與內容指紋 ---
+# 從會議記錄或郵件建立的任務記下 source (會議記錄檔路徑，或 "gmail:<message id>")，
+# 並在建立當下算出 fingerprint = 正規化的 (標題, 截止日, 來源) 的雜湊。指紋存在任務裡，
+# 之後任務改名或改期也不會變，同一份會議記錄再匯入一次仍認得出是同一筆。
+EMAIL_SOURCE_PREFIX = "gmail:"
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def source_id(source):
+    """來源的識別字串：郵件原樣使用；會議記錄檔只取檔名，檔案搬到別的資料夾再匯入也認得出來。"""
+    if not source: return ""
+    if source.startswith(EMAIL_SOURCE_PREFIX): return source
+    return "minutes:" + os.path.basename(source)
+
+def email_source(message_id):
+    return EMAIL_SOURCE_PREFIX + message_id
+
+def _normalize_text(text):
+    # 全形半形、大小寫與多餘的空白都不影響指紋
+    return WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFKC", text or "")).strip().casefold()
+
+def content_fingerprint(title, due_date=None, source=None):
+    """正規化的 (標題, 截止日, 來源) 的 SHA-1 十六進位字串。"""
+    content = "\x1f".join((_normalize_text(title), due_date or "", source_id(source)))
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+def _multimap_add(index, key, task_id):
+    index.setdefault(key, []).append(task_id)
+
+def _multimap_discard(index, key, task_id):
+    task_ids = index.get(key)
+    if task_ids and task_id in task_ids:
+        task_ids.remove(task_id)
+        if not task_ids: del index[key]
+
 class Task:
-    # ... (Task Class 的內容完全不變，請保留你原本的) ...
-    def __init__(self, title, description="", status="待辦", due_date=None, meeting_link=None, task_id=None, created_at=None):
+    # 【記憶體】用 __slots__ 取代每個物件一份的 __dict__；
+    # 狀態與截止日這種大量重複的字串一律 intern，整個任務庫共用同一份。
+    # task_id 與 created_at 仍是每筆一份字串 (前者與 _by_id 的 key 共用，後者是排序鍵)，原因與實測數字見 memory_report.py。
+    # version 每寫入一次加一，用來偵測同一筆任務是否被其他程式改過 (樂觀並行控制)
+    # recurrence 是重複規則 (見 recurrence.py)，due_date 就是系列的第一次；occurrence_status 是個別某幾次的狀態 {日期: 狀態}
+    # source / fingerprint 是匯入來源與建立當下的內容指紋 (見 content_fingerprint)，手動新增的任務沒有
+    __slots__ = ("task_id", "title", "description", "status", "created_at", "due_date", "meeting_link", "version", "recurrence", "occurrence_status",
+                 "source", "fingerprint")
+    def __init__(self, title, description="", status="待辦", due_date=None, meeting_link=None, task_id=None, created_at=None, version=0,
+                 recurrence=None, occurrence_status=None, source=None, fingerprint=None):
         self.task_id = task_id if task_id else str(uuid.uuid4())
         self.title = title
         self.description = description
-        self.status = status
+        self.status = sys.intern(status)
         self.created_at = created_at if created_at else datetime.now().isoformat()
-        self.due_date = due_date
+        self.due_date = sys.intern(due_date) if due_date else due_date
         self.meeting_link = meeting_link
+        self.version = version
+        self.recurrence = recurrence or None
+        self.occurrence_status = occurrence_status or None
+        self.source = source or None
+        self.fingerprint = fingerprint or (content_fingerprint(title, due_date, source) if source else None)
+    @property
+    def due(self):
+        # 解析過的截止日 (date 物件)，由 parse_due_date 快取共用
+        return parse_due_date(self.due_date) if self.due_date else None
+    def next_occurrence(self, on_or_after):
+        """on_or_after (含) 之後第一個還沒完成的那一次的日期；沒有時回傳 None。"""
+        if not self.recurrence or self.due is None:
+            return self.due if self.due and self.due >= on_or_after else None
+        overrides = self.occurrence_status or {}
+        while True:
+            day = next_occurrence(self.recurrence, self.due, on_or_after)
+            if day is None or overrides.get(day.isoformat()) != "已完成": return day
+            on_or_after = day + timedelta(days=1)
     def to_dict(self):
-        return {
+        data = {
             "task_id": self.task_id, "title": self.title, "description": self.description,
             "status": self.status, "created_at": self.created_at, "due_date": self.due_date,
-            "meeting_link": self.meeting_link
+            "meeting_link": self.meeting_link, "version": self.version
         }
+        # 不重複、不是匯入的任務不寫這些欄位，既有的 tasks.json 內容維持不變
+        if self.recurrence: data["recurrence"] = self.recurrence
+        if self.occurrence_status: data["occurrence_status"] = self.occurrence_status
+        if self.source: data["source"] = self.source; data["fingerprint"] = self.fingerprint
+        return data
     @classmethod
     def from_dict(cls, data_dict):
         return cls(
             title=data_dict["title"], description=data_dict.get("description", ""),
             status=data_dict["status"], task_id=data_dict["task_id"],
             created_at=data_dict["created_at"], due_date=data_dict.get("due_date"),
-            meeting_link=data_dict.get("meeting_link")
+            meeting_link=data_dict.get("meeting_link"), version=data_dict.get("version", 0),
+            recurrence=data_dict.get("recurrence"), occurrence_status=data_dict.get("occurrence_status"),
+            source=data_dict.get("source"), fingerprint=data_dict.get("fingerprint")
         )
+    def same_as(self, data_dict):
+        """與磁碟上的 dict 內容是否相同 (合併其他程式的變動時用)。"""
+        return (self.version == data_dict.get("version", 0) and self.title == data_dict.get("title")
+                and self.status == data_dict.get("status") and self.due_date == data_dict.get("due_date")
+                and self.description == data_dict.get("description", "") and self.meeting_link == data_dict.get("meeting_link")
+                and self.recurrence == (data_dict.get("recurrence") or None)
+                and self.occurrence_status == (data_dict.get("occurrence_status") or None)
+                and self.source == (data_dict.get("source") or None))
     def __str__(self):
         due_date_str = f" (截止: {self.due_date})" if self.due_date else ""
         meeting_str = " [會議]" if self.meeting_link else ""
@@ -41,70 +168,590 @@ class Task:
 
 class TaskManager:
     # 【修改】讓初始化方法使用我們計算好的絕對路徑
-    def __init__(self, filename=DEFAULT_FILENAME):
+    def __init__(self, filename=DEFAULT_FILENAME, storage=DEFAULT_STORAGE, compact_every=DEFAULT_COMPACT_EVERY, lazy=False):
+        """
+        :param lazy: True 時先不讀檔 (清單是空的)，之後由呼叫端在背景執行 prepare_indexes()、
+                     回到主執行緒再 install_indexes()；在那之前若有寫入，會先同步載入，不會蓋掉既有任務。
+        """
         self.filename = filename
-        self.tasks = self._load_tasks()
+        # 跨行程的讀寫鎖 (tasks.json.lock)；sqlite 模式由 SQLite 自己處理並行寫入
+        self.file_lock = TaskFileLock(filename) if storage != "sqlite" else None
+        self.journal = TaskJournal(filename, compact_every=compact_every, lock=self.file_lock) if storage == "journal" else None
+        self.store = self._open_sqlite_store(filename) if storage == "sqlite" else None
+        self.snapshot_path = self._prepare_snapshot(filename) if storage == "binary" else None
+        self._search_index = None  # 非 sqlite 模式第一次搜尋時才建立的記憶體全文索引
+        self._listeners = []
+        self._load_lock = threading.RLock()
+        self.loaded = not lazy
+        indexes, self._disk_state = self._load_indexes() if self.loaded else (self._make_indexes([]), None)
+        self._set_indexes(indexes)
+
+    def _open_sqlite_store(self, filename):
+        # 傳入的是 tasks.json 時改用同名的 .db；資料庫第一次建立時自動把既有的 tasks.json 匯入
+        # (只看資料庫檔案在開啟前是否存在：刪光任務後重開時資料庫是空的，但不能再把舊的 tasks.json 匯回來)
+        db_path = db_path_for(filename)
+        created = not os.path.exists(db_path)
+        store = SQLiteTaskStore(db_path)
+        if created and filename.endswith('.json') and os.path.exists(filename):
+            try:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    store.put_many(json.load(f))
+                print(f"已將 {filename} 匯入 SQLite 資料庫 {db_path}。")
+            except (json.JSONDecodeError, IOError):
+                pass
+        return store
+
+    def _prepare_snapshot(self, filename):
+        # 第一次以二進位模式開啟時，把既有的 tasks.json 轉成快照 (tasks.json 保留不動)
+        snapshot_path = snapshot_path_for(filename)
+        with self.file_lock.exclusive():
+            if not os.path.exists(snapshot_path) and os.path.exists(filename):
+                try:
+                    count = json_to_snapshot(filename, snapshot_path)
+                    print(f"已將 {filename} 轉成二進位快照 {snapshot_path} ({count} 筆任務)。")
+                except (json.JSONDecodeError, IOError):
+                    pass
+        return snapshot_path
+
+    # --- 異動通知 ---
+    # GUI 的 model 透過 add_listener 訂閱，callback(event, task, row)：
+    #   event 為 "added" / "updated" / "removed" / "reset"，row 是該任務在 list_tasks() 中的位置
+    #   ("reset" 代表整份清單換過，task 與 row 皆為 None)
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+    def remove_listener(self, callback):
+        if callback in self._listeners: self._listeners.remove(callback)
+    def _notify(self, event, task=None, row=None):
+        for callback in list(self._listeners):
+            callback(event, task, row)
+
+    # --- 記憶體索引 ---
+    # _by_id: task_id -> Task 的雜湊索引，查詢與刪除都是 O(1)
+    # _due_index: 依 (截止日, 建立時間, task_id) 排好的鍵，列出任務時不必再排序
+    # _status_index: 每個狀態各自一份排好的鍵 (狀態分桶)
+    # _recurring: 週期性任務的 task_id (通常只有幾筆，列出到期任務時逐一算出下一次)
+    # _fingerprints / _sources: 內容指紋 -> [task_id]、來源識別 (source_id) -> [task_id]，匯入與掃描郵件時 O(1) 查重複
+    #   (值是 list：強制匯入等情況下可能有好幾筆任務共用同一個指紋，刪掉其中一筆時其他的仍要查得到)
+    # 每次異動都只用 bisect 插入 / 移除一個鍵，不會整份重建。
+    @staticmethod
+    def _sort_key(task):
+        return (task.due_date or NO_DUE_DATE, task.created_at, task.task_id)
+    def _make_indexes(self, tasks):
+        # 只建出新的索引，不動到目前的狀態，所以可以在背景執行緒執行
+        by_id = {task.task_id: task for task in tasks}
+        due_index = sorted(self._sort_key(task) for task in by_id.values())
+        status_index = {status: [] for status in VALID_STATUSES}
+        for key in due_index:
+            status_index.setdefault(by_id[key[2]].status, []).append(key)
+        recurring = {task.task_id for task in by_id.values() if task.recurrence}
+        fingerprints, sources = {}, {}
+        for task in by_id.values():
+            if task.source: _multimap_add(fingerprints, task.fingerprint, task.task_id); _multimap_add(sources, source_id(task.source), task.task_id)
+        return by_id, due_index, status_index, recurring, (fingerprints, sources)
+    def _make_snapshot_indexes(self, snapshot):
+        # 只用快照的欄建索引，不解碼任何一筆任務
+        by_id = LazyTaskMap(snapshot, Task.from_dict)
+        keys = list(zip([due_date or NO_DUE_DATE for due_date in snapshot.due_dates], snapshot.created_at, snapshot.task_ids))
+        statuses = snapshot.statuses()
+        # 自己存的快照帶有排好的順序；從 tasks.json 轉過來的第一次開啟才需要排序
+        order = snapshot.order if snapshot.order is not None else sorted(range(len(keys)), key=keys.__getitem__)
+        due_index = [keys[i] for i in order]
+        status_index = {status: [] for status in VALID_STATUSES}
+        for i in order:
+            status_index.setdefault(statuses[i], []).append(keys[i])
+        recurring = {snapshot.task_ids[i] for i in snapshot.indices_with_key("recurrence")}
+        # 只解碼有來源的那幾筆紀錄 (不建 Task)，取出指紋與來源
+        fingerprints, sources = {}, {}
+        for i in snapshot.indices_with_key("source"):
+            data = snapshot.record(i)
+            _multimap_add(fingerprints, data["fingerprint"], data["task_id"]); _multimap_add(sources, source_id(data["source"]), data["task_id"])
+        return by_id, due_index, status_index, recurring, (fingerprints, sources)
+    def _set_indexes(self, indexes):
+        self._by_id, self._due_index, self._status_index, self._recurring, (self._fingerprints, self._sources) = indexes
+    def _index_add(self, task):
+        self._by_id[task.task_id] = task
+        return self._order_add(task)
+    def _index_remove(self, task):
+        del self._by_id[task.task_id]
+        return self._order_remove(task)
+    def _order_add(self, task):
+        # 回傳任務在 _due_index 中的位置
+        key = self._sort_key(task)
+        row = bisect_left(self._due_index, key)
+        self._due_index.insert(row, key)
+        insort(self._status_index.setdefault(task.status, []), key)
+        if task.recurrence: self._recurring.add(task.task_id)
+        if task.source: _multimap_add(self._fingerprints, task.fingerprint, task.task_id); _multimap_add(self._sources, source_id(task.source), task.task_id)
+        return row
+    def _order_remove(self, task):
+        key = self._sort_key(task)
+        row = None
+        self._recurring.discard(task.task_id)
+        if task.source:
+            # 只移除自己：共用同一個指紋 / 來源的其他任務仍留在索引裡
+            _multimap_discard(self._fingerprints, task.fingerprint, task.task_id); _multimap_discard(self._sources, source_id(task.source), task.task_id)
+        for index in (self._due_index, self._status_index[task.status]):
+            i = bisect_left(index, key)
+            if i < len(index) and index[i] == key:
+                del index[i]
+                if row is None: row = i
+        return row
+    def task_row(self, task):
+        """任務在 list_tasks() 中的位置 (O(log n))；找不到回傳 None。"""
+        key = self._sort_key(task)
+        row = bisect_left(self._due_index, key)
+        return row if row < len(self._due_index) and self._due_index[row] == key else None
+    # --- 延遲載入 (lazy=True) ---
+    def prepare_indexes(self):
+        """讀檔並建好索引後回傳，不改變目前的狀態；可在背景執行緒呼叫。已載入時回傳 None。"""
+        with self._load_lock:
+            if self.loaded: return None
+            return self._load_indexes()
+    def install_indexes(self, prepared):
+        """在主執行緒換上 prepare_indexes() 的結果並發出 "reset"。期間已同步載入過就忽略。"""
+        with self._load_lock:
+            if self.loaded or prepared is None: return False
+            indexes, self._disk_state = prepared
+            self._set_indexes(indexes); self._search_index = None; self.loaded = True
+        self._notify("reset")
+        return True
+    def _ensure_loaded(self):
+        # 還沒載入完就要寫入時先同步載入，否則一般模式整份重寫會把既有任務蓋掉
+        with self._load_lock:
+            if not self.loaded: self.install_indexes(self.prepare_indexes())
+    @property
+    def tasks(self):
+        # 保留舊介面：依原本的加入順序回傳所有任務
+        return list(self._by_id.values())
 
+    def _load_indexes(self):
+        """讀檔並建好索引，回傳 (索引, 當下的磁碟狀態)。"""
+        if self.snapshot_path:
+            snapshot, disk_state = self._open_snapshot()
+            return (self._make_snapshot_indexes(snapshot) if snapshot else self._make_indexes([])), disk_state
+        tasks, disk_state = self._load_tasks()
+        return self._make_indexes(tasks), disk_state
+    @timed("task_store_load_seconds", storage="binary")
+    def _open_snapshot(self):
+        with self.file_lock.shared():
+            signature = file_signature(self.snapshot_path)
+            if signature is None: return None, None
+            try:
+                return TaskSnapshot(self.snapshot_path), signature
+            except (SnapshotFormatError, OSError) as e:
+                print(f"無法讀取快照 {self.snapshot_path}: {e}")
+                return None, signature
+    @timed("task_store_load_seconds")
     def _load_tasks(self):
-        if not os.path.exists(self.filename):
-            return []
-        try:
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                tasks_data = json.load(f)
-                return [Task.from_dict(data) for data in tasks_data]
-        except (json.JSONDecodeError, IOError):
-            return []
+        """讀出所有任務，回傳 (Task list, 當下的磁碟狀態)。"""
+        tasks_data, disk_state = self._read_store()
+        return [Task.from_dict(data) for data in tasks_data], disk_state
+    def _read_store(self):
+        if self.store:
+            disk_state = self.store.data_version()
+            return self.store.load_all(), disk_state
+        if self.snapshot_path:
+            with self.file_lock.shared():
+                signature = file_signature(self.snapshot_path)
+                try:
+                    return (read_snapshot(self.snapshot_path) if signature else []), signature
+                except (SnapshotFormatError, OSError):
+                    return [], signature
+        with self.file_lock.shared():
+            signature = file_signature(self.filename)
+            tasks_data = []
+            if os.path.exists(self.filename):
+                try:
+                    with open(self.filename, 'r', encoding='utf-8') as f:
+                        tasks_data = json.load(f)
+                except (json.JSONDecodeError, IOError):
+                    tasks_data = []
+            if not self.journal:
+                return tasks_data, signature
+            tasks_data, offset = self.journal.replay_with_offset(tasks_data)
+            return tasks_data, (signature, offset)
+
+    # --- 其他程式寫入的變動 ---
+    # _disk_state 記著上次讀寫後磁碟上的狀態：一般模式是 tasks.json 的 (大小, 修改時間)，
+    # 日誌模式是 (快照的大小與修改時間, 已套用到的日誌位置)，sqlite 模式是 PRAGMA data_version，
+    # 二進位模式是 tasks.tsnap 的 (大小, 修改時間)。
+    # 狀態不同代表有其他程式寫入過：只把有變動的任務併進記憶體並逐筆通知，不重建整份清單。
+    # 每次寫入前都會在獨占鎖內先併入這些變動，所以不會蓋掉別人的更新。
+    def check_external_changes(self):
+        """
+        讀出其他程式造成的變動，不改變目前的狀態 (可在背景執行緒呼叫)；沒有變動回傳 None。
+        結果交給 apply_external_changes() 在主執行緒套用。
+        """
+        if not self.loaded: return None
+        base = self._disk_state
+        if self.store:
+            if self.store.data_version() == base: return None
+            return ("snapshot", base, *self._read_store())
+        with self.file_lock.shared():
+            if self.journal:
+                signature, offset = base
+                if file_signature(self.filename) == signature:
+                    journal_size = os.path.getsize(self.journal.path) if os.path.exists(self.journal.path) else 0
+                    if journal_size == offset: return None
+                    if journal_size > offset:
+                        # 只有日誌變長：從上次的位置接著讀新追加的紀錄就好
+                        records, end = self.journal.read_from(offset)
+                        return ("records", base, records, (signature, end)) if records else None
+            elif file_signature(self.snapshot_path or self.filename) == base:
+                return None
+            # tasks.json 被換過 (其他程式存檔或壓實) 或日誌變短：重讀後逐筆比對
+            return ("snapshot", base, *self._read_store())
+    def apply_external_changes(self, changes):
+        """套用 check_external_changes() 的結果，回傳變動的任務數。期間自己又讀寫過就略過 (下次檢查會再讀到)。"""
+        if changes is None: return 0
+        kind, base, payload, disk_state = changes
+        with self.file_lock.shared() if self.file_lock else nullcontext():
+            if base != self._disk_state: return 0
+            if kind == "records":
+                count = self._merge_changes(self._changes_from_records(payload))
+                self.journal.record_count += len(payload)
+            else:
+                count = self._merge_changes(self._changes_from_snapshot(payload))
+            self._disk_state = disk_state
+        return count
+    def data_paths(self):
+        """實際存放任務的檔案 (給 GUI 監看其他程式的寫入)。"""
+        if self.store: return [self.store.path, self.store.path + "-wal"]
+        if self.snapshot_path: return [self.snapshot_path]
+        return [self.filename] + ([self.journal.path] if self.journal else [])
+    def reload_if_changed(self):
+        """同步檢查並併入其他程式的變動，回傳變動的任務數。"""
+        return self.apply_external_changes(self.check_external_changes())
+    @staticmethod
+    def _changes_from_records(records):
+        changes = {}
+        for record in records:
+            if record.get("op") == "put": changes[record["task"]["task_id"]] = record["task"]
+            elif record.get("op") == "del": changes[record["task_id"]] = None
+        return changes
+    def _changes_from_snapshot(self, tasks_data):
+        changes = {}
+        for data in tasks_data:
+            task = self._by_id.get(data["task_id"])
+            if task is None or not task.same_as(data): changes[data["task_id"]] = data
+        on_disk = {data["task_id"] for data in tasks_data}
+        changes.update((task_id, None) for task_id in self._by_id if task_id not in on_disk)
+        return changes
+    def _merge_changes(self, changes):
+        """changes: task_id -> 磁碟上的新 dict (None 代表已被刪除)。既有的 Task 物件就地更新。"""
+        notify_each = len(changes) <= BULK_RESET_THRESHOLD
+        count = 0
+        for task_id, data in changes.items():
+            task = self._by_id.get(task_id)
+            if data is None:
+                if task is None: continue
+                events = [("removed", task, self._index_remove(task))]
+                if self._search_index: self._search_index.delete(task_id)
+            elif task is None:
+                task = Task.from_dict(data)
+                events = [("added", task, self._index_add(task))]
+            else:
+                old_key = self._sort_key(task); old_row = self._order_remove(task)
+                fresh = Task.from_dict(data)
+                for name in Task.__slots__: setattr(task, name, getattr(fresh, name))
+                row = self._order_add(task)
+                # 排序位置沒變就是單純更新；截止日等改了則是從舊位置搬到新位置
+                events = [("updated", task, row)] if self._sort_key(task) == old_key else [("removed", task, old_row), ("added", task, row)]
+            if data is not None and self._search_index: self._search_index.put(data)
+            count += 1
+            if notify_each:
+                for event in events: self._notify(*event)
+        if count and not notify_each: self._notify("reset")
+        return count
+    @contextmanager
+    def _write_transaction(self):
+        # 持有獨占鎖、先併入其他程式的變動再修改與寫檔
+        self._ensure_loaded()
+        with self.file_lock.exclusive() if self.file_lock else nullcontext():
+            self.reload_if_changed()
+            yield
 
-    # ... (其他所有函式，例如 _save_tasks, add_task, list_tasks 等，都維持不變) ...
+    @timed("task_store_save_seconds")
     def _save_tasks(self):
-        with open(self.filename, 'w', encoding='utf-8') as f:
-            tasks_data = [task.to_dict() for task in self.tasks]
-            json.dump(tasks_data, f, ensure_ascii=False, indent=4)
-    def add_task(self, title, description="", due_date=None, meeting_link=None):
+        if self.snapshot_path: self._save_snapshot(); return
+        # 格式與原本的 json.dump(indent=4) 相同，另外附帶截止日索引給 run_daily_sync.py 使用
+        write_tasks_file(self.filename, [task.to_dict() for task in self._by_id.values()])
+        self._disk_state = file_signature(self.filename)
+    def _save_snapshot(self):
+        # 沒被存取過的任務直接複製原本的紀錄 bytes，不必解碼再編碼；寫完改指向新檔
+        by_id = self._by_id
+        lazy = isinstance(by_id, LazyTaskMap)
+        positions = {task_id: i for i, task_id in enumerate(by_id)}
+        order = [positions[key[2]] for key in self._due_index]
+        write_snapshot(self.snapshot_path, by_id.snapshot_entries() if lazy else (entry_from_dict(task.to_dict()) for task in by_id.values()), order)
+        if lazy: by_id.rebind(TaskSnapshot(self.snapshot_path))
+        self._disk_state = file_signature(self.snapshot_path)
+    def _record_put(self, task):
+        self._record_puts([task])
+    @timed("task_store_write_seconds", op="put")
+    def _record_puts(self, tasks):
+        # sqlite 模式只更新那幾列；日誌模式只追加紀錄；一般模式維持整份重寫
+        for task in tasks: task.version += 1
+        task_dicts = [task.to_dict() for task in tasks]
+        if self._search_index: self._search_index.put_many(task_dicts)
+        if self.store: self.store.put_many(task_dicts); return
+        if not self.journal: self._save_tasks(); return
+        self._journal_written(self.journal.append_puts(task_dicts))
+        self._maybe_compact()
+    @timed("task_store_write_seconds", op="delete")
+    def _record_delete(self, task_id):
+        if self._search_index: self._search_index.delete(task_id)
+        if self.store: self.store.delete(task_id); return
+        if not self.journal: self._save_tasks(); return
+        self._journal_written(self.journal.append_delete(task_id))
+        self._maybe_compact()
+    def _journal_written(self, end):
+        # 自己追加的紀錄不算「外部變動」
+        self._disk_state = (self._disk_state[0], end)
+    def _maybe_compact(self):
+        if self.journal.needs_compaction(): self.compact()
+    def compact(self, background=True):
+        """把日誌併回 tasks.json 快照 (日誌模式才有作用)。"""
+        if not self.journal: return
+        with self.file_lock.exclusive():
+            # 快照要包含其他程式追加的紀錄，否則截短日誌時會把它們弄丟
+            self.reload_if_changed()
+            self.journal.compact(lambda: [task.to_dict() for task in self._by_id.values()],
+                                 background=background, on_committed=self._on_compacted)
+    def _on_compacted(self, snapshot_signature, removed_bytes):
+        # 換上新快照時呼叫 (持有檔案鎖，可能在背景執行緒)：日誌前 removed_bytes 位元組已併進快照
+        self._disk_state = (snapshot_signature, self._disk_state[1] - removed_bytes)
+    def close(self):
+        """程式結束前呼叫，等待背景壓實寫完。"""
+        if self.journal: self.journal.wait()
+        if self.store: self.store.close()
+    @timed("task_mutation_seconds", op="add_task")
+    def add_task(self, title, description="", due_date=None, meeting_link=None, recurrence=None, source=None):
+        """
+        新增一筆任務並回傳它 (標題是空的時回傳 False)。
+
+        :param recurrence: 重複規則 (見 recurrence.py)，due_date 就是第一次；規則或日期不合法時丟出 ValueError。
+        :param source: 任務的來源 (例如 email_source(message_id))，會一併記下內容指紋供之後查重複。
+        """
         if not title: return False
-        new_task = Task(title, description, due_date=due_date, meeting_link=meeting_link)
-        self.tasks.append(new_task)
-        self._save_tasks()
-        return True
-    def list_tasks(self):
-        if not self.tasks: return []
-        sorted_tasks = sorted(self.tasks, key=lambda t: (t.due_date or '9999-12-31', t.created_at))
-        return sorted_tasks
+        recurrence = checked_recurrence(recurrence, due_date)
+        with self._write_transaction():
+            new_task = Task(title, description, due_date=due_date, meeting_link=meeting_link, recurrence=recurrence, source=source)
+            row = self._index_add(new_task)
+            self._record_put(new_task)
+            self._notify("added", new_task, row)
+        return new_task
+    @timed("task_mutation_seconds", op="add_tasks")
+    def add_tasks(self, tasks_data):
+        """
+        一次新增多筆任務，整批只寫一次檔 (一般模式一次整份存檔，日誌模式一次追加)。
+
+        :param tasks_data: dict 的 list，可含 title / description / due_date / meeting_link / recurrence / source；沒有標題的會被略過。
+        :return: 實際新增的 Task list。有任何一筆的重複規則或日期不合法時丟出 ValueError，整批都不寫入。
+        """
+        new_tasks = []
+        for data in tasks_data:
+            if not data.get("title"): continue
+            recurrence = checked_recurrence(data.get("recurrence"), data.get("due_date"))
+            new_tasks.append(Task(data["title"], data.get("description", ""), due_date=data.get("due_date"), meeting_link=data.get("meeting_link"),
+                                  recurrence=recurrence, source=data.get("source")))
+        if not new_tasks: return []
+        # 筆數多時直接重設 model，比逐列插入便宜
+        notify_each = len(new_tasks) <= BULK_RESET_THRESHOLD
+        with self._write_transaction():
+            for task in new_tasks: self._index_add(task)
+            self._record_puts(new_tasks)
+            if notify_each:
+                # 後面插入的任務可能排在前面的任務之前，要依最終位置由前往後通知
+                for task in sorted(new_tasks, key=self.task_row):
+                    self._notify("added", task, self.task_row(task))
+            else:
+                self._notify("reset")
+        return new_tasks
+    def list_tasks(self, status=None):
+        # 直接依索引順序取出，不需排序；指定 status 時只走該狀態的分桶
+        index = self._due_index if status is None else self._status_index.get(status, [])
+        by_id = self._by_id
+        return [by_id[key[2]] for key in index]
+    def list_task_ids(self, status=None):
+        """同 list_tasks 的順序，但只回傳 task_id (二進位模式下不會解碼任務)。"""
+        index = self._due_index if status is None else self._status_index.get(status, [])
+        return [key[2] for key in index]
+    def task_status(self, task_id):
+        """任務的狀態；二進位模式下還沒解碼的任務直接讀快照的狀態欄。"""
+        if isinstance(self._by_id, LazyTaskMap): return self._by_id.status_of(task_id)
+        task = self._by_id.get(task_id)
+        return task.status if task else None
+    def due_task_ids_from(self, day, statuses=("待辦", "進行中")):
+        """
+        截止日在 day (含，date 物件) 之後的 (task_id, 截止日)；只用 bisect 切出狀態分桶，不會解碼一般任務。
+        週期性任務給的是 day 之後下一個還沒完成的那一次。
+        """
+        start, end = (day.isoformat(),), (NO_DUE_DATE,)
+        recurring = self._recurring
+        for status in statuses:
+            index = self._status_index.get(status, [])
+            for key in index[bisect_left(index, start):bisect_left(index, end)]:
+                if key[2] not in recurring: yield key[2], key[0]
+        for task_id in recurring:
+            if self.task_status(task_id) not in statuses: continue
+            next_day = self._by_id[task_id].next_occurrence(day)
+            if next_day: yield task_id, next_day.isoformat()
+    def find_duplicate(self, title, due_date=None, source=None):
+        """
+        已經存在的同一筆匯入任務 (標題、截止日與來源正規化後都相同)；沒有時回傳 None。
+        只查指紋索引，不會掃過整個任務庫。
+        """
+        task_ids = self._fingerprints.get(content_fingerprint(title, due_date, source))
+        return self._by_id.get(task_ids[0]) if task_ids else None
+    def mark_duplicates(self, tasks_data):
+        """
+        匯入預覽用：每筆 {"title", "due_date", "source"} 是否重複，回傳同樣長度的 bool list。
+        任務庫裡已經有的，以及同一批裡前面已經出現過的都算重複。
+        """
+        seen, marks = set(), []
+        for data in tasks_data:
+            fingerprint = content_fingerprint(data.get("title"), data.get("due_date"), data.get("source"))
+            marks.append(fingerprint in seen or fingerprint in self._fingerprints)
+            seen.add(fingerprint)
+        return marks
+    def task_for_source(self, source):
+        """從這個來源 (例如某封郵件) 建立的任務；沒有時回傳 None。"""
+        task_ids = self._sources.get(source_id(source)) if source else None
+        return self._by_id.get(task_ids[0]) if task_ids else None
+    def count_tasks(self, status=None):
+        if status is None: return len(self._by_id)
+        return len(self._status_index.get(status, []))
     def get_task(self, task_id):
-        return next((task for task in self.tasks if task.task_id == task_id), None)
-    def update_task_status(self, task_id, new_status):
-        task = self.get_task(task_id)
-        if task:
-            valid_statuses = ["待辦", "進行中", "已完成"]
-            if new_status in valid_statuses:
-                task.status = new_status
-                self._save_tasks()
-                return True
+        return self._by_id.get(task_id)
+    @timed("task_search_seconds")
+    def search_tasks(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        全文搜尋任務標題與說明 (支援前綴與中文子字串)，依相關度回傳 Task list。
+        sqlite 模式直接查資料庫的 FTS 索引；其他模式第一次搜尋時在記憶體建一份索引，之後隨異動同步更新。
+        """
+        index = self.store
+        if index is None:
+            if self._search_index is None:
+                self._search_index = SQLiteTaskStore(":memory:")
+                self._search_index.put_many([task.to_dict() for task in self._by_id.values()])
+            index = self._search_index
+        return [self._by_id[task_id] for task_id in index.search(query, limit) if task_id in self._by_id]
+    @timed("task_mutation_seconds", op="update_task_status")
+    def update_task_status(self, task_id, new_status, expected_version=None):
+        """
+        :param expected_version: 畫面上看到的任務版本；給了而任務已被其他程式改過時丟出 TaskConflictError。
+        """
+        with self._write_transaction():
+            task = self.get_task(task_id)
+            if task:
+                if new_status in VALID_STATUSES:
+                    if expected_version is not None and task.version != expected_version: raise TaskConflictError(task)
+                    # 只搬動排序索引，_by_id 的順序 (也就是存檔順序) 不變
+                    self._order_remove(task)
+                    task.status = new_status
+                    row = self._order_add(task)
+                    self._record_put(task)
+                    self._notify("updated", task, row)
+                    return True
         return False
-    def delete_task(self, task_id):
-        task = self.get_task(task_id)
-        if task:
-            self.tasks.remove(task)
-            self._save_tasks()
+    @timed("task_mutation_seconds", op="set_meeting_link")
+    def set_meeting_link(self, task_id, meeting_link):
+        """寫入任務的會議連結 (例如日曆待送佇列建好會議之後)；任務已不存在時回傳 False。"""
+        with self._write_transaction():
+            task = self.get_task(task_id)
+            if not task: return False
+            task.meeting_link = meeting_link
+            self._record_put(task)
+            # 連結不影響排序，任務留在原本的列
+            self._notify("updated", task, self.task_row(task))
             return True
+    @timed("task_mutation_seconds", op="set_occurrence_status")
+    def set_occurrence_status(self, task_id, day, status, expected_version=None):
+        """
+        設定週期性任務某一次 (day，date 物件) 的狀態；只記下與預設的「待辦」不同的那幾次。
+        任務不存在或不是週期性任務時回傳 False。
+        """
+        if status not in VALID_STATUSES: return False
+        with self._write_transaction():
+            task = self.get_task(task_id)
+            if not task or not task.recurrence: return False
+            if expected_version is not None and task.version != expected_version: raise TaskConflictError(task)
+            overrides = dict(task.occurrence_status or {})
+            if status == DEFAULT_OCCURRENCE_STATUS: overrides.pop(day.isoformat(), None)
+            else: overrides[day.isoformat()] = status
+            task.occurrence_status = overrides or None
+            self._record_put(task)
+            self._notify("updated", task, self.task_row(task))
+            return True
+    @timed("task_mutation_seconds", op="delete_task")
+    def delete_task(self, task_id, expected_version=None):
+        with self._write_transaction():
+            task = self.get_task(task_id)
+            if task:
+                if expected_version is not None and task.version != expected_version: raise TaskConflictError(task)
+                row = self._index_remove(task)
+                self._record_delete(task_id)
+                self._notify("removed", task, row)
+                return True
         return False
     def parse_meeting_minutes(self, filepath):
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
+            return list(iter_meeting_minutes(filepath, with_source=True))
         except FileNotFoundError:
             return []
-        import re
-        potential_tasks = []
-        task_blocks = re.findall(r'\* \*\*任務:\*\*(.*?)(?=\* \*\*任務:\*\*|\Z)', content, re.DOTALL)
-        for block in task_blocks:
-            title_match = re.search(r'(.*?)\n', block.strip())
-            owner_match = re.search(r'\*\*負責人:\*\*\s*(.*?)\n', block)
-            due_date_match = re.search(r'\*\*截止日期:\*\*\s*(.*?)\n', block)
-            title = title_match.group(1).strip() if title_match else "標題未找到"
-            owner = owner_match.group(1).strip() if owner_match and owner_match.group(1).strip() else ""
-            if owner:
-                title = f"{title} ({owner})"
-            due_date = due_date_match.group(1).strip() if due_date_match and due_date_match.group(1).strip() else None
-            potential_tasks.append({"title": title, "due_date": due_date})
-        return potential_tasks
\ No newline at end of file
+
+# --- 會議記錄解析 ---
+# 逐行讀檔，每讀完一個「* **任務:**」區塊就馬上產出一筆，不會把整個檔案讀進記憶體。
+# 區塊內的欄位解析規則與原本的 re.findall 版本完全相同，只是正規表示式改成預先編譯。
+TASK_MARKER = '* **任務:**'
+TITLE_PATTERN = re.compile(r'(.*?)\n')
+OWNER_PATTERN = re.compile(r'\*\*負責人:\*\*\s*(.*?)\n')
+DUE_DATE_PATTERN = re.compile(r'\*\*截止日期:\*\*\s*(.*?)\n')
+
+def _parse_task_block(block, source=None):
+    title_match = TITLE_PATTERN.search(block.strip())
+    owner_match = OWNER_PATTERN.search(block)
+    due_date_match = DUE_DATE_PATTERN.search(block)
+    title = title_match.group(1).strip() if title_match else "標題未找到"
+    owner = owner_match.group(1).strip() if owner_match and owner_match.group(1).strip() else ""
+    if owner:
+        title = f"{title} ({owner})"
+    due_date = due_date_match.group(1).strip() if due_date_match and due_date_match.group(1).strip() else None
+    task_data = {"title": title, "due_date": due_date}
+    if source: task_data["source"] = source
+    return task_data
+
+def iter_meeting_minutes(filepath, with_source=False):
+    """逐一產出會議記錄檔中的任務 {"title", "due_date"} (with_source 時另附 "source": 檔案路徑)。"""
+    source = filepath if with_source else None
+    block = None
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            pieces = line.split(TASK_MARKER)
+            if block is not None: block.append(pieces[0])
+            for piece in pieces[1:]:
+                if block is not None: yield _parse_task_block(''.join(block), source)
+                block = [piece]
+    if block is not None:
+        yield _parse_task_block(''.join(block), source)
+
+def _parse_minutes_file(filepath):
+    # 給 ProcessPoolExecutor 用的頂層函式 (必須能被 pickle)
+    try:
+        return list(iter_meeting_minutes(filepath, with_source=True))
+    except (FileNotFoundError, UnicodeDecodeError) as e:
+        print(f"無法解析會議記錄 {filepath}: {e}")
+        return []
+
+def parse_meeting_minutes_files(filepaths, max_workers=None):
+    """用多個行程平行解析多個會議記錄檔，結果依檔案順序串接。"""
+    filepaths = list(filepaths)
+    if len(filepaths) <= 1:
+        return [task for path in filepaths for task in _parse_minutes_file(path)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return [task for tasks in executor.map(_parse_minutes_file, filepaths) for task in tasks]
+
+def parse_meeting_minutes_dir(directory, pattern="*.txt", max_workers=None):
+    """平行解析資料夾中所有符合 pattern 的會議記錄檔 (依檔名排序)。"""
+    return parse_meeting_minutes_files(sorted(glob.glob(os.path.join(directory, pattern))), max_workers)
@@ -0,0 +1,289 @@
+# task_snapshot.py
+#
+# 任務庫的二進位快照格式 (tasks.tsnap)，給 TASK_STORAGE=binary 使用。
+# 開檔時只把檔案 mmap 進來、讀出 task_id / 截止日 / 建立時間 / 狀態四個「欄」來建排序索引，
+# 每筆任務的完整內容要等到真的被存取時才解碼成 Task (見 LazyTaskMap)。
+# 與 tasks.json 可以無損互轉：
+#   python task_snapshot.py to-binary [tasks.json]   產生 tasks.tsnap
+#   python task_snapshot.py to-json [tasks.json]     把 tasks.tsnap 寫回 tasks.json (格式與一般模式存檔相同)
+#
+# 檔案配置 (little-endian):
+#   header   magic "TASKSNP1"、u32 格式版本、u32 筆數，接著每個區段一組 (u64 位置, u64 長度)
+#   records  每筆任務 dict 的緊湊 JSON，保留所有欄位與順序，所以轉回 JSON 不會遺失資料
+#   ids      以 \x1f 分隔的 task_id (UTF-8)
+#   due      以 \x1f 分隔的截止日 (沒有截止日為空字串)
+#   created  以 \x1f 分隔的建立時間
+#   statuses 以 \x1f 分隔的狀態名稱表
+#   codes    每筆一個 byte：狀態在狀態名稱表中的位置
+#   offsets  筆數 + 1 個 u64 (8 位元組對齊)，第 i 筆紀錄位於 records[offsets[i]:offsets[i+1]]
+#   order    (可省略) 筆數個 u32：依 TaskManager 排序鍵 (截止日, 建立時間, task_id) 排好的紀錄編號，
+#            開檔時直接照這個順序建索引，不必重新排序
+
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from collections.abc import MutableMapping
+from contextlib import nullcontext
+
+SNAPSHOT_SUFFIX = '.tsnap'
+MAGIC = b'TASKSNP1'
+FORMAT_VERSION = 1
+_SEP = '\x1f'
+_SECTIONS = ("records", "ids", "due", "created", "statuses", "codes", "offsets", "order")
+_HEADER = struct.Struct("<8sII" + "QQ" * len(_SECTIONS))
+
+
+class SnapshotFormatError(ValueError):
+    """檔案不是這個版本的任務快照。"""
+
+
+def snapshot_path_for(path):
+    """tasks.json 對應的快照路徑 (tasks.tsnap)。"""
+    return os.path.splitext(path)[0] + SNAPSHOT_SUFFIX if path.endswith('.json') else path + SNAPSHOT_SUFFIX
+
+
+def encode_record(task_dict):
+    return json.dumps(task_dict, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def entry_from_dict(task_dict):
+    """寫入快照用的一筆 (task_id, 截止日, 建立時間, 狀態, 紀錄 bytes)。"""
+    return (task_dict["task_id"], task_dict.get("due_date") or "", task_dict.get("created_at", ""),
+            task_dict.get("status", ""), encode_record(task_dict))
+
+
+def _split(blob, count):
+    return bytes(blob).decode('utf-8').split(_SEP) if count else []
+
+
+class TaskSnapshot:
+    """
+    唯讀開啟的快照。四個欄在開檔時讀出；紀錄內容留在 mmap 裡，record(i) 時才解碼。
+    Windows 上被 mmap 的檔案無法被 os.replace 取代，所以改為整份讀進記憶體 (仍然是按需解碼)。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if os.name == 'nt' or os.fstat(f.fileno()).st_size == 0:
+                self._buffer = f.read()
+            else:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._buffer)
+        if len(view) < _HEADER.size:
+            raise SnapshotFormatError(f"{path} 不是任務快照檔。")
+        magic, version, count, *positions = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotFormatError(f"{path} 不是任務快照檔 (或是不支援的版本)。")
+        sections = {name: view[positions[2 * i]:positions[2 * i] + positions[2 * i + 1]] for i, name in enumerate(_SECTIONS)}
+        self.count = count
+        self.task_ids = _split(sections["ids"], count)
+        self.due_dates = _split(sections["due"], count)
+        self.created_at = _split(sections["created"], count)
+        self._status_names = [sys.intern(name) for name in _split(sections["statuses"], count)]
+        self._codes = sections["codes"]
+        self._offsets = _uint_array(sections["offsets"], 'Q')
+        self.order = _uint_array(sections["order"], 'I') if len(sections["order"]) else None
+        self._records = sections["records"]
+        self._records_start = positions[0]
+
+    def status(self, i):
+        return self._status_names[self._codes[i]]
+
+    def statuses(self):
+        names = self._status_names
+        return [names[code] for code in self._codes]
+
+    def record_bytes(self, i):
+        return self._records[self._offsets[i]:self._offsets[i + 1]]
+
+    def indices_with_key(self, key):
+        """
+        紀錄中有 key 這個欄位的紀錄編號 (例如 "recurrence"、"source" 這種只有少數任務才有的欄位，見 Task.to_dict)。
+        直接在紀錄區找 "key": 這串位元組 (字串值裡的引號一定被跳脫，不會誤判)，不必解碼任何一筆。
+        """
+        marker = json.dumps(key, ensure_ascii=False).encode('utf-8') + b':'
+        found, start, end = [], self._records_start, self._records_start + len(self._records)
+        while True:
+            position = self._buffer.find(marker, start, end)
+            if position < 0: return found
+            i = bisect_right(self._offsets, position - self._records_start) - 1
+            found.append(i)
+            start = self._records_start + self._offsets[i + 1]  # 同一筆紀錄不必再找
+
+    def record(self, i):
+        """第 i 筆任務的 dict。"""
+        return json.loads(bytes(self.record_bytes(i)))
+
+    def entry(self, i):
+        """原封不動的第 i 筆 (寫新快照時直接複製，不必解碼再編碼)。"""
+        return (self.task_ids[i], self.due_dates[i], self.created_at[i], self.status(i), bytes(self.record_bytes(i)))
+
+    def __len__(self):
+        return self.count
+
+
+def _uint_array(view, typecode):
+    if sys.byteorder == 'little':
+        return view.cast(typecode)
+    values = array(typecode, bytes(view)); values.byteswap()
+    return values
+
+
+def write_snapshot(path, entries, order=None, fsync=False, replace_guard=None):
+    """
+    寫出快照 (換檔方式與 task_index.write_tasks_file 相同)。
+
+    :param entries: 可迭代的 (task_id, 截止日, 建立時間, 狀態, 紀錄 bytes)，見 entry_from_dict。
+    :param order: 依排序鍵排好的紀錄編號 (見檔頭說明)；None 時不寫，開檔時再排序。
+    :param replace_guard: 同 task_index.write_tasks_file，只包住換上新檔那一步。
+    """
+    ids, dues, created, codes = [], [], [], bytearray()
+    status_codes = {}
+    offsets = array('Q', [0])
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(bytes(_HEADER.size))  # 先佔位，最後回頭寫上區段表
+            for task_id, due_date, created_at, status, record in entries:
+                if _SEP in task_id or _SEP in due_date or _SEP in created_at or _SEP in status:
+                    raise ValueError(f"任務 {task_id!r} 的欄位含有不允許的控制字元。")
+                ids.append(task_id); dues.append(due_date); created.append(created_at)
+                code = status_codes.setdefault(status, len(status_codes))
+                if code > 255: raise ValueError("任務狀態種類超過 256 種。")
+                codes.append(code)
+                f.write(record)
+                offsets.append(offsets[-1] + len(record))
+            positions = [(_HEADER.size, offsets[-1])]
+            for blob in (_SEP.join(ids), _SEP.join(dues), _SEP.join(created), _SEP.join(status_codes), codes):
+                data = blob.encode('utf-8') if isinstance(blob, str) else bytes(blob)
+                positions.append((f.tell(), len(data)))
+                f.write(data)
+            f.write(bytes(-f.tell() % 8))  # offsets 以 u64 陣列直接映射，要 8 位元組對齊
+            if sys.byteorder != 'little': offsets.byteswap()
+            positions.append((f.tell(), len(offsets) * offsets.itemsize))
+            f.write(offsets.tobytes())
+            order = array('I', order if order is not None else [])
+            if sys.byteorder != 'little': order.byteswap()
+            positions.append((f.tell(), len(order) * order.itemsize))
+            f.write(order.tobytes())
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(ids), *(value for pair in positions for value in pair)))
+            f.flush()
+            if fsync: os.fsync(f.fileno())
+        with replace_guard or nullcontext():
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+
+def read_snapshot(path):
+    """把整份快照解碼成任務 dict 的 list (依存檔順序)。"""
+    snapshot = TaskSnapshot(path)
+    return [snapshot.record(i) for i in range(snapshot.count)]
+
+
+def read_due_between(path, wanted_dates):
+    """只解碼截止日在 wanted_dates 之中的任務與週期性任務 (給每日同步使用，週期性任務由呼叫端展開)。"""
+    snapshot = TaskSnapshot(path)
+    wanted = {i for i, due_date in enumerate(snapshot.due_dates) if due_date in wanted_dates}
+    wanted.update(snapshot.indices_with_key("recurrence"))
+    return [snapshot.record(i) for i in sorted(wanted)]
+
+
+class LazyTaskMap(MutableMapping):
+    """
+    task_id -> Task 的對照表，二進位模式下取代 dict 當 TaskManager._by_id。
+    快照中的任務先只記著紀錄編號，第一次被存取時才用 decode(dict) 解碼成 Task 並留下來；
+    新增或從外部併入的任務直接存 Task。迭代順序與 dict 相同 (也就是存檔順序)。
+    """
+
+    def __init__(self, snapshot, decode):
+        self.snapshot = snapshot
+        self._decode = decode
+        self._entries = dict(zip(snapshot.task_ids, range(snapshot.count)))
+
+    def __getitem__(self, task_id):
+        value = self._entries[task_id]
+        if value.__class__ is int:
+            value = self._entries[task_id] = self._decode(self.snapshot.record(value))
+        return value
+
+    def get(self, task_id, default=None):
+        return self[task_id] if task_id in self._entries else default
+
+    def __setitem__(self, task_id, task):
+        self._entries[task_id] = task
+
+    def __delitem__(self, task_id):
+        del self._entries[task_id]
+
+    def __contains__(self, task_id):
+        return task_id in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def status_of(self, task_id):
+        """任務的狀態；還沒解碼的直接讀狀態欄。"""
+        value = self._entries.get(task_id)
+        if value is None: return None
+        return self.snapshot.status(value) if value.__class__ is int else value.status
+
+    def decoded_count(self):
+        return sum(1 for value in self._entries.values() if value.__class__ is not int)
+
+    def snapshot_entries(self):
+        """依目前順序產生寫入新快照用的項目；沒解碼過的任務直接複製原本的紀錄 bytes。"""
+        snapshot = self.snapshot
+        for value in self._entries.values():
+            yield snapshot.entry(value) if value.__class__ is int else entry_from_dict(value.to_dict())
+
+    def rebind(self, snapshot):
+        """剛用 snapshot_entries() 寫出 snapshot 之後呼叫：沒解碼過的任務改指向新檔中的位置。"""
+        self.snapshot = snapshot
+        self._entries = {task_id: (i if value.__class__ is int else value)
+                         for i, (task_id, value) in enumerate(self._entries.items())}
+
+
+def json_to_snapshot(json_path, snapshot_path=None):
+    """把 tasks.json 轉成快照，回傳筆數。"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        tasks_data = json.load(f)
+    # 與 TaskManager 載入時相同：task_id 重複時以後面的為準
+    tasks_data = list({data["task_id"]: data for data in tasks_data}.values())
+    write_snapshot(snapshot_path or snapshot_path_for(json_path), (entry_from_dict(data) for data in tasks_data), fsync=True)
+    return len(tasks_data)
+
+
+def snapshot_to_json(snapshot_path, json_path):
+    """把快照寫回 tasks.json (連同截止日索引)，回傳筆數。"""
+    from task_index import write_tasks_file  # 延遲匯入，避免循環相依
+    tasks_data = read_snapshot(snapshot_path)
+    write_tasks_file(json_path, tasks_data, fsync=True)
+    return len(tasks_data)
+
+
+if __name__ == "__main__":
+    # 用法: python task_snapshot.py to-binary|to-json [tasks.json]
+    if len(sys.argv) < 2 or sys.argv[1] not in ("to-binary", "to-json"):
+        print("用法: python task_snapshot.py to-binary|to-json [tasks.json 路徑]")
+        sys.exit(1)
+    from task_lock import TaskFileLock
+    from task_logic import DEFAULT_FILENAME
+    target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_FILENAME
+    with TaskFileLock(target).exclusive():
+        if sys.argv[1] == "to-binary":
+            count = json_to_snapshot(target)
+            print(f"已將 {target} 轉成 {snapshot_path_for(target)}，共 {count} 筆任務。")
+        else:
+            count = snapshot_to_json(snapshot_path_for(target), target)
+            print(f"已將 {snapshot_path_for(target)} 寫回 {target}，共 {count} 筆任務。")
@@ -0,0 +1,250 @@
+# task_sqlite.py
+#
+# TaskManager 的 SQLite 儲存模式，以及任務的全文搜尋索引 (FTS5)。
+#
+# tasks 資料表以 status 與 (due_date, created_at) 建索引；tasks_fts 是標題與說明的 FTS5 索引。
+# 中文沒有空白斷詞，所以寫入 FTS 前先把連續的中日韓文字切成「重疊的兩字詞」(bigram)，
+# 例如「開會討論」→「開會 會討 討論 論」，查詢時用同樣規則轉成片語查詢：
+#   - 一個字「會」   → 前綴查詢 會*  (每個字都是某個詞的開頭，所以不會漏)
+#   - 兩個字以上     → 連續 bigram 的片語，等同子字串比對
+#   - 英數字         → unicode61 斷詞 + 前綴查詢 (meet → meet*)
+# 其他儲存模式 (json / journal) 也會用一個記憶體中的 SQLiteTaskStore(":memory:") 當搜尋索引。
+
+import json
+import os
+import re
+import sqlite3
+import threading
+
+TASK_COLUMNS = ("task_id", "title", "description", "status", "created_at", "due_date", "meeting_link", "version",
+                "recurrence", "occurrence_status", "source", "fingerprint")
+# 只有部分任務才有的欄位 (一般任務是 NULL，dict 裡也不含這些鍵)：週期性任務的重複規則以 JSON 文字存放；匯入任務的來源與指紋
+OPTIONAL_COLUMNS = ("recurrence", "occurrence_status", "source", "fingerprint")
+JSON_COLUMNS = ("recurrence", "occurrence_status")
+DEFAULT_SEARCH_LIMIT = 200
+RANK_CANDIDATE_LIMIT = 2000  # 符合的筆數超過這個數量時不做相關度排序 (bm25 要替每一筆算分)，改回傳最新的任務
+
+# 中日韓統一表意文字、注音、假名、韓文等「不以空白分詞」的字元
+_CJK_CHAR = r'぀-ヿ㄀-ㄯ㐀-䶿一-鿿가-힯豈-﫿'
+_CJK_RUN = re.compile(f'[{_CJK_CHAR}]+')
+_SEARCH_SEGMENT = re.compile(f'[{_CJK_CHAR}]+|[^\\W_{_CJK_CHAR}]+')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tasks (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    due_date TEXT,
+    meeting_link TEXT,
+    version INTEGER NOT NULL DEFAULT 0,
+    recurrence TEXT,
+    occurrence_status TEXT,
+    source TEXT,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks(due_date, created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(title, description, tokenize='unicode61');
+'''
+
+
+def db_path_for(path):
+    """tasks.json 對應的 SQLite 資料庫路徑 (同名的 tasks.db)；傳入的本來就是資料庫時原樣回傳。"""
+    return os.path.splitext(path)[0] + '.db' if path.endswith('.json') else path
+
+
+def _row_dict(row):
+    task_dict = dict(zip(TASK_COLUMNS[:-len(OPTIONAL_COLUMNS)], row))
+    # 與 Task.to_dict 相同：一般任務的 dict 不含這些選用欄位的鍵
+    for column, value in zip(OPTIONAL_COLUMNS, row[-len(OPTIONAL_COLUMNS):]):
+        if value: task_dict[column] = json.loads(value) if column in JSON_COLUMNS else value
+    return task_dict
+
+
+def _bigrams(run):
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def tokenize_for_search(text):
+    """把文字轉成寫入 FTS 的形式：中日韓文字切成重疊的兩字詞，其餘保持原樣交給 unicode61。"""
+    if not text:
+        return ""
+    return _CJK_RUN.sub(lambda m: ' ' + ' '.join(_bigrams(m.group(0))) + ' ', text)
+
+
+def build_match_query(query):
+    """把使用者輸入轉成 FTS5 MATCH 語法；每個片段之間是 AND。沒有可搜尋的內容時回傳 None。"""
+    terms = []
+    for segment in _SEARCH_SEGMENT.findall(query or ""):
+        if _CJK_RUN.fullmatch(segment):
+            if len(segment) == 1:
+                terms.append(f'"{segment}"*')
+            else:
+                terms.append('"' + ' '.join(segment[i:i + 2] for i in range(len(segment) - 1)) + '"')
+        else:
+            terms.append(f'"{segment}"*')
+    return ' AND '.join(terms) if terms else None
+
+
+class SQLiteTaskStore:
+    """
+    一個 SQLite 資料庫中的任務表 + 全文索引。
+
+    :param path: 資料庫檔案路徑；":memory:" 代表只在記憶體中 (當作其他儲存模式的搜尋索引)。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # GUI 的背景工作也可能觸發寫入，所以允許跨執行緒使用並自己加鎖
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._lock:
+            if path != ":memory:":
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(_SCHEMA)
+            # 舊版資料庫沒有 version、重複規則與來源的欄位
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(tasks)")}
+            if "version" not in columns:
+                self.conn.execute("ALTER TABLE tasks ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            for column in OPTIONAL_COLUMNS:
+                if column not in columns: self.conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} TEXT")
+            # 欄位補齊之後才建得出指紋的索引
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_fingerprint ON tasks(fingerprint) WHERE fingerprint IS NOT NULL")
+
+    # --- 讀取 ---
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def data_version(self):
+        """其他連線 (例如另一個程式) 每次提交寫入後都會改變的數字；自己的寫入不會改變它。"""
+        with self._lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load_all(self):
+        """依加入順序回傳所有任務 dict (與 tasks.json 的順序規則相同)。"""
+        with self._lock:
+            rows = self.conn.execute(f"SELECT {', '.join(TASK_COLUMNS)} FROM tasks ORDER BY seq").fetchall()
+        return [_row_dict(row) for row in rows]
+
+    def load_due_between(self, start, end):
+        """
+        截止日在 start ~ end (含，YYYY-MM-DD 字串) 之間的任務 dict，依 (截止日, 建立時間) 排序，走 idx_tasks_due 索引；
+        另外附上所有週期性任務 (截止日只是系列的第一次，由呼叫端依規則展開)。
+        """
+        columns = ', '.join(TASK_COLUMNS)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {columns} FROM tasks WHERE due_date BETWEEN ? AND ? AND recurrence IS NULL ORDER BY due_date, created_at",
+                (start, end)).fetchall()
+            rows += self.conn.execute(f"SELECT {columns} FROM tasks WHERE recurrence IS NOT NULL").fetchall()
+        return [_row_dict(row) for row in rows]
+
+    def search(self, query, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        全文搜尋標題與說明，依相關度 (bm25，標題權重較高) 回傳 task_id list。
+        像單一個字這種很廣的查詢，符合筆數太多時改依新到舊回傳，避免替幾萬筆結果算分。
+        """
+        match = build_match_query(query)
+        if match is None:
+            return []
+        with self._lock:
+            candidates = self.conn.execute(
+                "SELECT COUNT(*) FROM (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ? LIMIT ?)",
+                (match, RANK_CANDIDATE_LIMIT + 1),
+            ).fetchone()[0]
+            order = "bm25(tasks_fts, 10.0, 1.0)" if candidates <= RANK_CANDIDATE_LIMIT else "f.rowid DESC"
+            rows = self.conn.execute(
+                "SELECT t.task_id FROM tasks_fts f JOIN tasks t ON t.seq = f.rowid "
+                f"WHERE tasks_fts MATCH ? ORDER BY {order} LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # --- 寫入 ---
+    def put(self, task_dict):
+        self.put_many([task_dict])
+
+    def put_many(self, task_dicts):
+        with self._lock, self.conn:
+            for task_dict in task_dicts:
+                self._upsert(task_dict)
+
+    def _upsert(self, task_dict):
+        values = [task_dict.get(column) for column in TASK_COLUMNS]
+        values[2] = values[2] or ""
+        values[7] = values[7] or 0
+        values[8:] = [(json.dumps(value, ensure_ascii=False) if column in JSON_COLUMNS else value) if value else None
+                      for column, value in zip(TASK_COLUMNS[8:], values[8:])]
+        row = self.conn.execute("SELECT seq, title, description FROM tasks WHERE task_id = ?", (task_dict["task_id"],)).fetchone()
+        if row is None:
+            cursor = self.conn.execute(
+                f"INSERT INTO tasks ({', '.join(TASK_COLUMNS)}) VALUES ({', '.join('?' * len(TASK_COLUMNS))})", values)
+            self._index_text(cursor.lastrowid, task_dict)
+            return
+        seq, old_title, old_description = row
+        self.conn.execute(
+            f"UPDATE tasks SET {', '.join(f'{c} = ?' for c in TASK_COLUMNS[1:])} WHERE seq = ?", values[1:] + [seq])
+        # 只有標題或說明變了才需要重建全文索引 (狀態變更不會動到 FTS)
+        if old_title != task_dict.get("title") or old_description != (task_dict.get("description") or ""):
+            self.conn.execute("DELETE FROM tasks_fts WHERE rowid = ?", (seq,))
+            self._index_text(seq, task_dict)
+
+    def _index_text(self, seq, task_dict):
+        self.conn.execute(
+            "INSERT INTO tasks_fts (rowid, title, description) VALUES (?, ?, ?)",
+            (seq, tokenize_for_search(task_dict.get("title")), tokenize_for_search(task_dict.get("description"))),
+        )
+
+    def delete(self, task_id):
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT seq FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            if row is None:
+                return
+            self.conn.execute("DELETE FROM tasks_fts WHERE rowid = ?", (row[0],))
+            self.conn.execute("DELETE FROM tasks WHERE seq = ?", (row[0],))
+
+    def replace_all(self, task_dicts):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM tasks_fts")
+            self.conn.execute("DELETE FROM tasks")
+            for task_dict in task_dicts:
+                self._upsert(task_dict)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def import_json(json_path, db_path):
+    """把既有的 tasks.json 轉進 SQLite 資料庫 (同 task_id 會被覆寫)。回傳匯入筆數。"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        tasks_data = json.load(f)
+    store = SQLiteTaskStore(db_path)
+    store.put_many(tasks_data)
+    store.close()
+    return len(tasks_data)
+
+
+if __name__ == "__main__":
+    # 用法: python task_sqlite.py import [tasks.json] [tasks.db]
+    #       python task_sqlite.py search 關鍵字 [tasks.db]
+    import sys
+    from task_logic import DEFAULT_FILENAME, DEFAULT_DB_FILENAME
+    if len(sys.argv) >= 2 and sys.argv[1] == "import":
+        src = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_FILENAME
+        dst = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DB_FILENAME
+        print(f"已從 {src} 匯入 {import_json(src, dst)} 筆任務到 {dst}。")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "search":
+        db_store = SQLiteTaskStore(sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DB_FILENAME)
+        by_id = {d["task_id"]: d for d in db_store.load_all()}
+        for task_id in db_store.search(sys.argv[2]):
+            print(f"{task_id[:8]}  {by_id[task_id]['title']}")
+    else:
+        print("用法: python task_sqlite.py import [tasks.json] [tasks.db] | search 關鍵字 [tasks.db]")
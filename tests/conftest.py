@@ -0,0 +1,9 @@
+# conftest.py
+#
+# 專案的模組都放在最上層 (沒有套件)，測試直接從專案根目錄匯入。
+# 所有測試都只寫到 pytest 的 tmp_path，不會動到專案目錄下的 tasks.json、同步紀錄等檔案。
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
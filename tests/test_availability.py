@@ -0,0 +1,110 @@
+# 「🕒 建議時間」的空閒時段計算 (availability.py) 與 freebusy 查詢的時區。
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from availability import FreeBusyCache, find_free_slots, merge_intervals, suggest_meeting_slots
+
+MONDAY = datetime(2026, 11, 2)
+HOUR = timedelta(hours=1)
+
+
+def at(day_offset, hour, minute=0):
+    return MONDAY + timedelta(days=day_offset, hours=hour, minutes=minute)
+
+
+def test_merge_intervals():
+    intervals = [(at(0, 13), at(0, 14)), (at(0, 9), at(0, 10)), (at(0, 9, 30), at(0, 9, 45)),
+                 (at(0, 10), at(0, 11)), (at(0, 15), at(0, 16))]
+    # 未排序、包含與首尾相接的都合併
+    assert merge_intervals(intervals) == [(at(0, 9), at(0, 11)), (at(0, 13), at(0, 14)), (at(0, 15), at(0, 16))]
+    assert merge_intervals([]) == []
+
+
+def test_free_slots_stay_inside_the_workday():
+    slots = find_free_slots([(at(0, 9), at(0, 17))], at(0, 0), at(3, 0), HOUR, count=3)
+    # 17:00 ~ 18:00 剛好塞得下；下一個是隔天上班時間一開始
+    assert slots == [(at(0, 17), at(0, 18)), (at(1, 9), at(1, 10)), (at(1, 10), at(1, 11))]
+    assert find_free_slots([], at(0, 17, 30), at(0, 23), HOUR) == []  # 下班前塞不下一小時
+
+
+def test_free_slots_are_aligned_and_skip_busy_time():
+    busy = [(at(0, 9, 20), at(0, 10, 5)), (at(0, 11), at(0, 11, 30))]
+    slots = find_free_slots(busy, at(0, 9, 7), at(1, 0), timedelta(minutes=30), count=4)
+    # 9:07 之後第一個對齊 15 分鐘的是 9:15，但 9:20 就忙；忙完 10:05 進位到 10:15
+    assert slots == [(at(0, 10, 15), at(0, 10, 45)), (at(0, 11, 30), at(0, 12)), (at(0, 12), at(0, 12, 30)),
+                     (at(0, 12, 30), at(0, 13))]
+
+
+def test_free_slots_skip_weekends_unless_asked():
+    saturday = MONDAY - timedelta(days=2)
+    assert find_free_slots([], saturday, MONDAY + timedelta(days=1), HOUR, count=1) == [(at(0, 9), at(0, 10))]
+    assert find_free_slots([], saturday, MONDAY, HOUR, count=1, skip_weekends=False) == [
+        (saturday.replace(hour=9), saturday.replace(hour=10))]
+
+
+def test_cache_hits_only_inside_range_and_ttl(tmp_path):
+    cache = FreeBusyCache(str(tmp_path / "freebusy_cache.json"), ttl=600)
+    busy = [(at(0, 10), at(0, 11))]
+    cache.put("a@example.com", at(0, 0), at(7, 0), busy, now=1000)
+    cache.put("b@example.com", at(0, 0), at(7, 0), [], error="notFound", now=1000)
+
+    assert cache.get("a@example.com", at(1, 0), at(2, 0), now=1300) == (busy, None)  # 範圍內
+    assert cache.get("a@example.com", at(6, 0), at(8, 0), now=1300) is None  # 超出查過的範圍
+    assert cache.get("a@example.com", at(1, 0), at(2, 0), now=1600) is None  # 過期
+    assert cache.get("b@example.com", at(1, 0), at(2, 0), now=1300) == ([], "notFound")
+
+    cache.save()  # 實際時間早就超過 TTL：過期的項目不會寫進檔案
+    assert FreeBusyCache(cache.path, ttl=600).entries == {}
+    cache.put("a@example.com", at(0, 0), at(7, 0), busy)
+    cache.save()
+    assert FreeBusyCache(cache.path, ttl=600).get("a@example.com", at(0, 0), at(7, 0)) == (busy, None)
+
+
+def test_suggest_queries_only_cache_misses():
+    cache = FreeBusyCache(None)
+    cache.put("primary", at(0, 0), at(7, 0), [(at(0, 9), at(0, 12))])
+    queried = []
+
+    def query(calendar_ids, start, end):
+        queried.append(calendar_ids)
+        return {"a@example.com": [(at(0, 12), at(0, 13))]}, {"b@example.com": "notFound"}
+
+    ids = ["primary", "a@example.com", "b@example.com", "primary"]
+    slots, errors = suggest_meeting_slots(ids, HOUR, at(0, 0), at(7, 0), query, cache, count=1)
+    assert queried == [["a@example.com", "b@example.com"]]
+    assert slots == [(at(0, 13), at(0, 14))] and errors == {"b@example.com": "notFound"}
+    # 第二次全部命中，不再查詢
+    assert suggest_meeting_slots(ids, HOUR, at(0, 0), at(7, 0), query, cache, count=1) == (slots, errors)
+    assert len(queried) == 1
+
+
+@pytest.fixture
+def new_york_clock(monkeypatch):
+    # 電腦設在台北以外的時區
+    if not hasattr(time, "tzset"): pytest.skip("需要 time.tzset")
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_freebusy_uses_the_same_clock_as_created_events(new_york_clock):
+    pytest.importorskip("googleapiclient")
+    from google.oauth2.credentials import Credentials
+    from fake_google_server import FakeGoogleServer
+    from google_calendar_service import build_calendar_service, insert_calendar_events, query_freebusy, _calendar_batch_uri
+
+    with FakeGoogleServer() as server:
+        service = build_calendar_service(Credentials(token="test-token"), server.url)
+        request = {"id": "evt1", "summary": "週會", "start": at(0, 10).isoformat(), "end": at(0, 11).isoformat(),
+                   "attendees": ["a@example.com"]}
+        assert insert_calendar_events(service, [request], batch_uri=_calendar_batch_uri(server.url))[0][0] == "ok"
+        busy, errors = query_freebusy(service, ["primary", "a@example.com"], at(0, 0), at(1, 0))
+
+    assert errors == {}
+    assert busy == {"primary": [(at(0, 10), at(0, 11))], "a@example.com": [(at(0, 10), at(0, 11))]}
+    assert find_free_slots(busy["primary"], at(0, 9), at(0, 12), HOUR) == [(at(0, 9), at(0, 10)), (at(0, 11), at(0, 12))]
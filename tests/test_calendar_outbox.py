@@ -0,0 +1,121 @@
+# 日曆待送佇列 (calendar_outbox.py) 對本機假 Calendar 伺服器的重試、批次與不重複建立。
+
+import time
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+from google.oauth2.credentials import Credentials
+
+from calendar_outbox import CalendarOutbox, OutboxWorker, backoff_delay
+from fake_google_server import FakeGoogleServer
+from google_calendar_service import build_calendar_service, insert_calendar_events, _calendar_batch_uri
+
+CREDS = Credentials(token="test-token")
+DAY = datetime(2026, 11, 2)
+
+
+@pytest.fixture
+def server():
+    with FakeGoogleServer() as fake:
+        yield fake
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return CalendarOutbox(str(tmp_path / "calendar_outbox.json"))
+
+
+def make_worker(server, outbox, created, failed):
+    service = build_calendar_service(CREDS, server.url)
+    submit = lambda entries: insert_calendar_events(service, entries, batch_uri=_calendar_batch_uri(server.url))
+    return OutboxWorker(outbox, submit, on_created=lambda entry, event: created.append((entry["task_id"], event["hangoutLink"])),
+                        on_failed=lambda entry, message: failed.append((entry["task_id"], message)))
+
+
+def enqueue(outbox, task_id, hour=10):
+    return outbox.enqueue(task_id, f"會議 {task_id}", DAY.replace(hour=hour), DAY.replace(hour=hour + 1), attendees=["a@example.com"])
+
+
+def make_due(outbox):
+    # 不等退避時間，直接讓所有項目到期
+    for entry in outbox.entries: entry["next_attempt_at"] = 0.0
+
+
+def test_retries_transient_errors_with_backoff(server, outbox):
+    created, failed = [], []
+    worker = make_worker(server, outbox, created, failed)
+    enqueue(outbox, "t1")
+    server.fail_next_inserts(1, status=503)
+
+    assert worker.drain_once() == (0, 0)
+    entry = outbox.entries[0]
+    assert entry["attempts"] == 1 and entry["last_error"] == "HTTP 503"
+    assert entry["next_attempt_at"] > time.time()
+    assert outbox.due_entries() == []
+
+    make_due(outbox)
+    assert worker.drain_once() == (1, 0)
+    assert len(outbox) == 0 and not failed
+    assert created[0][0] == "t1" and created[0][1].startswith("https://meet.google.com/")
+
+
+def test_retry_after_is_respected(server, outbox):
+    worker = make_worker(server, outbox, [], [])
+    enqueue(outbox, "t1")
+    server.fail_next_inserts(1, status=429, retry_after=120)
+    before = time.time()
+    worker.drain_once()
+    assert outbox.entries[0]["next_attempt_at"] >= before + 120
+
+
+def test_lost_response_does_not_create_duplicate_event(server, outbox):
+    created = []
+    worker = make_worker(server, outbox, created, [])
+    entry = enqueue(outbox, "t1")
+    # 活動其實建立了，只是回應出錯；重送時同一個 id 得到 409，改為取回既有的活動
+    server.fail_next_inserts(1, status=503, land=True)
+    worker.drain_once()
+    make_due(outbox)
+    worker.drain_once()
+
+    assert list(server.events) == [entry["id"]]
+    assert server.insert_attempts == 2
+    assert created == [("t1", server.events[entry["id"]]["hangoutLink"])]
+
+
+def test_due_entries_are_sent_in_one_batch(server, outbox):
+    created = []
+    worker = make_worker(server, outbox, created, [])
+    for i in range(3): enqueue(outbox, f"t{i}", hour=9 + i)
+    assert worker.drain_once() == (3, 0)
+    assert server.request_log.count(("POST", "batch")) == 1
+    assert sorted(task_id for task_id, _ in created) == ["t0", "t1", "t2"]
+
+
+def test_permanent_errors_are_dropped(server, outbox):
+    failed = []
+    worker = make_worker(server, outbox, [], failed)
+    enqueue(outbox, "t1")
+    server.fail_next_inserts(1, status=400)
+    assert worker.drain_once() == (0, 1)
+    assert len(outbox) == 0 and failed[0][0] == "t1"
+
+
+def test_pending_entries_survive_restart(server, outbox):
+    enqueue(outbox, "t1")
+    server.fail_next_inserts(1, status=503)
+    make_worker(server, outbox, [], []).drain_once()
+
+    reopened = CalendarOutbox(outbox.path)
+    assert [entry["task_id"] for entry in reopened.entries] == ["t1"]
+    assert reopened.entries[0]["attempts"] == 1
+
+
+def test_backoff_grows_and_is_capped():
+    # 基本等待時間每次加倍 (乘上 0.5 ~ 1 的隨機抖動)，最多 30 分鐘
+    assert 1.0 <= backoff_delay(1) <= 2.0
+    assert 8.0 <= backoff_delay(4) <= 16.0
+    assert backoff_delay(50) <= 30 * 60
+    assert backoff_delay(1, retry_after=300) == 300
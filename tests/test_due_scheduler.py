@@ -0,0 +1,80 @@
+# 到期事件的最小堆積排程器 (due_scheduler.py)。
+
+from datetime import datetime, time
+
+from due_scheduler import DueScheduler, REMIND, OVERDUE
+
+NOW = datetime(2026, 11, 2, 8, 0)  # 週一早上 8 點，提醒時間是 9 點
+
+
+def make_scheduler(items=()):
+    scheduler = DueScheduler(reminder_time=time(9, 0))
+    scheduler.rebuild(items, now=NOW)
+    return scheduler
+
+
+def test_events_fire_in_time_order():
+    scheduler = make_scheduler([("b", "2026-11-03"), ("a", "2026-11-02"), ("c", "2026-11-02")])
+    scheduler.schedule("d", "2026-11-04", now=NOW)
+    assert scheduler.next_fire_at() == datetime(2026, 11, 2, 9, 0)
+    assert scheduler.pop_due(now=NOW) == []
+
+    fired = scheduler.pop_due(now=datetime(2026, 11, 4, 9, 0))
+    assert fired == [(REMIND, "a", "2026-11-02"), (REMIND, "c", "2026-11-02"), (OVERDUE, "a", "2026-11-02"),
+                     (OVERDUE, "c", "2026-11-02"), (REMIND, "b", "2026-11-03"), (OVERDUE, "b", "2026-11-03"),
+                     (REMIND, "d", "2026-11-04")]
+    assert scheduler.next_fire_at() == datetime(2026, 11, 5, 0, 0)
+    assert len(scheduler) == 1  # 觸發過 overdue 的任務不再排程
+
+
+def test_past_transitions_do_not_fire():
+    # 9 點之後才建立：今天的提醒已經過了，只剩午夜的逾期
+    scheduler = make_scheduler()
+    later = datetime(2026, 11, 2, 10, 0)
+    assert scheduler.schedule("a", "2026-11-02", now=later)
+    assert scheduler.schedule("old", "2026-10-01", now=later)  # 早就逾期：沒有任何事件
+    assert scheduler.pop_due(now=datetime(2026, 11, 3, 0, 0)) == [(OVERDUE, "a", "2026-11-02")]
+
+    # 觸發過之後用同一個日期再排一次 (例如狀態改回待辦)，也不會補發
+    assert scheduler.schedule("a", "2026-11-02", now=datetime(2026, 11, 3, 8, 0))
+    assert scheduler.next_fire_at() is None and scheduler.pop_due(now=datetime(2026, 12, 1)) == []
+
+
+def test_reschedule_drops_old_events_lazily():
+    scheduler = make_scheduler([("a", "2026-11-02")])
+    assert not scheduler.schedule("a", "2026-11-02", now=NOW)  # 日期沒變
+    assert scheduler.schedule("a", "2026-11-05", now=NOW)
+    assert len(scheduler._heap) == 4  # 舊事件還留在堆積裡
+    assert scheduler.next_fire_at() == datetime(2026, 11, 5, 9, 0)  # 但會被略過
+    assert scheduler.pop_due(now=datetime(2026, 11, 5, 9, 0)) == [(REMIND, "a", "2026-11-05")]
+
+
+def test_reschedule_back_to_the_original_date_fires_once():
+    # 改期後又改回原本的日期：堆積裡有兩組同一天的事件，只有最後一次排程的有效
+    scheduler = make_scheduler([("a", "2026-11-02")])
+    assert scheduler.schedule("a", "2026-11-05", now=NOW)
+    assert scheduler.schedule("a", "2026-11-02", now=NOW)
+    fired = scheduler.pop_due(now=datetime(2026, 11, 10))
+    assert fired == [(REMIND, "a", "2026-11-02"), (OVERDUE, "a", "2026-11-02")]
+
+
+def test_done_and_removed_tasks_stop_firing():
+    scheduler = make_scheduler([("a", "2026-11-02"), ("b", "2026-11-02"), ("c", "2026-11-02")])
+    assert scheduler.schedule("a", "2026-11-02", done=True)
+    scheduler.unschedule("b")
+    assert scheduler.schedule("c", None)
+    assert not scheduler.schedule("c", None)
+    assert scheduler.next_fire_at() is None and len(scheduler) == 0
+
+
+def test_compact_removes_stale_events():
+    scheduler = make_scheduler([(f"t{i}", "2026-11-20") for i in range(10)])
+    for day in range(3, 30):
+        scheduler.schedule("t0", f"2026-12-{day:02d}", now=NOW)
+    # 失效的事件超過有效事件的 4 倍 (+64) 前就會整理，堆積不會無限成長
+    assert len(scheduler._heap) <= 4 * len(scheduler) + 64 + 2
+    scheduler._compact()
+    assert len(scheduler._heap) == 2 * len(scheduler)
+    fired = scheduler.pop_due(now=datetime(2027, 1, 1))
+    assert [(kind, due) for kind, task_id, due in fired if task_id == "t0"] == [(REMIND, "2026-12-29"), (OVERDUE, "2026-12-29")]
+    assert len(fired) == 2 * 10
@@ -0,0 +1,59 @@
+# 郵件掃描快取 (email_scan_cache.py) 的位元組上限 LRU 淘汰與存檔。
+
+import json
+
+from email_scan_cache import EmailScanCache
+
+
+def parsed(message_id, size=100):
+    return {"message_id": message_id, "subject": "x" * size}
+
+
+def entry_size(message_id, size=100):
+    return len(json.dumps(parsed(message_id, size), ensure_ascii=False).encode('utf-8'))
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = EmailScanCache(None, max_bytes=3 * entry_size("m0"))
+    for message_id in ("m0", "m1", "m2"):
+        cache.put(message_id, parsed(message_id))
+    assert cache.total_bytes == 3 * entry_size("m0")
+
+    cache.get("m0")  # m0 變成最近用過的，m1 才是最久沒用的
+    cache.put("m3", parsed("m3"))
+    assert cache.get("m1") is None
+    assert [cache.get(message_id) is not None for message_id in ("m0", "m2", "m3")] == [True, True, True]
+    assert cache.total_bytes <= cache.max_bytes
+
+    # 一筆大的可以擠掉好幾筆小的；單筆超過上限時至少留下它自己
+    cache.put("big", parsed("big", 250))
+    assert len(cache) == 1 and cache.get("big") is not None
+    # 重新放入同一封不會重複計算大小
+    cache.put("big", parsed("big", 250))
+    assert cache.total_bytes == entry_size("big", 250)
+
+
+def test_cached_results_need_every_message():
+    cache = EmailScanCache(None, max_bytes=2 * entry_size("m0"))
+    for message_id in ("m0", "m1"):
+        cache.put(message_id, parsed(message_id))
+    cache.remember_scan("q", "100", ["m1", "m0"])
+    assert [result["message_id"] for result in cache.cached_results()] == ["m1", "m0"]
+    cache.put("m2", parsed("m2"))  # 淘汰掉 m1
+    assert cache.cached_results() is None
+
+
+def test_save_and_reload_keep_lru_order(tmp_path):
+    path = str(tmp_path / "email_scan_cache.json")
+    cache = EmailScanCache(path, max_bytes=3 * entry_size("m0"))
+    for message_id in ("m0", "m1", "m2"):
+        cache.put(message_id, parsed(message_id))
+    cache.get("m0")
+    cache.remember_scan("q", "100", ["m0", "m1", "m2"])
+    cache.save()
+
+    reloaded = EmailScanCache(path, max_bytes=3 * entry_size("m0"))
+    assert (reloaded.history_id, reloaded.query, reloaded.result_ids) == ("100", "q", ["m0", "m1", "m2"])
+    assert reloaded.total_bytes == cache.total_bytes
+    reloaded.put("m3", parsed("m3"))
+    assert reloaded.get("m1") is None and reloaded.get("m0") is not None
@@ -0,0 +1,96 @@
+# 「📧 掃描郵件建議」對本機假 Gmail 伺服器 (fake_google_server.py) 的批次抓取、快取與增量掃描。
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+from google.oauth2.credentials import Credentials
+
+from email_scan_cache import EmailScanCache
+from fake_google_server import FakeGoogleServer
+from google_calendar_service import scan_potential_meeting_emails, fetch_email_details
+
+CREDS = Credentials(token="test-token")
+
+
+@pytest.fixture
+def server():
+    with FakeGoogleServer() as fake:
+        fake.populate_messages(25)
+        yield fake
+
+
+def message_gets(server):
+    return [path for method, path in server.request_log if method == "GET" and "/messages/" in path]
+
+
+def test_scan_fetches_messages_in_batches(server):
+    results = scan_potential_meeting_emails(CREDS, max_results=25, batch_size=10, api_endpoint=server.url, use_cache=False)
+
+    # 結果維持 Gmail 列表的順序，只有標題、寄件人與摘要
+    assert [result["message_id"] for result in results] == [f"msg{i:05d}" for i in range(25)]
+    assert results[3]["subject"] == "會議 3: 下週開會討論一下"
+    assert results[3]["sender"] == "同事 3 <colleague3@example.com>"
+    assert "link" not in results[3]
+    # 25 封分成 3 個批次請求，每封只抓一次
+    assert server.request_log.count(("POST", "batch")) == 3
+    assert len(message_gets(server)) == 25
+
+
+@pytest.mark.parametrize("batch_size", [1, 10])
+def test_failed_message_is_skipped(server, batch_size):
+    # 單封 (不包成批次) 與批次中的單封失敗一樣：略過那一封，其餘照常回傳
+    server.broken_messages.add("msg00003")
+    results = scan_potential_meeting_emails(CREDS, max_results=5, batch_size=batch_size, api_endpoint=server.url, use_cache=False)
+    assert [result["message_id"] for result in results] == ["msg00000", "msg00001", "msg00002", "msg00004"]
+
+
+def test_rescan_uses_cache_and_history(server, tmp_path):
+    cache_path = str(tmp_path / "scan_cache.json")
+    scan = lambda: scan_potential_meeting_emails(CREDS, max_results=25, batch_size=10, api_endpoint=server.url, cache_path=cache_path)
+    first = scan()
+
+    server.request_log.clear()
+    assert scan() == first
+    assert server.request_log == [("GET", "/gmail/v1/users/me/history")]  # 信箱沒變動：只問一次 history
+
+    server.remove_message("msg00003")
+    server.add_message("new01", "臨時加開的會議", "主管 <boss@example.com>", "https://meet.google.com/new-meet-001")
+    server.request_log.clear()
+    results = scan()
+    ids = [result["message_id"] for result in results]
+    assert "msg00003" not in ids and "new01" in ids
+    assert message_gets(server) == ["/gmail/v1/users/me/messages/new01"]  # 只下載快取裡沒有的那一封
+
+
+def test_unchanged_scan_saves_latest_history_id(server, tmp_path):
+    cache_path = str(tmp_path / "scan_cache.json")
+    scan = lambda: scan_potential_meeting_emails(CREDS, max_results=25, api_endpoint=server.url, cache_path=cache_path)
+    first = scan()
+    # 信箱的 historyId 往前走了，但沒有任何符合條件的變動 (例如別的標籤上的異動)
+    server.history_id += 5
+    server.request_log.clear()
+    assert scan() == first
+    assert server.request_log == [("GET", "/gmail/v1/users/me/history")]
+    # 新的 historyId 要寫回檔案，下次 (包括重新啟動後) 從這裡問起
+    assert EmailScanCache(cache_path).history_id == str(server.history_id)
+
+
+def test_fetch_email_details_finds_meeting_link(server):
+    details = fetch_email_details(CREDS, "msg00001", api_endpoint=server.url, cache_path=None)
+    assert details["link"] == "https://meet.google.com/abc-defg-001"
+
+
+def test_cached_link_is_used_only_when_the_body_is_not_needed(server, tmp_path):
+    cache_path = str(tmp_path / "scan_cache.json")
+    scan_potential_meeting_emails(CREDS, max_results=25, api_endpoint=server.url, cache_path=cache_path)
+    details = lambda need_body: fetch_email_details(CREDS, "msg00001", api_endpoint=server.url, cache_path=cache_path, need_body=need_body)
+
+    server.request_log.clear()
+    first = details(False)
+    assert "下週約個時間" in first["body"] and first["link"] == "https://meet.google.com/abc-defg-001"
+    # 連結已寫回掃描快取：只要連結時不再下載，body 為 None (內文不進快取)
+    assert details(False) == {"body": None, "link": first["link"]}
+    assert len(message_gets(server)) == 1
+    # 需要內文時一律下載
+    assert details(True) == first
+    assert len(message_gets(server)) == 2
@@ -0,0 +1,80 @@
+# 會議記錄解析：逐行串流的 iter_meeting_minutes 與平行匯入資料夾 (parse_meeting_minutes_dir)
+# 必須與原本整檔讀入、re.findall 的版本解析出一樣的任務。
+
+import re
+
+import pytest
+
+from task_logic import TaskManager, iter_meeting_minutes, parse_meeting_minutes_dir, parse_meeting_minutes_files
+
+
+def whole_file_parse(filepath):
+    """原本的 TaskManager.parse_meeting_minutes：整個檔案讀進來後用 re.findall 切區塊。"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+    potential_tasks = []
+    task_blocks = re.findall(r'\* \*\*任務:\*\*(.*?)(?=\* \*\*任務:\*\*|\Z)', content, re.DOTALL)
+    for block in task_blocks:
+        title_match = re.search(r'(.*?)\n', block.strip())
+        owner_match = re.search(r'\*\*負責人:\*\*\s*(.*?)\n', block)
+        due_date_match = re.search(r'\*\*截止日期:\*\*\s*(.*?)\n', block)
+        title = title_match.group(1).strip() if title_match else "標題未找到"
+        owner = owner_match.group(1).strip() if owner_match and owner_match.group(1).strip() else ""
+        if owner:
+            title = f"{title} ({owner})"
+        due_date = due_date_match.group(1).strip() if due_date_match and due_date_match.group(1).strip() else None
+        potential_tasks.append({"title": title, "due_date": due_date})
+    return potential_tasks
+
+
+MINUTES = {
+    "週會.txt": (
+        "# 週會 2026-11-02\n\n出席：王小明、陳大文\n\n"
+        "* **任務:** 準備週會簡報\n  * **負責人:** 王小明\n  * **截止日期:** 2026-11-05\n\n"
+        "* **任務:** 訂會議室\n  * **負責人:** \n  * **截止日期:** \n"
+        "* **任務:** 整理會議紀錄\n  * **截止日期:** 2026-11-09\n  備註：寄給全組\n"),
+    # 同一行有兩個區塊、區塊前有雜訊、最後一行沒有換行
+    "月會.txt": (
+        "雜項說明 * **任務:** 同一行的任務 * **任務:** 第二個\n  * **負責人:** 陳大文\n"
+        "* **任務:** 最後一筆沒有換行\n  * **截止日期:** 2026-12-01"),
+    "只有標題.txt": "* **任務:**只有一行",
+    "空白.txt": "",
+    "沒有任務.txt": "今天沒有待辦事項。\n",
+    "CRLF.txt": "* **任務:** Windows 存檔\r\n  * **負責人:** 林小華\r\n  * **截止日期:** 2026-11-20\r\n",
+}
+
+
+@pytest.fixture
+def minutes_dir(tmp_path):
+    for name, content in MINUTES.items():
+        (tmp_path / name).write_bytes(content.encode('utf-8'))
+    (tmp_path / "不是會議記錄.md").write_text("* **任務:** 不該匯入\n", encoding='utf-8')
+    return tmp_path
+
+
+@pytest.mark.parametrize("name", sorted(MINUTES))
+def test_streaming_parser_matches_whole_file_parser(minutes_dir, name):
+    path = str(minutes_dir / name)
+    expected = whole_file_parse(path)
+    assert list(iter_meeting_minutes(path)) == expected
+    assert TaskManager(str(minutes_dir / "tasks.json")).parse_meeting_minutes(path) == [
+        dict(task, source=path) for task in expected]
+
+
+def test_folder_import_matches_file_by_file_parse(minutes_dir):
+    paths = sorted(str(path) for path in minutes_dir.glob("*.txt"))
+    expected = [dict(task, source=path) for path in paths for task in whole_file_parse(path)]
+    assert len(expected) == 8
+    # 多個行程平行解析，結果仍依檔名順序串接
+    assert parse_meeting_minutes_dir(str(minutes_dir), max_workers=2) == expected
+    assert parse_meeting_minutes_files(paths[:1]) == expected[:len(whole_file_parse(paths[0]))]
+
+
+def test_unreadable_files_are_skipped(minutes_dir, capfd):
+    (minutes_dir / "亂碼.txt").write_bytes(b"\xff\xfe* **\xe4")
+    missing = str(minutes_dir / "不存在.txt")
+    week = str(minutes_dir / "週會.txt")
+    tasks = parse_meeting_minutes_files([missing, str(minutes_dir / "亂碼.txt"), week], max_workers=2)
+    assert tasks == [dict(task, source=week) for task in whole_file_parse(week)]
+    assert "無法解析會議記錄" in capfd.readouterr().out
+    assert TaskManager(str(minutes_dir / "tasks.json")).parse_meeting_minutes(missing) == []
@@ -0,0 +1,126 @@
+# 重複規則的日期計算 (recurrence.py) 與週期性任務的新增檢查。
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from recurrence import normalize_rule, occurrences, next_occurrence, expand_task_dicts, describe_rule, to_rrule, _add_months
+from task_logic import TaskManager, Task
+
+
+def rule(**kwargs):
+    return normalize_rule(kwargs)
+
+
+def between(rule_dict, first, start, end):
+    return list(occurrences(rule_dict, first, start, end))
+
+
+def naive_occurrences(rule_dict, first, end):
+    """從第一次開始逐一列舉的參考實作 (只給測試比對用)。"""
+    interval, count, until = rule_dict["interval"], rule_dict.get("count"), rule_dict.get("until")
+    days = []
+    if rule_dict["freq"] == "daily":
+        day = first
+        while day <= end:
+            days.append(day); day += timedelta(days=interval)
+    elif rule_dict["freq"] == "weekly":
+        weekdays = rule_dict.get("weekdays") or [first.weekday()]
+        monday = first - timedelta(days=first.weekday())
+        day = monday
+        while day <= end:
+            if (day - monday).days // 7 % interval == 0 and day.weekday() in weekdays and day >= first: days.append(day)
+            day += timedelta(days=1)
+    else:
+        n = 0
+        while (day := _add_months(first, n * interval, first.day)) <= end:
+            days.append(day); n += 1
+    if until: days = [day for day in days if day <= date.fromisoformat(until)]
+    return days[:count] if count else days
+
+
+def test_daily_with_interval_starts_mid_series():
+    assert between(rule(freq="daily", interval=3), date(2026, 1, 1), date(2026, 1, 5), date(2026, 1, 12)) == [
+        date(2026, 1, 7), date(2026, 1, 10)]
+
+
+def test_weekly_on_several_weekdays_skips_days_before_first():
+    # 第一次是週三：第一週的週一不算，週五算
+    days = between(rule(freq="weekly", weekdays=[0, 4]), date(2026, 10, 14), date(2026, 10, 1), date(2026, 10, 27))
+    assert days == [date(2026, 10, 16), date(2026, 10, 19), date(2026, 10, 23), date(2026, 10, 26)]
+
+
+def test_monthly_clamps_to_month_end():
+    days = between(rule(freq="monthly"), date(2026, 1, 31), date(2026, 1, 1), date(2026, 4, 30))
+    assert days == [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)]
+    assert between(rule(freq="monthly", interval=12), date(2024, 2, 29), date(2025, 1, 1), date(2028, 12, 31)) == [
+        date(2025, 2, 28), date(2026, 2, 28), date(2027, 2, 28), date(2028, 2, 29)]
+
+
+def test_count_and_until_end_the_series():
+    assert between(rule(freq="daily", count=3), date(2026, 1, 1), date(2026, 1, 2), date(2026, 12, 31)) == [
+        date(2026, 1, 2), date(2026, 1, 3)]
+    assert between(rule(freq="weekly", until="2026-01-15"), date(2026, 1, 1), date(2026, 1, 1), date(2026, 12, 31)) == [
+        date(2026, 1, 1), date(2026, 1, 8), date(2026, 1, 15)]
+    assert next_occurrence(rule(freq="daily", count=2), date(2026, 1, 1), date(2026, 1, 3)) is None
+
+
+def test_matches_naive_enumeration():
+    rng = random.Random(20261018)
+    for _ in range(500):
+        freq = rng.choice(["daily", "weekly", "monthly"])
+        kwargs = {"freq": freq, "interval": rng.randint(1, 4)}
+        if freq == "weekly" and rng.random() < 0.5: kwargs["weekdays"] = rng.sample(range(7), rng.randint(1, 3))
+        if rng.random() < 0.3: kwargs["count"] = rng.randint(1, 20)
+        first = date(2026, 1, 1) + timedelta(days=rng.randint(0, 400))
+        if rng.random() < 0.3: kwargs["until"] = (first + timedelta(days=rng.randint(0, 300))).isoformat()
+        start = first + timedelta(days=rng.randint(-30, 200))
+        end = start + timedelta(days=rng.randint(0, 120))
+        rule_dict = rule(**kwargs)
+        expected = [day for day in naive_occurrences(rule_dict, first, end) if day >= start]
+        assert between(rule_dict, first, start, end) == expected, (rule_dict, first, start, end)
+
+
+def test_normalize_rule_rejects_bad_rules():
+    assert normalize_rule(None) is None
+    for bad in ({"freq": "yearly"}, {"freq": "daily", "interval": -1}, {"freq": "weekly", "weekdays": [7]},
+                {"freq": "daily", "until": "下週一"}):
+        with pytest.raises(ValueError):
+            normalize_rule(bad)
+
+
+def test_describe_and_rrule():
+    weekly = rule(freq="weekly", weekdays=[0, 2], count=10)
+    assert describe_rule(weekly) == "每週一、三，共 10 次"
+    assert to_rrule(weekly) == "RRULE:FREQ=WEEKLY;INTERVAL=1;BYDAY=MO,WE;COUNT=10"
+    assert describe_rule(rule(freq="daily", interval=2, until="2026-12-31")) == "每 2 天，到 2026-12-31"
+
+
+def test_expand_task_dicts_applies_overrides_and_skips_bad_dates():
+    series = {"task_id": "s", "title": "站立會議", "status": "待辦", "due_date": "2026-11-01",
+              "recurrence": rule(freq="daily"), "occurrence_status": {"2026-11-02": "已完成"}}
+    broken = dict(series, task_id="x", due_date="下週一")
+    plain = {"task_id": "p", "title": "一般任務", "status": "待辦", "due_date": "2026-11-02"}
+    expanded = list(expand_task_dicts([series, broken, plain], date(2026, 11, 1), date(2026, 11, 3)))
+    assert [(d["task_id"], d["due_date"]) for d in expanded] == [("s", "2026-11-01"), ("s", "2026-11-03"), ("p", "2026-11-02")]
+    with_done = list(expand_task_dicts([series], date(2026, 11, 2), date(2026, 11, 2), skip_done=False))
+    assert [d["status"] for d in with_done] == ["已完成"]
+
+
+def test_next_occurrence_skips_completed_ones():
+    task = Task("站立會議", due_date="2026-11-01", recurrence=rule(freq="daily"),
+                occurrence_status={"2026-11-03": "已完成", "2026-11-04": "已完成"})
+    assert task.next_occurrence(date(2026, 11, 3)) == date(2026, 11, 5)
+
+
+def test_recurring_tasks_need_an_iso_first_date(tmp_path):
+    manager = TaskManager(str(tmp_path / "tasks.json"))
+    for due_date in ("下週一", None):
+        with pytest.raises(ValueError):
+            manager.add_task("週會", due_date=due_date, recurrence={"freq": "weekly"})
+    with pytest.raises(ValueError):
+        manager.add_tasks([{"title": "正常", "due_date": "2026-11-02"}, {"title": "週會", "recurrence": {"freq": "weekly"}}])
+    assert manager.count_tasks() == 0  # 整批都不寫入
+    task = manager.add_task("週會", due_date="2026-11-02", recurrence={"freq": "weekly"})
+    assert task.recurrence == {"freq": "weekly", "interval": 1}
@@ -0,0 +1,94 @@
+# 提醒事項的批次建立 (reminder_syncer.py) 與每日同步的同步紀錄 (run_daily_sync.py)：重複執行不會建立重複的提醒。
+
+import json
+import subprocess
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+import reminder_syncer
+from reminder_syncer import AppleScriptBackend, FileReminderBackend, ReminderBackend, create_reminders
+from run_daily_sync import sync_task_reminders, sync_tasks_for_range
+from task_logic import TaskManager
+
+DAY = date(2026, 11, 2)
+
+
+@pytest.fixture
+def reminders_path(tmp_path, monkeypatch):
+    path = tmp_path / "reminders.jsonl"
+    monkeypatch.setenv("REMINDER_BACKEND", "file")
+    monkeypatch.setattr(reminder_syncer, "FILE_BACKEND_PATH", str(path))
+    return path
+
+
+def written(path):
+    if not path.exists(): return []
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def test_file_backend_writes_one_line_per_reminder(tmp_path):
+    path = tmp_path / "reminders.jsonl"
+    results = create_reminders([("準備週會簡報", "2026-11-02"), ("回覆客戶郵件", "明天")], backend=FileReminderBackend(str(path)))
+    assert [result["success"] for result in results] == [True, False]
+    assert "日期格式錯誤" in results[1]["error"]
+    assert written(path) == [{"list": "提醒事項", "title": "準備週會簡報", "due": "2026-11-02T09:00:00"}]
+
+
+def test_applescript_results_survive_multiline_errors(monkeypatch):
+    # 第二筆的錯誤訊息有兩行；結果以 ASCII 30 分隔，第三筆仍要對到第三個任務
+    output = "ok\x1eerror:第一行\n第二行\x1eok\n"
+    monkeypatch.setattr(subprocess, "run", lambda *args, **kwargs: SimpleNamespace(stdout=output))
+    results = create_reminders([("A", "2026-11-02"), ("B", "2026-11-02"), ("C", "2026-11-02")], backend=AppleScriptBackend())
+    assert [result["success"] for result in results] == [True, False, True]
+    assert results[1]["error"] == "第一行\n第二行"
+
+
+def test_reminder_backend_is_abstract():
+    with pytest.raises(TypeError):
+        ReminderBackend()
+
+
+def test_ledger_prevents_duplicates_and_retries_failures(tmp_path, reminders_path):
+    ledger_path = str(tmp_path / "sync_ledger.json")
+    tasks = [{"task_id": "a", "title": "寫報告", "due_date": "2026-11-02"},
+             {"task_id": "b", "title": "日期錯誤", "due_date": "2026-13-40"}]
+    assert sync_task_reminders(tasks, ledger_path) == 1
+    assert sync_task_reminders(tasks, ledger_path) == 0  # a 已同步過；b 失敗了所以會再試 (仍然失敗)
+    assert [reminder["title"] for reminder in written(reminders_path)] == ["寫報告"]
+
+    # 改期之後算是新的一筆
+    assert sync_task_reminders([dict(tasks[0], due_date="2026-11-03")], ledger_path) == 1
+    assert len(written(reminders_path)) == 2
+
+
+@pytest.mark.parametrize("storage", ["json", "journal", "sqlite", "binary"])
+def test_daily_sync_runs_once_per_task(tmp_path, reminders_path, storage):
+    tasks_path = str(tmp_path / "tasks.json")
+    ledger_path = str(tmp_path / "sync_ledger.json")
+    manager = TaskManager(tasks_path, storage=storage)
+    manager.add_task("今天到期", due_date=DAY.isoformat())
+    manager.add_task("明天到期", due_date="2026-11-03")
+    manager.add_task("每天的站立會議", due_date="2026-10-01", recurrence={"freq": "daily"})
+    manager.close()
+
+    sync_tasks_for_range(DAY, DAY, tasks_path, ledger_path, storage)
+    sync_tasks_for_range(DAY, DAY, tasks_path, ledger_path, storage)
+
+    reminders = written(reminders_path)
+    assert sorted(reminder["title"] for reminder in reminders) == ["今天到期", "每天的站立會議"]
+    assert {reminder["due"] for reminder in reminders} == {"2026-11-02T09:00:00"}
+
+
+def test_daily_sync_reads_the_configured_storage(tmp_path, reminders_path):
+    # 用過 sqlite 模式後改回 json：留下的 tasks.db 是舊資料，同步要讀 tasks.json
+    tasks_path = str(tmp_path / "tasks.json")
+    ledger_path = str(tmp_path / "sync_ledger.json")
+    TaskManager(tasks_path, storage="sqlite").close()
+    TaskManager(tasks_path, storage="json").add_task("改回 json 後新增", due_date=DAY.isoformat())
+
+    sync_tasks_for_range(DAY, DAY, tasks_path, ledger_path, "json")
+    assert [reminder["title"] for reminder in written(reminders_path)] == ["改回 json 後新增"]
+    sync_tasks_for_range(DAY, DAY, tasks_path, ledger_path, "sqlite")
+    assert len(written(reminders_path)) == 1
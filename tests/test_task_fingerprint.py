@@ -0,0 +1,68 @@
+# 匯入任務的內容指紋 (content_fingerprint) 與 TaskManager 的指紋 / 來源索引 (find_duplicate、mark_duplicates)。
+
+import pytest
+
+from task_logic import TaskManager, content_fingerprint, email_source, source_id
+
+
+def test_fingerprint_normalizes_title_due_date_and_source():
+    base = content_fingerprint("整理 ABC 報告", "2026-11-02", "/notes/週會.txt")
+    # 全形半形、大小寫與多餘的空白不影響；會議記錄只看檔名
+    assert content_fingerprint("  整理　ＡＢＣ\t報告 ", "2026-11-02", "/other/dir/週會.txt") == base
+    assert content_fingerprint("整理 abc 報告", "2026-11-02", "週會.txt") == base
+    assert content_fingerprint("整理 ABC 報告", "2026-11-03", "/notes/週會.txt") != base
+    assert content_fingerprint("整理 ABC 報告", None, "/notes/週會.txt") != base
+    assert content_fingerprint("整理 ABC 報告", "2026-11-02", "/notes/月會.txt") != base
+    assert source_id(email_source("msg-1")) == "gmail:msg-1"
+    assert content_fingerprint("回覆", None, email_source("msg-1")) != content_fingerprint("回覆", None, email_source("msg-2"))
+
+
+def test_mark_duplicates_checks_store_and_batch(tmp_path):
+    manager = TaskManager(str(tmp_path / "tasks.json"))
+    manager.add_task("整理報告", due_date="2026-11-02", source="/notes/週會.txt")
+    batch = [{"title": "整理報告", "due_date": "2026-11-02", "source": "/elsewhere/週會.txt"},  # 任務庫裡已有
+             {"title": "訂會議室", "source": "/notes/週會.txt"},
+             {"title": "訂會議室 ", "source": "/notes/週會.txt"},  # 同一批前面出現過
+             {"title": "訂會議室", "source": "/notes/月會.txt"}]
+    assert manager.mark_duplicates(batch) == [True, False, True, False]
+
+
+def test_index_follows_update_delete_and_external_merge(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    manager = TaskManager(path)
+    task = manager.add_task("整理報告", due_date="2026-11-02", source="/notes/週會.txt")
+    manager.update_task_status(task.task_id, "已完成")
+    assert manager.find_duplicate("整理報告", "2026-11-02", "/notes/週會.txt") is task
+    assert manager.task_for_source("/notes/週會.txt") is task
+
+    other = TaskManager(path)
+    from_email = other.add_task("回覆客戶", source=email_source("msg-1"))
+    other.delete_task(task.task_id)
+    assert manager.reload_if_changed() == 2
+    assert manager.find_duplicate("整理報告", "2026-11-02", "/notes/週會.txt") is None
+    assert manager.task_for_source("/notes/週會.txt") is None
+    assert manager.task_for_source(email_source("msg-1")).task_id == from_email.task_id
+
+    manager.delete_task(from_email.task_id)
+    assert manager.task_for_source(email_source("msg-1")) is None
+    assert manager._fingerprints == {} and manager._sources == {}
+
+
+@pytest.mark.parametrize("storage", ["json", "binary"])
+def test_tasks_sharing_a_fingerprint(tmp_path, storage):
+    path = str(tmp_path / "tasks.json")
+    manager = TaskManager(path, storage=storage)
+    first = manager.add_task("整理報告", source="/notes/週會.txt")
+    second = manager.add_task("整理報告", source="/notes/週會.txt")  # 使用者選擇仍要匯入的重複任務
+    assert first.fingerprint == second.fingerprint
+
+    manager = TaskManager(path, storage=storage)  # 重開時從檔案 (或快照) 建索引
+    manager.delete_task(second.task_id)
+    # 刪掉其中一筆，留下的那筆仍查得到
+    assert manager.find_duplicate("整理報告", None, "/notes/週會.txt").task_id == first.task_id
+    assert manager.task_for_source("/notes/週會.txt").task_id == first.task_id
+    assert manager.mark_duplicates([{"title": "整理報告", "source": "/notes/週會.txt"}]) == [True]
+
+    manager.delete_task(first.task_id)
+    assert manager.find_duplicate("整理報告", None, "/notes/週會.txt") is None
+    assert manager.mark_duplicates([{"title": "整理報告", "source": "/notes/週會.txt"}]) == [False]
@@ -0,0 +1,82 @@
+# 日誌模式 (task_journal.py) 的當機重播：沒壓實就關掉、最後一行寫到一半、壓實寫完快照但還沒截短日誌。
+
+import json
+import os
+
+from task_journal import TaskJournal, journal_path_for, write_snapshot
+from task_logic import TaskManager
+
+
+def open_manager(path):
+    return TaskManager(str(path), storage="journal", compact_every=10_000)
+
+
+def titles(manager):
+    return sorted(task.title for task in manager.list_tasks())
+
+
+def test_replays_journal_without_compaction(tmp_path):
+    path = tmp_path / "tasks.json"
+    manager = open_manager(path)
+    keep = manager.add_task("保留", due_date="2026-11-01")
+    gone = manager.add_task("刪除")
+    manager.update_task_status(keep.task_id, "進行中")
+    manager.delete_task(gone.task_id)
+    manager.close()
+
+    assert not path.exists()  # 還沒壓實過，只有日誌
+    reopened = open_manager(path)
+    assert titles(reopened) == ["保留"]
+    assert reopened.get_task(keep.task_id).status == "進行中"
+    assert reopened.get_task(keep.task_id).version == keep.version
+
+
+def test_torn_tail_is_ignored_and_truncated(tmp_path):
+    path = tmp_path / "tasks.json"
+    manager = open_manager(path)
+    manager.add_task("第一筆")
+    manager.close()
+    journal_path = journal_path_for(str(path))
+    valid_size = os.path.getsize(journal_path)
+    # 模擬寫到一半就當機：最後一行沒有換行、JSON 也不完整
+    with open(journal_path, 'ab') as f:
+        f.write(b'{"op": "put", "task": {"task_id": "torn", "title": "\xe5\xaf')
+
+    reopened = open_manager(path)
+    assert titles(reopened) == ["第一筆"]
+    assert os.path.getsize(journal_path) == valid_size
+    # 截掉尾巴之後繼續追加的紀錄要能正常讀回
+    reopened.add_task("第二筆")
+    reopened.close()
+    assert titles(open_manager(path)) == ["第一筆", "第二筆"]
+
+
+def test_replay_is_idempotent_after_crash_during_compaction(tmp_path):
+    path = tmp_path / "tasks.json"
+    manager = open_manager(path)
+    first = manager.add_task("A")
+    manager.add_task("B")
+    manager.delete_task(first.task_id)
+    snapshot = [task.to_dict() for task in manager.list_tasks()]
+    manager.close()
+    # 壓實寫好了新快照，但在截短日誌之前當機：重播舊紀錄 (包含已刪除的 A) 結果仍要一樣
+    write_snapshot(str(path), snapshot)
+    assert os.path.getsize(journal_path_for(str(path))) > 0
+
+    assert titles(open_manager(path)) == ["B"]
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path):
+    path = tmp_path / "tasks.json"
+    manager = open_manager(path)
+    for i in range(5):
+        manager.add_task(f"任務 {i}")
+    manager.compact(background=False)
+    manager.add_task("壓實之後")
+    manager.close()
+
+    with open(path, encoding='utf-8') as f:
+        assert len(json.load(f)) == 5
+    records = list(TaskJournal(str(path)).iter_records())
+    assert [record["task"]["title"] for record in records] == ["壓實之後"]
+    assert len(titles(open_manager(path))) == 6
@@ -0,0 +1,129 @@
+# 任務庫的跨行程鎖 (task_lock.py) 與多個寫入者之間的衝突偵測、增量併入 (TaskManager)。
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from task_lock import TaskFileLock, TaskLockTimeout
+from task_logic import TaskManager, TaskConflictError
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HOLD_LOCK = """
+import sys, time
+from task_lock import TaskFileLock
+with TaskFileLock(sys.argv[1]).exclusive():
+    open(sys.argv[2], 'w').close()
+    time.sleep(float(sys.argv[3]))
+"""
+
+ADD_TASKS = """
+import sys
+from task_logic import TaskManager
+manager = TaskManager(sys.argv[1], storage=sys.argv[2])
+for i in range(int(sys.argv[3])):
+    manager.add_task(f"{sys.argv[4]}-{i}")
+manager.close()
+"""
+
+
+def run_python(code, *args):
+    return subprocess.Popen([sys.executable, "-c", code, *map(str, args)], cwd=REPO_DIR)
+
+
+def wait_for(path, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        assert time.monotonic() < deadline, f"{path} 一直沒有出現"
+        time.sleep(0.01)
+
+
+def test_lock_held_by_another_process_times_out(tmp_path):
+    path, ready = str(tmp_path / "tasks.json"), str(tmp_path / "ready")
+    holder = run_python(HOLD_LOCK, path, ready, 1.0)
+    try:
+        wait_for(ready)
+        for hold in (TaskFileLock(path, timeout=0.2).shared, TaskFileLock(path, timeout=0.2).exclusive):
+            with pytest.raises(TaskLockTimeout):
+                with hold(): pass
+    finally:
+        holder.wait()
+    # 對方放掉之後就拿得到
+    with TaskFileLock(path, timeout=0.2).exclusive(): pass
+
+
+def test_waiting_on_another_thread_times_out(tmp_path):
+    # 背景執行緒 (例如 check_external_changes) 拿著共用鎖時，主執行緒的寫入也只等到 timeout 為止
+    lock = TaskFileLock(str(tmp_path / "tasks.json"), timeout=0.2)
+    holding, release = threading.Event(), threading.Event()
+
+    def reader():
+        with lock.shared():
+            holding.set(); release.wait(5)
+
+    thread = threading.Thread(target=reader); thread.start()
+    try:
+        holding.wait(5)
+        started = time.monotonic()
+        with pytest.raises(TaskLockTimeout):
+            with lock.exclusive(): pass
+        assert time.monotonic() - started < 2
+    finally:
+        release.set(); thread.join()
+    with lock.exclusive():
+        with lock.shared(): pass  # 同一執行緒內仍可重入
+
+
+@pytest.mark.parametrize("storage", ["json", "journal"])
+def test_concurrent_writers_keep_every_task(tmp_path, storage):
+    path = str(tmp_path / "tasks.json")
+    writers = [run_python(ADD_TASKS, path, storage, 30, f"p{n}") for n in range(3)]
+    assert [writer.wait() for writer in writers] == [0, 0, 0]
+    assert TaskManager(path, storage=storage).count_tasks() == 90
+
+
+def test_stale_version_is_rejected(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    mine = TaskManager(path)
+    task = mine.add_task("寫報告")
+    seen = task.version  # 畫面顯示時的版本 (Task 物件本身之後會就地更新)
+    theirs = TaskManager(path)
+    theirs.update_task_status(task.task_id, "進行中")
+
+    with pytest.raises(TaskConflictError):
+        mine.update_task_status(task.task_id, "已完成", expected_version=seen)
+    # 被拒絕時已併入對方的修改，用新的版本再試一次就會成功
+    current = mine.get_task(task.task_id)
+    assert current.status == "進行中"
+    mine.update_task_status(task.task_id, "已完成", expected_version=current.version)
+    with pytest.raises(TaskConflictError):
+        theirs.delete_task(task.task_id, expected_version=seen + 1)
+
+
+@pytest.mark.parametrize("storage", ["json", "journal", "sqlite"])
+def test_external_changes_are_merged_incrementally(tmp_path, storage):
+    path = str(tmp_path / "tasks.json")
+    mine = TaskManager(path, storage=storage)
+    kept = mine.add_task("保留")
+    removed = mine.add_task("會被刪除")
+    events = []
+    mine.add_listener(lambda event, task, row: events.append((event, task.title if task else None)))
+    original = mine.get_task(kept.task_id)
+
+    theirs = TaskManager(path, storage=storage)
+    theirs.update_task_status(kept.task_id, "進行中")
+    theirs.delete_task(removed.task_id)
+    theirs.add_task("新的")
+    theirs.close()
+
+    changes = mine.check_external_changes()
+    if storage == "journal": assert changes[0] == "records"  # 只讀日誌新追加的部分
+    assert mine.apply_external_changes(changes) == 3
+    assert sorted(events) == [("added", "新的"), ("removed", "會被刪除"), ("updated", "保留")]
+    assert mine.get_task(kept.task_id) is original and original.status == "進行中"  # 既有的 Task 物件就地更新
+    assert mine.check_external_changes() is None
+    mine.close()
@@ -0,0 +1,105 @@
+# 二進位快照 (task_snapshot.py)：與 tasks.json 無損互轉、按需解碼 (LazyTaskMap) 與存檔後改指向新檔。
+
+import json
+
+import pytest
+
+from task_logic import TaskManager, email_source
+from task_snapshot import (MAGIC, LazyTaskMap, SnapshotFormatError, TaskSnapshot, json_to_snapshot, snapshot_to_json,
+                           snapshot_path_for, read_due_between)
+
+
+def fill(manager):
+    """各種欄位都有的一組任務 (含週期性、有來源與內容看起來像欄位名稱的任務)。"""
+    manager.add_task("準備週會簡報", "第一頁放進度", due_date="2026-11-02")
+    manager.add_task("沒有截止日")
+    manager.add_task("站立會議", due_date="2026-10-01", recurrence={"freq": "daily"})
+    manager.add_task("回覆客戶", due_date="2026-11-03", source=email_source("msg-1"))
+    manager.add_task('標題裡有 "recurrence": 與 "source": 字樣', description='"source":"x"', due_date="2026-11-04")
+    manager.update_task_status(manager.list_tasks()[0].task_id, "進行中")
+
+
+@pytest.fixture
+def json_path(tmp_path):
+    path = tmp_path / "tasks.json"
+    fill(TaskManager(str(path)))
+    return path
+
+
+def dicts(manager):
+    return [task.to_dict() for task in manager.list_tasks()]
+
+
+def test_round_trip_is_lossless(json_path, tmp_path):
+    original_bytes = json_path.read_bytes()
+    original = json.loads(original_bytes)
+    assert json_to_snapshot(str(json_path)) == len(original)
+    snapshot_path = snapshot_path_for(str(json_path))
+    with open(snapshot_path, 'rb') as f:
+        assert f.read(len(MAGIC)) == MAGIC
+
+    back_path = tmp_path / "back.json"
+    assert snapshot_to_json(snapshot_path, str(back_path)) == len(original)
+    # 欄位、順序與格式都與一般模式存檔相同
+    assert back_path.read_bytes() == original_bytes
+    assert [list(data) for data in json.loads(back_path.read_bytes())] == [list(data) for data in original]
+
+
+def test_rejects_files_that_are_not_snapshots(tmp_path):
+    path = tmp_path / "tasks.tsnap"
+    path.write_bytes(b'[]' * 64)
+    with pytest.raises(SnapshotFormatError):
+        TaskSnapshot(str(path))
+
+
+def test_lazy_load_matches_full_load(json_path):
+    expected = dicts(TaskManager(str(json_path)))
+    manager = TaskManager(str(json_path), storage="binary")
+    by_id = manager._by_id
+    assert isinstance(by_id, LazyTaskMap)
+    assert by_id.decoded_count() == 0  # 開檔與建索引都不解碼任何一筆
+
+    first = expected[0]["task_id"]
+    assert manager.get_task(first).to_dict() == expected[0]
+    assert by_id.decoded_count() == 1
+    assert manager.get_task(first) is manager.get_task(first)  # 解碼一次就留下來
+    assert dicts(manager) == expected
+    assert by_id.decoded_count() == len(expected)
+
+
+def test_indices_with_key_finds_only_real_fields(json_path):
+    json_to_snapshot(str(json_path))
+    snapshot = TaskSnapshot(snapshot_path_for(str(json_path)))
+    titles = lambda indices: sorted(snapshot.record(i)["title"] for i in indices)
+    # 字串值裡的引號會被跳脫，標題或描述裡出現 "source": 不算
+    assert titles(snapshot.indices_with_key("recurrence")) == ["站立會議"]
+    assert titles(snapshot.indices_with_key("source")) == ["回覆客戶"]
+    assert snapshot.indices_with_key("no_such_field") == []
+
+    wanted = {"2026-11-02", "2026-11-04"}
+    found = sorted(data["title"] for data in read_due_between(snapshot_path_for(str(json_path)), wanted))
+    assert found == sorted(["準備週會簡報", "站立會議", '標題裡有 "recurrence": 與 "source": 字樣'])
+
+
+def test_rebind_after_save_points_at_the_new_file(json_path):
+    expected = {data["task_id"]: data for data in dicts(TaskManager(str(json_path)))}
+    manager = TaskManager(str(json_path), storage="binary")
+    by_id = manager._by_id
+    old_snapshot = by_id.snapshot
+    # 刪掉檔案中的第一筆：存檔後其他沒解碼過的任務在新檔中的位置都往前移一格
+    removed = old_snapshot.task_ids[0]
+    manager.delete_task(removed)
+    del expected[removed]
+
+    assert by_id.snapshot is not old_snapshot and by_id.snapshot.path == manager.snapshot_path
+    assert by_id.decoded_count() == 0  # 留下的任務都沒解碼，直接複製紀錄 bytes
+    assert by_id.snapshot.task_ids == old_snapshot.task_ids[1:]
+    assert all(by_id._entries[task_id] == i for i, task_id in enumerate(by_id.snapshot.task_ids))
+    assert {task_id: by_id[task_id].to_dict() for task_id in by_id} == expected
+
+    # 再存一次 (這次有解碼過的任務)，重開後內容相同
+    task_id = next(iter(expected))
+    manager.update_task_status(task_id, "已完成")
+    expected[task_id].update(status="已完成", version=expected[task_id]["version"] + 1)
+    reopened = TaskManager(str(json_path), storage="binary")
+    assert {data["task_id"]: data for data in dicts(reopened)} == expected
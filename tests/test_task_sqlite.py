@@ -0,0 +1,24 @@
+# SQLite 模式 (task_sqlite.py)：第一次開啟時匯入 tasks.json，之後只以 tasks.db 為準。
+
+import json
+
+from task_logic import TaskManager
+
+
+def test_imports_tasks_json_only_when_the_database_is_created(tmp_path):
+    path = tmp_path / "tasks.json"
+    manager = TaskManager(str(path))
+    manager.add_task("舊任務一")
+    manager.add_task("舊任務二")
+
+    manager = TaskManager(str(path), storage="sqlite")
+    assert sorted(task.title for task in manager.list_tasks()) == ["舊任務一", "舊任務二"]
+    for task in manager.list_tasks():
+        manager.delete_task(task.task_id)
+    manager.close()
+
+    # 刪光之後重開：資料庫是空的，但 tasks.json 不能再被匯回來
+    reopened = TaskManager(str(path), storage="sqlite")
+    assert reopened.list_tasks() == []
+    assert len(json.loads(path.read_text(encoding='utf-8'))) == 2  # tasks.json 本身保留不動
+    reopened.close()